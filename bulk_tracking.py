@@ -0,0 +1,156 @@
+import asyncio
+import csv
+import io
+import logging
+import re
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from database import get_async_session_local, TrackedAccount
+from neynar_client import get_neynar_client
+from command_executor import get_command_executor
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Séparateurs d'une liste libre (message ou fichier texte)
+IDENTIFIER_SEPARATORS = re.compile(r"[\s,;]+")
+# En-têtes de colonne ignorés dans un CSV
+HEADER_NAMES = {"fid", "username", "user", "compte", "account"}
+
+def parse_identifiers(text: str, csv_format: bool = False) -> List[str]:
+    """FIDs / usernames d'une liste libre, ou de la première colonne d'un CSV (sans doublons, ordre conservé)"""
+    if csv_format:
+        values = [row[0] for row in csv.reader(io.StringIO(text)) if row]
+    else:
+        values = IDENTIFIER_SEPARATORS.split(text)
+    
+    identifiers, seen = [], set()
+    for value in values:
+        value = value.strip().lstrip('@').lower()
+        if not value or value.startswith('#') or value in HEADER_NAMES or value in seen:
+            continue
+        seen.add(value)
+        identifiers.append(value)
+    return identifiers
+
+async def resolve_identifiers(identifiers: List[str],
+                              progress: Optional[Callable[[int, int], Awaitable]] = None) -> Tuple[Dict[str, Dict], Dict[str, str]]:
+    """Résoudre des identifiants en utilisateurs Farcaster, retourne (résolus, échecs avec raison)
+    
+    Les FIDs sont résolus par lots de 100 (/user/bulk) ; les usernames, qui
+    n'ont pas d'endpoint groupé, en parallèle dans le pool des commandes.
+    Seule une correspondance exacte du username est acceptée.
+    """
+    client = get_neynar_client()
+    if client is None:
+        raise RuntimeError("Client Neynar non initialisé")
+    
+    executor = get_command_executor()
+    resolved: Dict[str, Dict] = {}
+    failures: Dict[str, str] = {}
+    total = len(identifiers)
+    done = 0
+    
+    fids = [identifier for identifier in identifiers if identifier.isdigit()]
+    usernames = [identifier for identifier in identifiers if not identifier.isdigit()]
+    
+    if fids:
+        try:
+            users = await executor.run(client.get_users_by_fids, [int(fid) for fid in fids])
+            by_fid = {int(user['fid']): user for user in users}
+            for fid in fids:
+                user = by_fid.get(int(fid))
+                if user:
+                    resolved[fid] = user
+                else:
+                    failures[fid] = "FID introuvable"
+        except Exception as e:
+            logger.error(f"❌ Erreur lors de la résolution groupée de {len(fids)} FID(s): {e}")
+            for fid in fids:
+                failures[fid] = f"erreur Neynar: {e}"
+        done += len(fids)
+        if progress:
+            await progress(done, total)
+    
+    async def resolve_username(username: str):
+        try:
+            user = await executor.run(client.get_user_by_username, username)
+            if user.get('username', '').lower() == username:
+                resolved[username] = user
+            else:
+                failures[username] = "username introuvable (pas de correspondance exacte)"
+        except Exception as e:
+            failures[username] = "username introuvable" if isinstance(e, ValueError) else f"erreur Neynar: {e}"
+    
+    for task in asyncio.as_completed([resolve_username(username) for username in usernames]):
+        await task
+        done += 1
+        if progress:
+            await progress(done, total)
+    
+    return resolved, failures
+
+async def track_accounts_bulk(guild_id: str, channel_id: str, users: List[Dict], added_by: str) -> List[int]:
+    """Ajouter des comptes au suivi d'un salon en une insertion, retourne les FIDs réellement ajoutés"""
+    rows = {}
+    for user in users:
+        rows.setdefault(int(user['fid']), {
+            "id": str(uuid.uuid4()),
+            "guild_id": guild_id,
+            "channel_id": channel_id,
+            "fid": int(user['fid']),
+            "username": user['username'],
+            "added_by_discord_user_id": added_by
+        })
+    if not rows:
+        return []
+    
+    db = get_async_session_local()()
+    try:
+        result = await db.execute(
+            pg_insert(TrackedAccount)
+            .values(list(rows.values()))
+            .on_conflict_do_nothing(index_elements=["guild_id", "channel_id", "fid"])
+            .returning(TrackedAccount.fid)
+        )
+        inserted = list(result.scalars())
+        await db.commit()
+        return inserted
+    except Exception:
+        await db.rollback()
+        raise
+    finally:
+        await db.close()
+
+async def untrack_accounts_bulk(guild_id: str, fids: List[int]) -> List[int]:
+    """Retirer des comptes du suivi d'une guild en une requête, retourne les FIDs retirés"""
+    if not fids:
+        return []
+    
+    db = get_async_session_local()()
+    try:
+        result = await db.execute(
+            delete(TrackedAccount)
+            .where(TrackedAccount.guild_id == guild_id, TrackedAccount.fid.in_(fids))
+            .returning(TrackedAccount.fid)
+        )
+        removed = sorted(set(result.scalars()))
+        await db.commit()
+        return removed
+    except Exception:
+        await db.rollback()
+        raise
+    finally:
+        await db.close()
+
+async def read_identifier_attachments(attachments) -> List[str]:
+    """Identifiants des pièces jointes (.csv : première colonne, sinon liste libre)"""
+    identifiers = []
+    for attachment in attachments:
+        if attachment.size > config.TRACK_BULK_MAX_FILE_BYTES:
+            raise ValueError(f"fichier {attachment.filename} trop volumineux ({attachment.size} octets)")
+        text = (await attachment.read()).decode('utf-8-sig', errors='replace')
+        identifiers.extend(parse_identifiers(text, csv_format=attachment.filename.lower().endswith('.csv')))
+    return identifiers
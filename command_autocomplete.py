@@ -0,0 +1,117 @@
+import bisect
+import logging
+import time
+from typing import List, Optional, Tuple
+import discord
+from discord import app_commands
+from sqlalchemy import select, union
+from database import get_async_session_local, TrackedAccount, TrackedFollowing
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Discord n'affiche que 25 suggestions
+AUTOCOMPLETE_LIMIT = 25
+
+class ProfileDirectory:
+    """Annuaire local des profils Farcaster connus (username, FID)
+    
+    Alimenté par les comptes suivis et les comptes dont les followings sont
+    suivis : l'autocomplétion des commandes slash y cherche par préfixe
+    (liste triée, bisect) sans appel Neynar ni requête par frappe.
+    """
+    
+    def __init__(self, ttl_seconds: float = None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else config.PROFILE_DIRECTORY_TTL_SECONDS
+        self.profiles: List[Tuple[str, int]] = []  # (username en minuscules, FID), trié
+        self.loaded_at: Optional[float] = None
+    
+    async def _load(self):
+        db = get_async_session_local()()
+        try:
+            result = await db.execute(union(
+                select(TrackedAccount.username, TrackedAccount.fid),
+                select(TrackedFollowing.target_username, TrackedFollowing.target_fid)
+            ))
+            self.profiles = sorted((username.lower(), fid) for username, fid in result if username)
+        finally:
+            await db.close()
+        self.loaded_at = time.monotonic()
+        logger.debug(f"📇 Annuaire des profils rechargé ({len(self.profiles)} profil(s))")
+    
+    async def search(self, prefix: str, limit: int = AUTOCOMPLETE_LIMIT) -> List[Tuple[str, int]]:
+        """Profils dont le username (ou le FID) commence par le préfixe"""
+        if self.loaded_at is None or time.monotonic() - self.loaded_at >= self.ttl_seconds:
+            await self._load()
+        
+        prefix = prefix.strip().lstrip('@').lower()
+        if prefix.isdigit():
+            return [profile for profile in self.profiles if str(profile[1]).startswith(prefix)][:limit]
+        
+        matches = []
+        for username, fid in self.profiles[bisect.bisect_left(self.profiles, (prefix, -1)):]:
+            if not username.startswith(prefix) or len(matches) >= limit:
+                break
+            matches.append((username, fid))
+        return matches
+    
+    def invalidate(self):
+        self.loaded_at = None
+
+def profile_choices(profiles: List[Tuple[str, int]]) -> List[app_commands.Choice[str]]:
+    return [app_commands.Choice(name=f"{username} (FID {fid})", value=username) for username, fid in profiles]
+
+async def known_profile_autocomplete(interaction: discord.Interaction, current: str) -> List[app_commands.Choice[str]]:
+    """Suggestions parmi tous les profils connus localement"""
+    try:
+        return profile_choices(await get_profile_directory().search(current))
+    except Exception as e:
+        logger.error(f"❌ Erreur d'autocomplétion des profils: {e}")
+        return []
+
+async def guild_tracked_autocomplete(interaction: discord.Interaction, current: str) -> List[app_commands.Choice[str]]:
+    """Suggestions parmi les comptes suivis dans la guild (!untrack)"""
+    if interaction.guild_id is None:
+        return []
+    return await _guild_autocomplete(
+        select(TrackedAccount.username, TrackedAccount.fid)
+        .where(TrackedAccount.guild_id == str(interaction.guild_id)),
+        TrackedAccount.username, current
+    )
+
+async def guild_following_autocomplete(interaction: discord.Interaction, current: str) -> List[app_commands.Choice[str]]:
+    """Suggestions parmi les comptes dont les followings sont suivis dans la guild"""
+    if interaction.guild_id is None:
+        return []
+    return await _guild_autocomplete(
+        select(TrackedFollowing.target_username, TrackedFollowing.target_fid)
+        .where(TrackedFollowing.guild_id == str(interaction.guild_id)),
+        TrackedFollowing.target_username, current
+    )
+
+async def _guild_autocomplete(query, username_column, current: str) -> List[app_commands.Choice[str]]:
+    prefix = current.strip().lstrip('@')
+    if prefix:
+        query = query.where(username_column.ilike(prefix.replace('%', r'\%').replace('_', r'\_') + '%'))
+    
+    db = get_async_session_local()()
+    try:
+        result = await db.execute(query.distinct().order_by(username_column).limit(AUTOCOMPLETE_LIMIT))
+        return profile_choices([(username, fid) for username, fid in result])
+    except Exception as e:
+        logger.error(f"❌ Erreur d'autocomplétion des comptes suivis: {e}")
+        return []
+    finally:
+        await db.close()
+
+# Instance globale de l'annuaire
+_profile_directory = None
+
+def get_profile_directory() -> ProfileDirectory:
+    """Obtenir l'annuaire local des profils"""
+    global _profile_directory
+    
+    if _profile_directory is None:
+        _profile_directory = ProfileDirectory()
+    
+    return _profile_directory
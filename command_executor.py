@@ -0,0 +1,147 @@
+import asyncio
+import bisect
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Bornes (secondes) de l'histogramme de latence des commandes ; la dernière case est "au-delà"
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+class CommandTimeout(Exception):
+    """Commande ou appel bloquant interrompu par son délai maximal"""
+
+class LatencyHistogram:
+    """Histogramme cumulatif de latences (cases fixes, mémoire constante)"""
+    
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+    
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+    
+    def quantile(self, q: float) -> float:
+        """Borne supérieure de la case contenant le quantile q (estimation)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+        return self.max
+    
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [f"le_{bound}" for bound in self.buckets] + ["inf"]
+        return {
+            "count": self.count,
+            "avg_seconds": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50_seconds": self.quantile(0.5),
+            "p95_seconds": self.quantile(0.95),
+            "max_seconds": round(self.max, 3),
+            "buckets": dict(zip(labels, self.counts))
+        }
+
+class CommandExecutor:
+    """Exécution des commandes Discord sans bloquer l'event loop
+    
+    Les appels bloquants (client Neynar, accès base synchrones) passent par
+    un pool de threads borné : une commande lente ne retarde plus les
+    événements gateway des autres serveurs, et une rafale de commandes ne
+    crée pas un thread par appel. Chaque commande a un délai maximal et sa
+    latence est mesurée dans un histogramme par commande.
+    """
+    
+    def __init__(self, max_workers: int = None, timeout: float = None):
+        self.max_workers = max_workers or config.COMMAND_WORKERS
+        self.timeout = timeout if timeout is not None else config.COMMAND_TIMEOUT_SECONDS
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self.stats = {
+            "timeouts": 0,
+            "errors": 0,
+            "blocking_calls": 0
+        }
+    
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="command")
+        return self._pool
+    
+    async def run(self, func: Callable, *args, timeout: float = None, **kwargs) -> Any:
+        """Exécuter un appel bloquant dans le pool (délai propre optionnel)
+        
+        Sans délai propre, l'appel est borné par le délai de la commande. À
+        l'expiration, la commande reprend la main ; le thread termine son
+        appel en arrière-plan (les appels HTTP ont leur propre timeout).
+        """
+        self.stats["blocking_calls"] += 1
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._get_pool(), functools.partial(func, *args, **kwargs))
+        if timeout is None:
+            return await future
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise CommandTimeout(f"{getattr(func, '__name__', 'appel')} a dépassé le délai") from None
+    
+    async def invoke(self, name: str, coro: Awaitable, timeout: float = None) -> Any:
+        """Exécuter une commande sous son délai maximal et mesurer sa latence"""
+        started = time.monotonic()
+        try:
+            return await asyncio.wait_for(coro, timeout if timeout is not None else self.timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise CommandTimeout(f"la commande {name} a dépassé le délai") from None
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        finally:
+            self.observe(name, time.monotonic() - started)
+    
+    def observe(self, name: str, seconds: float):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram()
+        histogram.observe(seconds)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Latences par commande et compteurs du pool"""
+        return {
+            "workers": self.max_workers,
+            "timeout_seconds": self.timeout,
+            **self.stats,
+            "commands": {name: histogram.to_dict() for name, histogram in sorted(self.histograms.items())}
+        }
+    
+    def shutdown(self):
+        """Fermer le pool sans attendre les appels en cours"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            logger.info("🛑 Pool d'exécution des commandes fermé")
+
+# Instance globale de l'exécuteur
+_command_executor = None
+
+def get_command_executor() -> CommandExecutor:
+    """Obtenir l'exécuteur des commandes Discord"""
+    global _command_executor
+    
+    if _command_executor is None:
+        _command_executor = CommandExecutor()
+    
+    return _command_executor
@@ -1,5 +1,19 @@
 import os
-from typing import Optional
+from typing import List, Optional
+
+def parse_shard_ids(value: str) -> Optional[List[int]]:
+    """Convertir "0-3,8" en [0, 1, 2, 3, 8] (None si vide)"""
+    shard_ids = []
+    for part in value.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            start, end = part.split('-', 1)
+            shard_ids.extend(range(int(start), int(end) + 1))
+        else:
+            shard_ids.append(int(part))
+    return sorted(set(shard_ids)) or None
 
 class Config:
     """Configuration du bot Farcaster Tracker"""
@@ -8,11 +22,29 @@ class Config:
     DISCORD_TOKEN: str = os.getenv('DISCORD_TOKEN', '')
     DISCORD_APPLICATION_ID: str = os.getenv('DISCORD_APPLICATION_ID', '')
     
+    # Commandes : slash (toujours), préfixe "!" en plus (demande l'intent message_content), publication au démarrage
+    DISCORD_PREFIX_COMMANDS: bool = os.getenv('DISCORD_PREFIX_COMMANDS', 'false').lower() == 'true'
+    DISCORD_SYNC_COMMANDS: bool = os.getenv('DISCORD_SYNC_COMMANDS', 'true').lower() == 'true'
+    
+    # Sharding Discord : auto (Discord choisit le nombre), ou nombre total + shards de ce processus
+    DISCORD_AUTO_SHARD: bool = os.getenv('DISCORD_AUTO_SHARD', 'false').lower() == 'true'
+    DISCORD_SHARD_COUNT: int = int(os.getenv('DISCORD_SHARD_COUNT', '0'))
+    DISCORD_SHARD_IDS: Optional[List[int]] = parse_shard_ids(os.getenv('DISCORD_SHARD_IDS', ''))
+    
     # Neynar Configuration
     NEYNAR_API_KEY: str = os.getenv('NEYNAR_API_KEY', '')
     NEYNAR_WEBHOOK_SECRET: str = os.getenv('NEYNAR_WEBHOOK_SECRET', '')
     NEYNAR_WEBHOOK_ID: str = os.getenv('NEYNAR_WEBHOOK_ID', '01K45KREDQ77B80YD87AAXJ3E8')
     
+    # Webhook des follows (follow.created / follow.deleted) ; vide = détection par polling seul
+    NEYNAR_FOLLOW_WEBHOOK_ID: str = os.getenv('NEYNAR_FOLLOW_WEBHOOK_ID', '')
+    NEYNAR_FOLLOW_WEBHOOK_SECRET: str = os.getenv('NEYNAR_FOLLOW_WEBHOOK_SECRET', '')
+    
+    # Pool de webhooks (shards) pour les gros volumes de FIDs
+    NEYNAR_WEBHOOK_SHARD_IDS: list = [w.strip() for w in os.getenv('NEYNAR_WEBHOOK_SHARD_IDS', '').split(',') if w.strip()]
+    NEYNAR_WEBHOOK_SHARD_SIZE: int = int(os.getenv('NEYNAR_WEBHOOK_SHARD_SIZE', '1000'))
+    NEYNAR_WEBHOOK_AUTO_PROVISION: bool = os.getenv('NEYNAR_WEBHOOK_AUTO_PROVISION', 'false').lower() == 'true'
+    
     # Database Configuration
     DATABASE_URL: str = os.getenv('DATABASE_URL', '')
     
@@ -23,6 +55,74 @@ class Config:
     LOG_LEVEL: str = os.getenv('LOG_LEVEL', 'INFO')
     PORT: int = int(os.getenv('PORT', '8000'))
     
+    # Runtime : "unified" (FastAPI + Discord sur un seul event loop), "multiprocess"
+    # (ingestion des webhooks dans plusieurs processus) ou "threaded" (ancien mode)
+    RUNTIME_MODE: str = os.getenv('RUNTIME_MODE', 'unified').lower()
+    DELIVERY_WORKERS: int = int(os.getenv('DELIVERY_WORKERS', '4'))
+    INGEST_WORKERS: int = int(os.getenv('INGEST_WORKERS', '0'))  # 0 = un processus par cœur
+    INGEST_IPC_PATH: str = os.getenv('INGEST_IPC_PATH', '/tmp/farcaster-tracker-ingest.sock')
+    STARTUP_TIMEOUT_SECONDS: float = float(os.getenv('STARTUP_TIMEOUT_SECONDS', '60'))
+    SHUTDOWN_GRACE_SECONDS: float = float(os.getenv('SHUTDOWN_GRACE_SECONDS', '20'))
+    
+    # Commandes Discord : pool de threads des appels bloquants et délai maximal par commande
+    COMMAND_WORKERS: int = int(os.getenv('COMMAND_WORKERS', '8'))
+    COMMAND_TIMEOUT_SECONDS: float = float(os.getenv('COMMAND_TIMEOUT_SECONDS', '30'))
+    
+    # Import groupé (!track-bulk / !untrack-bulk) : nombre de comptes et taille de fichier maximum
+    TRACK_BULK_MAX_ACCOUNTS: int = int(os.getenv('TRACK_BULK_MAX_ACCOUNTS', '500'))
+    TRACK_BULK_MAX_FILE_BYTES: int = int(os.getenv('TRACK_BULK_MAX_FILE_BYTES', '262144'))
+    
+    # !list : comptes par page, durée de vie du résumé par guild en cache (invalidé par !track/!untrack)
+    LIST_PAGE_SIZE: int = int(os.getenv('LIST_PAGE_SIZE', '20'))
+    LIST_SUMMARY_CACHE_TTL_SECONDS: float = float(os.getenv('LIST_SUMMARY_CACHE_TTL_SECONDS', '300'))
+    # Autocomplétion des commandes slash : rechargement de l'annuaire local des profils
+    PROFILE_DIRECTORY_TTL_SECONDS: float = float(os.getenv('PROFILE_DIRECTORY_TTL_SECONDS', '300'))
+    
+    # Enregistrement groupé des livraisons
+    DELIVERY_BATCH_SIZE: int = int(os.getenv('DELIVERY_BATCH_SIZE', '50'))
+    DELIVERY_FLUSH_INTERVAL_SECONDS: float = float(os.getenv('DELIVERY_FLUSH_INTERVAL_SECONDS', '1'))
+    
+    # Multi-répliques : file de livraison partagée en base et élection d'un leader
+    MULTI_REPLICA: bool = os.getenv('MULTI_REPLICA', 'false').lower() == 'true'
+    DELIVERY_PARTITIONS: int = int(os.getenv('DELIVERY_PARTITIONS', '64'))
+    DELIVERY_CLAIM_BATCH: int = int(os.getenv('DELIVERY_CLAIM_BATCH', '20'))
+    DELIVERY_MAX_ATTEMPTS: int = int(os.getenv('DELIVERY_MAX_ATTEMPTS', '5'))
+    DELIVERY_POLL_INTERVAL_SECONDS: float = float(os.getenv('DELIVERY_POLL_INTERVAL_SECONDS', '1'))
+    LEADER_LOCK_KEY: int = int(os.getenv('LEADER_LOCK_KEY', '724201'))
+    LEADER_RETRY_SECONDS: float = float(os.getenv('LEADER_RETRY_SECONDS', '15'))
+    
+    # Regroupement des mises à jour du webhook (!track/!untrack en rafale)
+    WEBHOOK_SYNC_DEBOUNCE_SECONDS: float = float(os.getenv('WEBHOOK_SYNC_DEBOUNCE_SECONDS', '2'))
+    WEBHOOK_SYNC_MAX_DELAY_SECONDS: float = float(os.getenv('WEBHOOK_SYNC_MAX_DELAY_SECONDS', '10'))
+    
+    # Réconciliation du webhook au démarrage (tâche de fond)
+    WEBHOOK_RECONCILE_TIMEOUT_SECONDS: float = float(os.getenv('WEBHOOK_RECONCILE_TIMEOUT_SECONDS', '120'))
+    
+    # Détection périodique de dérive avec Neynar (0 = désactivée)
+    WEBHOOK_DRIFT_INTERVAL_SECONDS: float = float(os.getenv('WEBHOOK_DRIFT_INTERVAL_SECONDS', '900'))
+    
+    # Salon de repli des notifications de followings si le salon configuré n'existe plus
+    DEFAULT_CHANNEL_ID: str = os.getenv('DEFAULT_CHANNEL_ID', '')
+    
+    # Polling des followings : intervalle de départ, bornes de l'intervalle adaptatif, concurrence, jitter (fraction)
+    FOLLOWING_POLL_INTERVAL_SECONDS: float = float(os.getenv('FOLLOWING_POLL_INTERVAL_SECONDS', '60'))
+    FOLLOWING_POLL_MIN_INTERVAL_SECONDS: float = float(os.getenv('FOLLOWING_POLL_MIN_INTERVAL_SECONDS', '30'))
+    FOLLOWING_POLL_MAX_INTERVAL_SECONDS: float = float(os.getenv('FOLLOWING_POLL_MAX_INTERVAL_SECONDS', '900'))
+    FOLLOWING_POLL_CONCURRENCY: int = int(os.getenv('FOLLOWING_POLL_CONCURRENCY', '4'))
+    FOLLOWING_POLL_JITTER: float = float(os.getenv('FOLLOWING_POLL_JITTER', '0.1'))
+    # Notifications de followings : au-delà du seuil, une liste regroupée au lieu d'un embed par compte
+    FOLLOWING_GROUP_THRESHOLD: int = int(os.getenv('FOLLOWING_GROUP_THRESHOLD', '3'))
+    FOLLOWING_GROUP_PAGE_SIZE: int = int(os.getenv('FOLLOWING_GROUP_PAGE_SIZE', '25'))
+    # Polling de rattrapage quand les follows arrivent par webhook
+    FOLLOWING_RECONCILE_INTERVAL_SECONDS: float = float(os.getenv('FOLLOWING_RECONCILE_INTERVAL_SECONDS', '3600'))
+    # Instantané complet des followings tous les N deltas (sinon seuls les ajouts/retraits sont écrits)
+    FOLLOWING_SNAPSHOT_CHECKPOINT_EVERY: int = int(os.getenv('FOLLOWING_SNAPSHOT_CHECKPOINT_EVERY', '20'))
+    # Points de reprise du polling (dernière vérification, échéance) écrits par lots de N comptes
+    FOLLOWING_CHECKPOINT_BATCH_SIZE: int = int(os.getenv('FOLLOWING_CHECKPOINT_BATCH_SIZE', '50'))
+    
+    # Jeton des endpoints /admin (vide = endpoints désactivés)
+    ADMIN_API_TOKEN: str = os.getenv('ADMIN_API_TOKEN', '')
+    
     @classmethod
     def validate(cls) -> bool:
         """Valider que toutes les variables obligatoires sont présentes"""
@@ -1,9 +1,13 @@
-from sqlalchemy import create_engine, Column, String, Integer, DateTime, Boolean, Text
+from sqlalchemy import create_engine, inspect, Column, String, Integer, DateTime, Boolean, Text, Index, LargeBinary, Float
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.sql import func
 from typing import List, Optional
+from pathlib import Path
+import asyncio
 import logging
+import weakref
 from config import config
 
 # Configuration du logging
@@ -34,6 +38,15 @@ class TrackedAccount(Base):
     added_by_discord_user_id = Column(String, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    __table_args__ = (
+        # Un compte n'est suivi qu'une fois par salon ; sert aussi au listing par guild
+        Index("uq_tracked_accounts_guild_channel_fid", "guild_id", "channel_id", "fid", unique=True),
+        # Routage des webhooks : tous les salons qui suivent un FID
+        Index("ix_tracked_accounts_fid", "fid"),
+        # !list : pagination par curseur dans l'ordre salon, username
+        Index("ix_tracked_accounts_guild_channel_username", "guild_id", "channel_id", "username", "fid"),
+    )
 
 class Delivery(Base):
     """Table des livraisons pour éviter les doublons"""
@@ -44,21 +57,142 @@ class Delivery(Base):
     channel_id = Column(String, nullable=False)
     cast_hash = Column(String, nullable=False)
     delivered_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        # Anti-doublon par hash de cast (colonne de tête) et par salon
+        Index("uq_deliveries_cast_hash_channel", "cast_hash", "channel_id", unique=True),
+    )
+
+class TrackedFollowing(Base):
+    """Comptes Farcaster dont les nouveaux followings sont notifiés"""
+    __tablename__ = "tracked_followings"
+    
+    id = Column(String, primary_key=True)
+    guild_id = Column(String, nullable=False)
+    channel_id = Column(String, nullable=False)
+    target_fid = Column(Integer, nullable=False)
+    target_username = Column(String, nullable=False)
+    added_by_discord_user_id = Column(String, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        # Un compte n'est suivi qu'une fois par salon
+        Index("uq_tracked_followings_guild_channel_target", "guild_id", "channel_id", "target_fid", unique=True),
+        # Regroupement des salons par compte cible (polling)
+        Index("ix_tracked_followings_target_fid", "target_fid"),
+    )
+
+class FollowingState(Base):
+    """Dernière liste de followings connue par compte cible (instantané compact)"""
+    __tablename__ = "following_state"
+    
+    id = Column(String, primary_key=True)
+    target_fid = Column(Integer, nullable=False)
+    snapshot = Column(LargeBinary, nullable=False)  # FIDs triés, écarts en varint, zlib
+    snapshot_hash = Column(String, nullable=False)  # Hash de la liste courante (instantané + deltas)
+    following_count = Column(Integer, nullable=False, default=0)
+    deltas_since_checkpoint = Column(Integer, nullable=False, default=0)
+    last_check_at = Column(DateTime(timezone=True), server_default=func.now())
+    poll_interval = Column(Float)  # Intervalle adaptatif courant (secondes)
+    next_check_at = Column(DateTime(timezone=True))  # Échéance planifiée, reprise après redémarrage
+    
+    __table_args__ = (
+        Index("uq_following_state_target_fid", "target_fid", unique=True),
+    )
+
+class FollowingStateDelta(Base):
+    """Ajouts et retraits de followings depuis le dernier instantané complet"""
+    __tablename__ = "following_state_deltas"
+    
+    id = Column(String, primary_key=True)
+    target_fid = Column(Integer, nullable=False)
+    added = Column(LargeBinary, nullable=False)
+    removed = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        # Relecture des deltas d'un compte dans l'ordre
+        Index("ix_following_state_deltas_target_fid_created_at", "target_fid", "created_at"),
+    )
+
+class FollowingDelivery(Base):
+    """Notifications de followings envoyées, pour éviter les doublons"""
+    __tablename__ = "following_deliveries"
+    
+    id = Column(String, primary_key=True)
+    guild_id = Column(String, nullable=False)
+    channel_id = Column(String, nullable=False)
+    target_fid = Column(Integer, nullable=False)
+    new_following_fid = Column(Integer, nullable=False)
+    delivered_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        # Anti-doublon : une notification par (salon, compte cible, compte suivi)
+        Index(
+            "uq_following_deliveries_dedup",
+            "guild_id", "channel_id", "target_fid", "new_following_fid",
+            unique=True
+        ),
+    )
+
+class PendingDelivery(Base):
+    """Livraisons non envoyées à l'arrêt, rejouées au démarrage suivant"""
+    __tablename__ = "pending_deliveries"
+    
+    id = Column(String, primary_key=True)
+    guild_id = Column(String, nullable=False)
+    channel_id = Column(String, nullable=False)
+    cast_hash = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)  # Message complet (embed inclus) en JSON
+    partition = Column(Integer, nullable=False, default=0)  # Partition par salon (file partagée)
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        # Un même cast n'est mis en file qu'une fois par salon, même reçu par deux répliques
+        Index("uq_pending_deliveries_cast_hash_channel", "cast_hash", "channel_id", unique=True),
+        # Réclamation d'une partition dans l'ordre d'arrivée
+        Index("ix_pending_deliveries_partition_created_at", "partition", "created_at"),
+    )
 
 class WebhookState(Base):
-    """État du webhook Neynar (singleton)"""
+    """Webhooks Neynar du pool ("singleton" = webhook principal, puis un par shard)"""
     __tablename__ = "webhook_state"
     
     id = Column(String, primary_key=True, default="singleton")
     webhook_id = Column(String, nullable=False)
     active = Column(Boolean, default=True)
-    author_fids = Column(Text, nullable=False)  # JSON string des FIDs
+    secret = Column(String, nullable=True)  # Secret de signature des shards créés automatiquement
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+class WebhookSubscription(Base):
+    """FIDs abonnés à un webhook Neynar (une ligne par FID)"""
+    __tablename__ = "webhook_subscriptions"
+    
+    # Clé primaire (webhook_id, fid) : appartenance et diff en O(log N) côté SQL
+    webhook_id = Column(String, primary_key=True)
+    fid = Column(Integer, primary_key=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        # Un FID appartient à un seul webhook du pool
+        Index("uq_webhook_subscriptions_fid", "fid", unique=True),
+    )
+
 # Variables globales pour l'engine et SessionLocal
 engine = None
 SessionLocal = None
 
+# Engines asynchrones, un par event loop (les connexions asyncpg sont liées à leur loop)
+_async_sessions = weakref.WeakKeyDictionary()
+
+def build_async_database_url(database_url: str) -> str:
+    """Convertir DATABASE_URL vers le driver asynchrone asyncpg"""
+    for prefix in ("postgres://", "postgresql://", "postgresql+psycopg2://"):
+        if database_url.startswith(prefix):
+            return "postgresql+asyncpg://" + database_url[len(prefix):]
+    return database_url
+
 def init_database_connection():
     """Initialiser la connexion à la base de données"""
     global engine, SessionLocal
@@ -93,13 +227,98 @@ def get_session_local():
     
     return SessionLocal
 
+def init_async_database_connection() -> async_sessionmaker:
+    """Initialiser l'engine asynchrone pour l'event loop courant"""
+    loop = asyncio.get_running_loop()
+    
+    if loop not in _async_sessions:
+        try:
+            logger.info("Initialisation de la connexion asynchrone à la base de données...")
+            async_engine = create_async_engine(
+                build_async_database_url(config.DATABASE_URL),
+                pool_pre_ping=True
+            )
+            _async_sessions[loop] = async_sessionmaker(
+                bind=async_engine,
+                class_=AsyncSession,
+                autoflush=False,
+                expire_on_commit=False
+            )
+            logger.info("Connexion asynchrone à la base de données initialisée avec succès")
+        except Exception as e:
+            logger.error(f"Erreur lors de l'initialisation de la base asynchrone: {e}")
+            raise
+    
+    return _async_sessions[loop]
+
+def get_async_session_local() -> async_sessionmaker:
+    """Obtenir la fabrique de sessions asynchrones pour l'event loop courant
+    
+    À utiliser depuis les coroutines (commandes Discord, webhooks, polling).
+    Les scripts et le code synchrone continuent d'utiliser get_session_local().
+    """
+    loop = asyncio.get_running_loop()
+    session_factory = _async_sessions.get(loop)
+    
+    if session_factory is None:
+        session_factory = init_async_database_connection()
+    
+    return session_factory
+
+def get_async_engine():
+    """Engine asynchrone de l'event loop courant (connexions dédiées, verrous de session)"""
+    return get_async_session_local().kw["bind"]
+
+async def dispose_async_engine():
+    """Fermer le pool de connexions asynchrones de l'event loop courant"""
+    session_factory = _async_sessions.pop(asyncio.get_running_loop(), None)
+    if session_factory is not None:
+        await session_factory.kw["bind"].dispose()
+        logger.info("Pool de connexions asynchrones fermé")
+
+# Révision Alembic correspondant au schéma historique créé par create_all
+BASELINE_REVISION = "0001"
+
+def get_alembic_config():
+    """Construire la configuration Alembic du projet"""
+    from alembic.config import Config as AlembicConfig
+    
+    root = Path(__file__).resolve().parent
+    alembic_cfg = AlembicConfig(str(root / "alembic.ini"))
+    alembic_cfg.set_main_option("script_location", str(root / "migrations"))
+    return alembic_cfg
+
+def run_migrations():
+    """Appliquer les migrations Alembic jusqu'à la dernière révision"""
+    from alembic import command
+    
+    if engine is None:
+        init_database_connection()
+    
+    alembic_cfg = get_alembic_config()
+    
+    with engine.begin() as connection:
+        alembic_cfg.attributes["connection"] = connection
+        tables = inspect(connection).get_table_names()
+        
+        # Base créée avant Alembic (create_all) : marquer le schéma de départ
+        if "alembic_version" not in tables and "tracked_accounts" in tables:
+            logger.info(f"Schéma existant sans historique Alembic, marquage en révision {BASELINE_REVISION}")
+            command.stamp(alembic_cfg, BASELINE_REVISION)
+    
+    # Nouvelle connexion : certaines migrations ont besoin d'un bloc autocommit
+    with engine.connect() as connection:
+        alembic_cfg.attributes["connection"] = connection
+        command.upgrade(alembic_cfg, "head")
+        connection.commit()
+
 def init_db():
-    """Initialiser la base de données"""
+    """Initialiser la base de données via les migrations Alembic"""
     if engine is None:
         init_database_connection()
     
     try:
-        Base.metadata.create_all(bind=engine)
+        run_migrations()
         logger.info("Base de données initialisée avec succès")
     except Exception as e:
         logger.error(f"Erreur lors de l'initialisation de la base: {e}")
@@ -0,0 +1,276 @@
+import asyncio
+import json
+import logging
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from database import get_async_session_local, Delivery, PendingDelivery
+from config import config
+
+logger = logging.getLogger(__name__)
+
+class DeliveryRecorder:
+    """Enregistrement groupé des livraisons Discord
+    
+    Les livraisons envoyées sont accumulées puis insérées en une seule
+    requête (ON CONFLICT DO NOTHING sur l'index anti-doublon) quand le lot
+    est plein ou après un court délai. Les hashs en attente restent visibles
+    pour l'anti-doublon du webhook tant qu'ils ne sont pas en base.
+    """
+    
+    def __init__(self, batch_size: int = None, flush_interval: float = None):
+        self.batch_size = batch_size or config.DELIVERY_BATCH_SIZE
+        self.flush_interval = flush_interval if flush_interval is not None else config.DELIVERY_FLUSH_INTERVAL_SECONDS
+        self.pending: List[Dict[str, str]] = []
+        self.pending_keys: Set[Tuple[str, str]] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self.stats = {
+            "recorded": 0,
+            "flushes": 0,
+            "failures": 0
+        }
+    
+    def record(self, guild_id: str, channel_id: str, cast_hash: str):
+        """Ajouter une livraison au lot (retour immédiat)"""
+        key = (cast_hash, str(channel_id))
+        if key in self.pending_keys:
+            return
+        
+        self.pending_keys.add(key)
+        self.pending.append({
+            "id": str(uuid.uuid4()),
+            "guild_id": guild_id,
+            "channel_id": str(channel_id),
+            "cast_hash": cast_hash
+        })
+        
+        if len(self.pending) >= self.batch_size:
+            asyncio.create_task(self.flush())
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+    
+    def is_pending(self, cast_hash: str) -> bool:
+        """Le cast a-t-il une livraison pas encore écrite en base ?"""
+        return any(key[0] == cast_hash for key in self.pending_keys)
+    
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+    
+    async def flush(self) -> int:
+        """Écrire le lot en attente en une requête, retourne le nombre de lignes envoyées"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        
+        async with self._flush_lock:
+            if not self.pending:
+                return 0
+            
+            batch = self.pending
+            self.pending = []
+            
+            db = get_async_session_local()()
+            try:
+                await db.execute(
+                    pg_insert(Delivery)
+                    .values(batch)
+                    .on_conflict_do_nothing(index_elements=["cast_hash", "channel_id"])
+                )
+                await db.commit()
+                self.stats["recorded"] += len(batch)
+                self.stats["flushes"] += 1
+                logger.info(f"✅ {len(batch)} livraison(s) enregistrée(s)")
+            except Exception as e:
+                await db.rollback()
+                # Garder le lot pour la prochaine tentative
+                self.stats["failures"] += 1
+                self.pending = batch + self.pending
+                logger.error(f"❌ Erreur lors de l'enregistrement des livraisons: {e}")
+                return 0
+            finally:
+                await db.close()
+            
+            for row in batch:
+                self.pending_keys.discard((row["cast_hash"], row["channel_id"]))
+            return len(batch)
+
+# Espace de noms des verrous consultatifs de partition (pg_try_advisory_xact_lock(ns, partition))
+DELIVERY_LOCK_NAMESPACE = 7242
+
+def delivery_partition(channel_id) -> int:
+    """Partition d'un salon dans la file partagée (ordre conservé par salon)"""
+    return int(channel_id) % config.DELIVERY_PARTITIONS
+
+def pending_delivery_rows(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Lignes pending_deliveries pour des messages à livrer"""
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "guild_id": message['guild_id'],
+            "channel_id": str(message['channel_id']),
+            "cast_hash": message['cast_hash'],
+            "payload": json.dumps(message),
+            "partition": delivery_partition(message['channel_id'])
+        }
+        for message in messages
+    ]
+
+async def insert_pending_deliveries(messages: List[Dict[str, Any]]) -> int:
+    """Insérer des messages dans pending_deliveries (doublons ignorés), retourne le nombre inséré"""
+    if not messages:
+        return 0
+    
+    db = get_async_session_local()()
+    try:
+        result = await db.execute(
+            pg_insert(PendingDelivery)
+            .values(pending_delivery_rows(messages))
+            .on_conflict_do_nothing(index_elements=["cast_hash", "channel_id"])
+            .returning(PendingDelivery.id)
+        )
+        inserted = len(result.scalars().all())
+        await db.commit()
+        return inserted
+    except Exception:
+        await db.rollback()
+        raise
+    finally:
+        await db.close()
+
+async def persist_pending_deliveries(messages: List[Dict[str, Any]]) -> int:
+    """Sauvegarder en base des messages non envoyés (arrêt du processus)"""
+    if not messages:
+        return 0
+    
+    try:
+        await insert_pending_deliveries(messages)
+        logger.info(f"💾 {len(messages)} livraison(s) en attente sauvegardée(s) pour le prochain démarrage")
+        return len(messages)
+    except Exception as e:
+        logger.error(f"❌ Impossible de sauvegarder {len(messages)} livraison(s) en attente: {e}")
+        return 0
+
+async def list_pending_partitions() -> List[int]:
+    """Partitions de la file partagée ayant des livraisons en attente"""
+    db = get_async_session_local()()
+    try:
+        result = await db.execute(select(PendingDelivery.partition).distinct())
+        return list(result.scalars())
+    finally:
+        await db.close()
+
+async def count_pending_deliveries() -> int:
+    """Nombre de livraisons en attente dans la file partagée"""
+    db = get_async_session_local()()
+    try:
+        return (await db.execute(select(func.count()).select_from(PendingDelivery))).scalar_one()
+    finally:
+        await db.close()
+
+async def process_partition(partition: int, deliver: Callable[[Dict[str, Any]], Awaitable[bool]], limit: int = None) -> Optional[int]:
+    """Réclamer une partition et livrer ses messages dans l'ordre
+    
+    Le verrou consultatif de transaction garantit qu'une seule réplique sert
+    une partition (donc un salon) à la fois ; SKIP LOCKED évite d'attendre
+    les lignes d'une transaction concurrente. Les messages livrés sont
+    retirés de la file et enregistrés dans deliveries dans la même
+    transaction. Au premier échec, la partition s'arrête là : la ligne en
+    échec est retentée avant les suivantes. Retourne None si la partition
+    est prise ailleurs.
+    """
+    limit = limit or config.DELIVERY_CLAIM_BATCH
+    db = get_async_session_local()()
+    try:
+        locked = (await db.execute(
+            select(func.pg_try_advisory_xact_lock(DELIVERY_LOCK_NAMESPACE, partition))
+        )).scalar()
+        if not locked:
+            await db.rollback()
+            return None
+        
+        rows = (await db.execute(
+            select(PendingDelivery)
+            .where(PendingDelivery.partition == partition)
+            .order_by(PendingDelivery.created_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )).scalars().all()
+        
+        done_ids, delivered = [], []
+        for row in rows:
+            message_data = json.loads(row.payload)
+            try:
+                sent = await deliver(message_data)
+            except Exception as e:
+                # Ne pas annuler la transaction : les messages déjà envoyés doivent sortir de la file
+                logger.error(f"❌ Erreur lors de la livraison de {row.cast_hash} dans {row.channel_id}: {e}")
+                sent = False
+            
+            if sent:
+                done_ids.append(row.id)
+                if message_data.get('kind') == 'following':
+                    continue  # Enregistrée dans following_deliveries par la livraison
+                delivered.append({
+                    "id": str(uuid.uuid4()),
+                    "guild_id": row.guild_id,
+                    "channel_id": row.channel_id,
+                    "cast_hash": row.cast_hash
+                })
+            elif row.attempts + 1 >= config.DELIVERY_MAX_ATTEMPTS:
+                logger.error(f"❌ Livraison {row.cast_hash} abandonnée dans {row.channel_id} après {row.attempts + 1} tentative(s)")
+                done_ids.append(row.id)
+            else:
+                # Les messages suivants attendent la prochaine réclamation : l'ordre dans le salon est gardé
+                row.attempts += 1
+                break
+        
+        if done_ids:
+            await db.execute(delete(PendingDelivery).where(PendingDelivery.id.in_(done_ids)))
+        if delivered:
+            await db.execute(
+                pg_insert(Delivery)
+                .values(delivered)
+                .on_conflict_do_nothing(index_elements=["cast_hash", "channel_id"])
+            )
+        await db.commit()
+        return len(delivered)
+    except Exception:
+        await db.rollback()
+        raise
+    finally:
+        await db.close()
+
+async def take_pending_deliveries() -> List[Dict[str, Any]]:
+    """Récupérer et retirer les livraisons sauvegardées au dernier arrêt"""
+    db = get_async_session_local()()
+    try:
+        rows = (await db.execute(
+            select(PendingDelivery).order_by(PendingDelivery.created_at).with_for_update(skip_locked=True)
+        )).scalars().all()
+        if not rows:
+            return []
+        
+        await db.execute(delete(PendingDelivery).where(PendingDelivery.id.in_([row.id for row in rows])))
+        await db.commit()
+        logger.info(f"📥 {len(rows)} livraison(s) en attente reprise(s) depuis le dernier arrêt")
+        return [json.loads(row.payload) for row in rows]
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"❌ Erreur lors de la reprise des livraisons en attente: {e}")
+        return []
+    finally:
+        await db.close()
+
+# Instance globale de l'enregistreur
+_delivery_recorder = None
+
+def get_delivery_recorder() -> DeliveryRecorder:
+    """Obtenir l'enregistreur de livraisons"""
+    global _delivery_recorder
+    
+    if _delivery_recorder is None:
+        _delivery_recorder = DeliveryRecorder()
+    
+    return _delivery_recorder
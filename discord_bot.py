@@ -1,23 +1,154 @@
+import asyncio
+import functools
 import discord
+from discord import app_commands
+import io
+import time
 from discord.ext import commands
 import logging
 import uuid
 from typing import Optional
-from database import get_session_local, Guild, TrackedAccount, Delivery
+from sqlalchemy import select, delete
+from database import get_async_session_local, Guild, TrackedAccount, TrackedFollowing, Delivery
 from neynar_client import get_neynar_client
-from webhook_sync import sync_neynar_webhook, add_fids_to_webhook, remove_fids_from_webhook, force_webhook_fixe
+from webhook_sync import sync_neynar_webhook, force_webhook_fixe, sync_follow_webhook
+from subscription_updater import schedule_subscription_update, schedule_follow_sync, get_subscription_updater
+from drift_detector import get_drift_detector
+from leader_election import get_leader_election
+from following_polling import start_following_polling, stop_following_polling
+from command_executor import get_command_executor, CommandTimeout
+from tracked_list import send_tracked_list, invalidate_guild_summary
+from command_autocomplete import (
+    known_profile_autocomplete, guild_tracked_autocomplete, guild_following_autocomplete, get_profile_directory
+)
+from bulk_tracking import (
+    parse_identifiers, resolve_identifiers, track_accounts_bulk, untrack_accounts_bulk, read_identifier_attachments
+)
 from config import config
 
 # Configuration du logging
 logging.basicConfig(level=getattr(logging, config.LOG_LEVEL))
 logger = logging.getLogger(__name__)
 
-# Configuration du bot Discord
-intents = discord.Intents.default()
-intents.message_content = True
-intents.guilds = True
+def gateway_options(prefix_commands: bool = None) -> dict:
+    """Intents et caches du client Discord (profil minimal)
+    
+    Les commandes slash arrivent par interactions et la livraison ne fait que
+    chercher un salon : seul l'intent guilds (serveurs et salons en cache) est
+    nécessaire. Messages et contenu ne sont reçus que pour les anciennes
+    commandes "!". Aucun message ni membre n'est gardé en cache, et les
+    membres ne sont pas demandés au démarrage.
+    """
+    if prefix_commands is None:
+        prefix_commands = config.DISCORD_PREFIX_COMMANDS
+    
+    intents = discord.Intents.none()
+    intents.guilds = True
+    intents.guild_messages = prefix_commands
+    intents.message_content = prefix_commands
+    
+    return {
+        "intents": intents,
+        "max_messages": None,  # 0 serait remplacé par 1000 par discord.py
+        "member_cache_flags": discord.MemberCacheFlags.none(),
+        "chunk_guilds_at_startup": False
+    }
+
+# Sans les commandes "!", aucun message n'est reçu : le préfixe mention ne sert qu'à discord.py
+command_prefix = commands.when_mentioned_or('!') if config.DISCORD_PREFIX_COMMANDS else commands.when_mentioned
+
+class TrackerBotMixin:
+    """Commandes exécutées sous délai maximal (extras={'timeout': ...} pour l'ajuster), latence mesurée par commande
+    
+    Le délai enveloppe le corps de chaque commande hybride : il s'applique
+    de la même façon aux commandes slash et aux commandes préfixées, sans
+    dépendre des internes de discord.py (seules les API publiques
+    hybrid_command et Context sont utilisées).
+    """
+    
+    async def setup_hook(self):
+        await sync_application_commands(self)
+    
+    def hybrid_command(self, *args, **kwargs):
+        decorator = super().hybrid_command(*args, **kwargs)
+        return lambda func: decorator(timed_command(func))
+
+def timed_command(func):
+    """Exécuter le corps d'une commande sous son délai maximal et mesurer sa latence"""
+    @functools.wraps(func)
+    async def wrapper(ctx, *args, **kwargs):
+        try:
+            return await get_command_executor().invoke(
+                ctx.command.qualified_name, func(ctx, *args, **kwargs), ctx.command.extras.get('timeout')
+            )
+        except CommandTimeout as e:
+            origin = 'slash' if ctx.interaction is not None else 'préfixe'
+            logger.error(f"⏱️ {e} ({origin}, {ctx.guild.name if ctx.guild else 'message privé'})")
+            await ctx.reply(
+                "⏱️ La commande a pris trop de temps et a été interrompue. Réessayez dans quelques instants.",
+                ephemeral=True
+            )
+    return wrapper
+
+class TrackerBot(TrackerBotMixin, commands.Bot):
+    pass
+
+class ShardedTrackerBot(TrackerBotMixin, commands.AutoShardedBot):
+    pass
+
+async def sync_application_commands(client):
+    """Publier les commandes slash auprès de Discord (un seul processus : celui du shard 0)"""
+    if not config.DISCORD_SYNC_COMMANDS:
+        return
+    shard_ids = getattr(client, 'shard_ids', None)
+    if shard_ids is not None and 0 not in shard_ids:
+        return
+    
+    try:
+        synced = await client.tree.sync()
+        logger.info(f"⚡ {len(synced)} commande(s) slash synchronisée(s)")
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de la synchronisation des commandes slash: {e}")
 
-bot = commands.Bot(command_prefix='!', intents=intents)
+def create_bot() -> commands.Bot:
+    """Créer le client Discord, shardé si configuré"""
+    if config.DISCORD_AUTO_SHARD or config.DISCORD_SHARD_COUNT or config.DISCORD_SHARD_IDS:
+        # shard_ids sans shard_count est refusé par discord.py
+        logger.info(
+            f"🧩 Client Discord shardé (total: {config.DISCORD_SHARD_COUNT or 'auto'}, "
+            f"shards de ce processus: {config.DISCORD_SHARD_IDS or 'tous'})"
+        )
+        return ShardedTrackerBot(
+            command_prefix=command_prefix,
+            shard_count=config.DISCORD_SHARD_COUNT or None,
+            shard_ids=config.DISCORD_SHARD_IDS,
+            **gateway_options()
+        )
+    
+    return TrackerBot(command_prefix=command_prefix, **gateway_options())
+
+bot = create_bot()
+
+def guild_shard_id(guild_id) -> int:
+    """Shard Discord d'une guild (formule documentée par Discord)"""
+    return (int(guild_id) >> 22) % (bot.shard_count or 1)
+
+def owns_guild(guild_id) -> bool:
+    """La guild est-elle servie par un shard de ce processus ?"""
+    shard_ids = getattr(bot, 'shard_ids', None)
+    return shard_ids is None or guild_shard_id(guild_id) in shard_ids
+
+def resolve_channel(channel_id: int, guild_id=None):
+    """Trouver un salon pour y envoyer un message
+    
+    Depuis le cache si sa guild est sur un shard de ce processus, sinon via
+    un salon partiel : l'envoi passe par l'API REST, qui ne dépend pas du
+    shard gateway.
+    """
+    channel = bot.get_channel(channel_id)
+    if channel is None and guild_id is not None and not owns_guild(guild_id):
+        channel = bot.get_partial_messageable(channel_id, guild_id=int(guild_id))
+    return channel
 
 @bot.event
 async def on_ready():
@@ -26,13 +157,50 @@ async def on_ready():
     logger.info(f'ID du bot: {bot.user.id}')
     logger.info(f'Serveurs connectés: {len(bot.guilds)}')
     
-    # FORCER l'utilisation du webhook fixe 01K45KREDQ77B80YD87AAXJ3E8 au démarrage
+    if config.MULTI_REPLICA and config.RUNTIME_MODE != "threaded":
+        # Plusieurs répliques : seule celle qui détient le verrou de leader lance les tâches uniques
+        election = get_leader_election()
+        if not election.jobs:
+            register_leader_jobs(election)
+        election.start()
+    else:
+        await start_singleton_jobs()
+
+async def start_singleton_jobs():
+    """Tâches qui ne doivent tourner que sur une instance à la fois"""
+    # Réconcilier le webhook en arrière-plan : le bot répond aux commandes immédiatement
+    if not get_subscription_updater().start_reconciliation():
+        logger.info("🔁 Reconnexion au gateway, réconciliation du webhook déjà lancée")
+    
+    if config.WEBHOOK_DRIFT_INTERVAL_SECONDS > 0:
+        get_drift_detector().start()
+    
+    if config.NEYNAR_FOLLOW_WEBHOOK_ID:
+        asyncio.create_task(sync_follow_subscriptions(force=True))
+    await start_following_polling(bot)
+
+async def sync_follow_subscriptions(force: bool = False):
+    """Mettre à jour le webhook des follows hors de l'event loop"""
     try:
-        force_webhook_fixe()
-        logger.info("🔒 Webhook fixe 01K45KREDQ77B80YD87AAXJ3E8 forcé au démarrage")
+        await asyncio.to_thread(sync_follow_webhook, force)
     except Exception as e:
-        logger.error(f"Erreur lors du forçage du webhook fixe: {e}")
-        logger.info("Forçage du webhook fixe échoué - utilisez !test-neynar pour tester")
+        logger.error(f"❌ Erreur lors de la synchronisation du webhook des follows: {e}")
+        logger.warning("⚠️ Les nouveaux followings seront détectés par le polling de rattrapage")
+
+async def stop_singleton_jobs():
+    """Arrêter les tâches uniques (perte du leadership)"""
+    await get_drift_detector().stop()
+    await stop_following_polling()
+
+def register_leader_jobs(election):
+    """Déclarer les tâches uniques auprès de l'élection du leader"""
+    election.add_job("synchronisation du webhook", start_singleton_jobs, stop_singleton_jobs)
+
+@bot.event
+async def on_shard_ready(shard_id):
+    """Événement déclenché quand un shard est connecté (client shardé)"""
+    guilds = sum(1 for guild in bot.guilds if guild.shard_id == shard_id)
+    logger.info(f"🧩 Shard {shard_id}/{bot.shard_count} prêt ({guilds} serveur(s))")
 
 @bot.event
 async def on_guild_join(guild):
@@ -41,22 +209,24 @@ async def on_guild_join(guild):
         logger.info(f'Bot rejoint le serveur: {guild.name} (ID: {guild.id})')
         
         # Créer l'entrée de guild en base
-        db = get_session_local()()
+        db = get_async_session_local()()
         try:
-            existing_guild = db.query(Guild).filter_by(id=str(guild.id)).first()
+            existing_guild = await db.get(Guild, str(guild.id))
             if not existing_guild:
                 new_guild = Guild(id=str(guild.id))
                 db.add(new_guild)
-                db.commit()
+                await db.commit()
                 logger.info(f"Guild {guild.name} ajoutée à la base de données")
         except Exception as e:
             logger.error(f"Erreur lors de l'ajout de la guild {guild.name}: {e}")
         finally:
-            db.close()
+            await db.close()
     except Exception as e:
         logger.error(f"Erreur générale dans on_guild_join: {e}")
 
-@bot.command(name='track')
+@bot.hybrid_command(name='track')
+@app_commands.describe(fid_or_username="FID ou username Farcaster", channel="Salon des notifications (salon courant par défaut)")
+@app_commands.autocomplete(fid_or_username=known_profile_autocomplete)
 async def track_command(ctx, fid_or_username: str, channel: Optional[discord.TextChannel] = None):
     """Commande pour tracker un compte Farcaster"""
     try:
@@ -65,6 +235,9 @@ async def track_command(ctx, fid_or_username: str, channel: Optional[discord.Tex
             await ctx.reply("❌ Cette commande ne peut être utilisée que dans un serveur.")
             return
         
+        # Appels Neynar : accuser réception de l'interaction avant les 3 s imposées par Discord
+        await ctx.defer()
+        
         # Déterminer le salon cible
         target_channel = channel or ctx.channel
         
@@ -83,7 +256,7 @@ async def track_command(ctx, fid_or_username: str, channel: Optional[discord.Tex
             logger.info(f"🔧 Client Neynar valide: {type(client).__name__}")
             logger.info(f"🔧 Méthodes disponibles: {[m for m in dir(client) if not m.startswith('_')]}")
             
-            user = client.resolve_user(fid_or_username)
+            user = await get_command_executor().run(client.resolve_user, fid_or_username)
             logger.info(f"🔧 Utilisateur résolu: {user}")
             
             if user is None:
@@ -98,13 +271,16 @@ async def track_command(ctx, fid_or_username: str, channel: Optional[discord.Tex
             return
         
         # Vérifier si le compte est déjà suivi dans ce salon
-        db = get_session_local()()
+        db = get_async_session_local()()
         try:
-            existing = db.query(TrackedAccount).filter_by(
-                guild_id=str(ctx.guild.id),
-                channel_id=str(target_channel.id),
-                fid=user['fid']
-            ).first()
+            result = await db.execute(
+                select(TrackedAccount).filter_by(
+                    guild_id=str(ctx.guild.id),
+                    channel_id=str(target_channel.id),
+                    fid=user['fid']
+                )
+            )
+            existing = result.scalars().first()
             
             if existing:
                 await ctx.reply(f"❌ Le compte `{user['username']}` (FID: {user['fid']}) est déjà suivi dans ce salon.")
@@ -121,19 +297,15 @@ async def track_command(ctx, fid_or_username: str, channel: Optional[discord.Tex
             )
             
             db.add(tracked_account)
-            db.commit()
+            await db.commit()
+            invalidate_guild_summary(ctx.guild.id)
+            get_profile_directory().invalidate()
             
-            # Ajouter le FID au webhook existant SANS le recréer
+            # Ajouter le FID au webhook en arrière-plan (regroupé avec les autres changements)
             try:
-                # Convertir le FID en string pour la compatibilité
-                fid_to_add = str(user['fid'])
-                success = add_fids_to_webhook([fid_to_add])
-                if success:
-                    logger.info(f"✅ FID {fid_to_add} ajouté au webhook existant 01K45KREDQ77B80YD87AAXJ3E8")
-                else:
-                    logger.warning(f"⚠️ Impossible d'ajouter le FID {fid_to_add} au webhook, mais le compte est tracké localement")
+                schedule_subscription_update([int(user['fid'])])
             except Exception as e:
-                logger.error(f"❌ Erreur lors de l'ajout du FID au webhook: {e}")
+                logger.error(f"❌ Erreur lors de la programmation de l'ajout du FID au webhook: {e}")
                 logger.warning("⚠️ Le compte est tracké localement, mais le webhook n'a pas été mis à jour")
             
             await ctx.reply(f"✅ Compte Farcaster `{user['username']}` (FID: {user['fid']}) ajouté au suivi dans {target_channel.mention} !")
@@ -141,13 +313,15 @@ async def track_command(ctx, fid_or_username: str, channel: Optional[discord.Tex
             logger.info(f"Compte Farcaster {user['username']} (FID: {user['fid']}) ajouté au tracking par {ctx.author.name} dans {ctx.guild.name}")
             
         finally:
-            db.close()
+            await db.close()
             
     except Exception as e:
         logger.error(f"Erreur dans la commande track: {e}")
         await ctx.reply(f"❌ Une erreur est survenue: {str(e)}")
 
-@bot.command(name='untrack')
+@bot.hybrid_command(name='untrack')
+@app_commands.describe(fid_or_username="FID ou username Farcaster")
+@app_commands.autocomplete(fid_or_username=guild_tracked_autocomplete)
 async def untrack_command(ctx, fid_or_username: str):
     """Commande pour arrêter de tracker un compte Farcaster"""
     try:
@@ -155,13 +329,15 @@ async def untrack_command(ctx, fid_or_username: str):
             await ctx.reply("❌ Cette commande ne peut être utilisée que dans un serveur.")
             return
         
+        await ctx.defer()
+        
         # Résoudre l'utilisateur Farcaster
         try:
             if get_neynar_client() is None:
                 await ctx.reply("❌ Erreur: Client Neynar non initialisé. Vérifiez la configuration.")
                 return
                 
-            user = get_neynar_client().resolve_user(fid_or_username)
+            user = await get_command_executor().run(get_neynar_client().resolve_user, fid_or_username)
             if user is None:
                 await ctx.reply(f"❌ Impossible de résoudre l'utilisateur `{fid_or_username}`. Vérifiez que le FID ou le nom d'utilisateur est correct.")
                 return
@@ -170,28 +346,27 @@ async def untrack_command(ctx, fid_or_username: str):
             return
         
         # Supprimer le compte du suivi
-        db = get_session_local()()
+        db = get_async_session_local()()
         try:
             # Supprimer tous les suivis de ce compte dans cette guild
-            deleted_count = db.query(TrackedAccount).filter_by(
-                guild_id=str(ctx.guild.id),
-                fid=user['fid']
-            ).delete()
+            result = await db.execute(
+                delete(TrackedAccount).filter_by(
+                    guild_id=str(ctx.guild.id),
+                    fid=user['fid']
+                )
+            )
+            deleted_count = result.rowcount
             
             if deleted_count > 0:
-                db.commit()
+                await db.commit()
+                invalidate_guild_summary(ctx.guild.id)
+                get_profile_directory().invalidate()
                 
-                # Retirer le FID du webhook existant SANS le recréer
+                # Retirer le FID du webhook en arrière-plan (regroupé avec les autres changements)
                 try:
-                    # Convertir le FID en string pour la compatibilité
-                    fid_to_remove = str(user['fid'])
-                    success = remove_fids_from_webhook([fid_to_remove])
-                    if success:
-                        logger.info(f"✅ FID {fid_to_remove} retiré du webhook existant 01K45KREDQ77B80YD87AAXJ3E8")
-                    else:
-                        logger.warning(f"⚠️ Impossible de retirer le FID {fid_to_remove} du webhook, mais le compte est untracké localement")
+                    schedule_subscription_update([int(user['fid'])])
                 except Exception as e:
-                    logger.error(f"❌ Erreur lors du retrait du FID du webhook: {e}")
+                    logger.error(f"❌ Erreur lors de la programmation du retrait du FID du webhook: {e}")
                     logger.warning("⚠️ Le compte est untracké localement, mais le webhook n'a pas été mis à jour")
                 
                 await ctx.reply(f"✅ Compte Farcaster `{user['username']}` (FID: {user['fid']}) supprimé du suivi !")
@@ -200,58 +375,275 @@ async def untrack_command(ctx, fid_or_username: str):
                 await ctx.reply(f"❌ Le compte `{user['username']}` (FID: {user['fid']}) n'était pas suivi dans ce serveur.")
                 
         finally:
-            db.close()
+            await db.close()
             
     except Exception as e:
         logger.error(f"Erreur dans la commande untrack: {e}")
         await ctx.reply(f"❌ Une erreur est survenue: {str(e)}")
 
-@bot.command(name='list')
-async def list_command(ctx):
-    """Commande pour lister tous les comptes suivis"""
+async def collect_bulk_identifiers(ctx, identifiers: str, fichier: Optional[discord.Attachment]):
+    """Identifiants de la liste et du fichier joint, sans doublons ; None si la commande a déjà répondu"""
+    try:
+        values = parse_identifiers(identifiers) + await read_identifier_attachments([fichier] if fichier else [])
+    except ValueError as e:
+        await ctx.reply(f"❌ {e}")
+        return None
+    values = list(dict.fromkeys(values))
+    
+    if not values:
+        await ctx.reply("❌ Aucun identifiant trouvé. Indiquez des FIDs ou usernames, ou joignez un fichier .csv / .txt.")
+        return None
+    if len(values) > config.TRACK_BULK_MAX_ACCOUNTS:
+        await ctx.reply(f"❌ {len(values)} comptes demandés, maximum {config.TRACK_BULK_MAX_ACCOUNTS} par commande.")
+        return None
+    return values
+
+async def resolve_with_progress(message, identifiers):
+    """Résoudre les identifiants en affichant l'avancement (message édité au plus toutes les 2 s)"""
+    last_edit = time.monotonic()
+    
+    async def progress(done: int, total: int):
+        nonlocal last_edit
+        if done < total and time.monotonic() - last_edit < 2:
+            return
+        last_edit = time.monotonic()
+        try:
+            await message.edit(content=f"⏳ Résolution des comptes : {done}/{total}")
+        except discord.HTTPException:
+            pass
+    
+    return await resolve_identifiers(identifiers, progress)
+
+async def send_bulk_report(ctx, message, summary: str, failures):
+    """Bilan d'une commande groupée ; la liste des échecs est jointe en fichier si elle est longue"""
+    lines = [f"• `{identifier}` : {reason}" for identifier, reason in sorted(failures.items())]
+    content = summary
+    if lines:
+        content += f"\n\n⚠️ **{len(lines)} échec(s):**\n" + "\n".join(lines[:15])
+        if len(lines) > 15:
+            content += "\n… liste complète dans le fichier joint"
+    await message.edit(content=content[:2000])
+    
+    if len(lines) > 15:
+        report = "\n".join(f"{identifier}\t{reason}" for identifier, reason in sorted(failures.items()))
+        await ctx.reply(file=discord.File(io.BytesIO(report.encode()), filename="echecs.txt"))
+
+@bot.hybrid_command(name='track-bulk', extras={'timeout': 300})
+@app_commands.describe(
+    channel="Salon des notifications (salon courant par défaut)",
+    fichier="Fichier .csv (première colonne) ou .txt d'identifiants",
+    identifiers="FIDs ou usernames séparés par des espaces ou des virgules"
+)
+async def track_bulk_command(ctx, channel: Optional[discord.TextChannel] = None,
+                             fichier: Optional[discord.Attachment] = None, *, identifiers: str = ""):
+    """Commande pour tracker plusieurs comptes Farcaster (liste ou fichier .csv / .txt joint)"""
+    try:
+        if not ctx.guild:
+            await ctx.reply("❌ Cette commande ne peut être utilisée que dans un serveur.")
+            return
+        
+        await ctx.defer()
+        
+        target_channel = channel or ctx.channel
+        values = await collect_bulk_identifiers(ctx, identifiers, fichier)
+        if values is None:
+            return
+        
+        started = time.monotonic()
+        message = await ctx.reply(f"⏳ Résolution des comptes : 0/{len(values)}")
+        resolved, failures = await resolve_with_progress(message, values)
+        
+        # Une insertion pour tous les comptes, puis une seule mise à jour du webhook
+        inserted = await track_accounts_bulk(
+            str(ctx.guild.id), str(target_channel.id), list(resolved.values()), str(ctx.author.id)
+        )
+        if inserted:
+            invalidate_guild_summary(ctx.guild.id)
+            get_profile_directory().invalidate()
+            try:
+                schedule_subscription_update(inserted)
+            except Exception as e:
+                logger.error(f"❌ Erreur lors de la programmation de l'ajout des FIDs au webhook: {e}")
+                logger.warning("⚠️ Les comptes sont trackés localement, mais le webhook n'a pas été mis à jour")
+        
+        already = len({int(user['fid']) for user in resolved.values()}) - len(inserted)
+        await send_bulk_report(
+            ctx, message,
+            f"✅ {len(inserted)} compte(s) ajouté(s) au suivi dans {target_channel.mention}"
+            f" ({already} déjà suivi(s), {len(failures)} échec(s)) en {time.monotonic() - started:.1f}s",
+            failures
+        )
+        logger.info(f"Import groupé par {ctx.author.name} dans {ctx.guild.name}: {len(inserted)} ajouté(s), {already} déjà suivi(s), {len(failures)} échec(s)")
+    
+    except Exception as e:
+        logger.error(f"Erreur dans la commande track-bulk: {e}")
+        await ctx.reply(f"❌ Une erreur est survenue: {str(e)}")
+
+@bot.hybrid_command(name='untrack-bulk', extras={'timeout': 300})
+@app_commands.describe(
+    fichier="Fichier .csv (première colonne) ou .txt d'identifiants",
+    identifiers="FIDs ou usernames séparés par des espaces ou des virgules"
+)
+async def untrack_bulk_command(ctx, fichier: Optional[discord.Attachment] = None, *, identifiers: str = ""):
+    """Commande pour arrêter de tracker plusieurs comptes Farcaster (liste ou fichier joint)"""
+    try:
+        if not ctx.guild:
+            await ctx.reply("❌ Cette commande ne peut être utilisée que dans un serveur.")
+            return
+        
+        await ctx.defer()
+        
+        values = await collect_bulk_identifiers(ctx, identifiers, fichier)
+        if values is None:
+            return
+        
+        started = time.monotonic()
+        message = await ctx.reply(f"⏳ Résolution des comptes : 0/{len(values)}")
+        resolved, failures = await resolve_with_progress(message, values)
+        
+        fids = sorted({int(user['fid']) for user in resolved.values()})
+        removed = await untrack_accounts_bulk(str(ctx.guild.id), fids)
+        if removed:
+            invalidate_guild_summary(ctx.guild.id)
+            get_profile_directory().invalidate()
+            try:
+                schedule_subscription_update(removed)
+            except Exception as e:
+                logger.error(f"❌ Erreur lors de la programmation du retrait des FIDs du webhook: {e}")
+                logger.warning("⚠️ Les comptes sont untrackés localement, mais le webhook n'a pas été mis à jour")
+        
+        await send_bulk_report(
+            ctx, message,
+            f"✅ {len(removed)} compte(s) retiré(s) du suivi ({len(fids) - len(removed)} non suivi(s), "
+            f"{len(failures)} échec(s)) en {time.monotonic() - started:.1f}s",
+            failures
+        )
+        logger.info(f"Retrait groupé par {ctx.author.name} dans {ctx.guild.name}: {len(removed)} retiré(s), {len(failures)} échec(s)")
+    
+    except Exception as e:
+        logger.error(f"Erreur dans la commande untrack-bulk: {e}")
+        await ctx.reply(f"❌ Une erreur est survenue: {str(e)}")
+
+@bot.hybrid_command(name='track-following')
+@app_commands.describe(fid_or_username="FID ou username Farcaster", channel="Salon des notifications (salon courant par défaut)")
+@app_commands.autocomplete(fid_or_username=known_profile_autocomplete)
+async def track_following_command(ctx, fid_or_username: str, channel: Optional[discord.TextChannel] = None):
+    """Commande pour être notifié des nouveaux comptes suivis par un compte Farcaster"""
     try:
         if not ctx.guild:
             await ctx.reply("❌ Cette commande ne peut être utilisée que dans un serveur.")
             return
         
-        db = get_session_local()()
+        await ctx.defer()
+        
+        target_channel = channel or ctx.channel
+        
+        # Résoudre l'utilisateur Farcaster
         try:
-            tracked_accounts = db.query(TrackedAccount).filter_by(guild_id=str(ctx.guild.id)).all()
-            
-            if not tracked_accounts:
-                await ctx.reply("📋 Aucun compte Farcaster n'est suivi dans ce serveur.")
+            if get_neynar_client() is None:
+                await ctx.reply("❌ Erreur: Client Neynar non initialisé. Vérifiez la configuration.")
                 return
             
-            # Grouper par salon
-            channels = {}
-            for account in tracked_accounts:
-                channel_id = account.channel_id
-                if channel_id not in channels:
-                    channels[channel_id] = []
-                channels[channel_id].append(account)
+            user = await get_command_executor().run(get_neynar_client().resolve_user, fid_or_username)
+        except Exception as e:
+            await ctx.reply(f"❌ Erreur lors de la résolution de l'utilisateur: {str(e)}")
+            return
+        
+        db = get_async_session_local()()
+        try:
+            result = await db.execute(
+                select(TrackedFollowing.id).filter_by(
+                    guild_id=str(ctx.guild.id),
+                    channel_id=str(target_channel.id),
+                    target_fid=user['fid']
+                )
+            )
+            if result.scalar():
+                await ctx.reply(f"❌ Les followings de `{user['username']}` (FID: {user['fid']}) sont déjà suivis dans ce salon.")
+                return
             
-            # Construire le message
-            message = "📋 **Comptes Farcaster suivis dans ce serveur:**\n\n"
+            db.add(TrackedFollowing(
+                id=str(uuid.uuid4()),
+                guild_id=str(ctx.guild.id),
+                channel_id=str(target_channel.id),
+                target_fid=user['fid'],
+                target_username=user['username'],
+                added_by_discord_user_id=str(ctx.author.id)
+            ))
+            await db.commit()
+            get_profile_directory().invalidate()
+            schedule_follow_sync()
             
-            for channel_id, accounts in channels.items():
-                channel = bot.get_channel(int(channel_id))
-                channel_name = channel.mention if channel else f"<#{channel_id}>"
-                
-                message += f"**{channel_name}:**\n"
-                for account in accounts:
-                    message += f"• `{account.username}` (FID: {account.fid})\n"
-                message += "\n"
+            await ctx.reply(f"✅ Les nouveaux followings de `{user['username']}` (FID: {user['fid']}) seront notifiés dans {target_channel.mention} !")
+            logger.info(f"Followings de {user['username']} (FID: {user['fid']}) suivis par {ctx.author.name} dans {ctx.guild.name}")
+        finally:
+            await db.close()
+    
+    except Exception as e:
+        logger.error(f"Erreur dans la commande track-following: {e}")
+        await ctx.reply(f"❌ Une erreur est survenue: {str(e)}")
+
+@bot.hybrid_command(name='untrack-following')
+@app_commands.describe(fid_or_username="FID ou username Farcaster")
+@app_commands.autocomplete(fid_or_username=guild_following_autocomplete)
+async def untrack_following_command(ctx, fid_or_username: str):
+    """Commande pour arrêter les notifications de followings d'un compte Farcaster"""
+    try:
+        if not ctx.guild:
+            await ctx.reply("❌ Cette commande ne peut être utilisée que dans un serveur.")
+            return
+        
+        await ctx.defer()
+        
+        try:
+            if get_neynar_client() is None:
+                await ctx.reply("❌ Erreur: Client Neynar non initialisé. Vérifiez la configuration.")
+                return
             
-            await ctx.reply(message)
+            user = await get_command_executor().run(get_neynar_client().resolve_user, fid_or_username)
+        except Exception as e:
+            await ctx.reply(f"❌ Erreur lors de la résolution de l'utilisateur: {str(e)}")
+            return
+        
+        db = get_async_session_local()()
+        try:
+            result = await db.execute(
+                delete(TrackedFollowing).filter_by(
+                    guild_id=str(ctx.guild.id),
+                    target_fid=user['fid']
+                )
+            )
+            await db.commit()
             
+            if result.rowcount > 0:
+                get_profile_directory().invalidate()
+                schedule_follow_sync()
+                await ctx.reply(f"✅ Followings de `{user['username']}` (FID: {user['fid']}) retirés du suivi !")
+            else:
+                await ctx.reply(f"❌ Les followings de `{user['username']}` (FID: {user['fid']}) n'étaient pas suivis dans ce serveur.")
         finally:
-            db.close()
+            await db.close()
+    
+    except Exception as e:
+        logger.error(f"Erreur dans la commande untrack-following: {e}")
+        await ctx.reply(f"❌ Une erreur est survenue: {str(e)}")
+
+@bot.hybrid_command(name='list')
+async def list_command(ctx):
+    """Commande pour lister tous les comptes suivis (paginée)"""
+    try:
+        if not ctx.guild:
+            await ctx.reply("❌ Cette commande ne peut être utilisée que dans un serveur.")
+            return
+        
+        await send_tracked_list(ctx)
             
     except Exception as e:
         logger.error(f"Erreur dans la commande list: {e}")
         await ctx.reply(f"❌ Une erreur est survenue: {str(e)}")
 
-@bot.command(name='setchannel')
+@bot.hybrid_command(name='setchannel')
+@app_commands.describe(channel="Salon par défaut des notifications")
 async def setchannel_command(ctx, channel: discord.TextChannel):
     """Commande pour définir le salon par défaut"""
     try:
@@ -259,27 +651,27 @@ async def setchannel_command(ctx, channel: discord.TextChannel):
             await ctx.reply("❌ Cette commande ne peut être utilisée que dans un serveur.")
             return
         
-        db = get_session_local()()
+        db = get_async_session_local()()
         try:
-            guild = db.query(Guild).filter_by(id=str(ctx.guild.id)).first()
+            guild = await db.get(Guild, str(ctx.guild.id))
             if not guild:
                 guild = Guild(id=str(ctx.guild.id))
                 db.add(guild)
             
             guild.default_channel_id = str(channel.id)
-            db.commit()
+            await db.commit()
             
             await ctx.reply(f"✅ Salon par défaut défini sur {channel.mention} !")
             logger.info(f"Salon par défaut défini sur {channel.name} dans {ctx.guild.name}")
             
         finally:
-            db.close()
+            await db.close()
             
     except Exception as e:
         logger.error(f"Erreur dans la commande setchannel: {e}")
         await ctx.reply(f"❌ Une erreur est survenue: {str(e)}")
 
-@bot.command(name='test')
+@bot.hybrid_command(name='test')
 async def test_command(ctx):
     """Commande pour tester les notifications"""
     try:
@@ -301,7 +693,7 @@ async def test_command(ctx):
         logger.error(f"Erreur dans la commande test: {e}")
         await ctx.reply(f"❌ Une erreur est survenue: {str(e)}")
 
-@bot.command(name='test-neynar')
+@bot.hybrid_command(name='test-neynar', extras={'timeout': 120})
 async def test_neynar_command(ctx):
     """Commande pour tester la connexion à l'API Neynar"""
     try:
@@ -309,6 +701,8 @@ async def test_neynar_command(ctx):
             await ctx.reply("❌ Cette commande ne peut être utilisée que dans un serveur.")
             return
         
+        await ctx.defer()
+        
         embed = discord.Embed(
             title="🧪 Test de Connexion Neynar",
             description="Test en cours...",
@@ -329,7 +723,7 @@ async def test_neynar_command(ctx):
         
         # Test 2: Test de résolution d'utilisateur
         try:
-            user = get_neynar_client().resolve_user("dwr")
+            user = await get_command_executor().run(get_neynar_client().resolve_user, "dwr")
             embed.add_field(
                 name="2️⃣ Résolution Utilisateur",
                 value=f"✅ @{user['username']} (FID: {user['fid']})",
@@ -349,7 +743,7 @@ async def test_neynar_command(ctx):
         # Test 3: Test de création de webhook
         try:
             from webhook_sync import get_webhook_stats
-            stats = get_webhook_stats()
+            stats = await get_command_executor().run(get_webhook_stats)
             
             if stats.get("status") == "active":
                 embed.add_field(
@@ -375,10 +769,14 @@ async def test_neynar_command(ctx):
         # Test 4: Test de synchronisation
         try:
             from webhook_sync import sync_neynar_webhook
-            sync_neynar_webhook()  # Test de synchronisation
+            report = await get_command_executor().run(sync_neynar_webhook) or {}  # Test de synchronisation
             embed.add_field(
                 name="4️⃣ Synchronisation",
-                value="✅ Synchronisation testée avec succès",
+                value=(
+                    f"{'✅' if report.get('success') else '⚠️'} +{len(report.get('added', []))}/-{len(report.get('removed', []))} FID(s)\n"
+                    f"📊 {report.get('upstream_calls', 0)} appel(s) Neynar, {report.get('duration_ms', 0)} ms"
+                    + (" (inchangé)" if report.get('skipped') else "")
+                ),
                 inline=False
             )
         except Exception as e:
@@ -398,7 +796,9 @@ async def test_neynar_command(ctx):
         logger.error(f"Erreur dans la commande test-neynar: {e}")
         await ctx.reply(f"❌ Une erreur est survenue: {str(e)}")
 
-@bot.command(name='lastcast')
+@bot.hybrid_command(name='lastcast')
+@app_commands.describe(fid_or_username="FID ou username Farcaster")
+@app_commands.autocomplete(fid_or_username=known_profile_autocomplete)
 async def lastcast_command(ctx, fid_or_username: str):
     """Commande pour récupérer le dernier cast d'un compte Farcaster"""
     try:
@@ -406,6 +806,8 @@ async def lastcast_command(ctx, fid_or_username: str):
             await ctx.reply("❌ Cette commande ne peut être utilisée que dans un serveur.")
             return
         
+        await ctx.defer()
+        
         # Résoudre l'utilisateur Farcaster
         try:
             client = get_neynar_client()
@@ -413,7 +815,7 @@ async def lastcast_command(ctx, fid_or_username: str):
                 await ctx.reply("❌ Erreur: Client Neynar non initialisé. Vérifiez la configuration.")
                 return
                 
-            user = client.resolve_user(fid_or_username)
+            user = await get_command_executor().run(client.resolve_user, fid_or_username)
             if user is None:
                 await ctx.reply(f"❌ Impossible de résoudre l'utilisateur `{fid_or_username}`. Vérifiez que le FID ou le nom d'utilisateur est correct.")
                 return
@@ -425,7 +827,7 @@ async def lastcast_command(ctx, fid_or_username: str):
         try:
             # Utiliser la nouvelle méthode officielle v2 pour récupérer les casts
             logger.info(f"🔧 Récupération des casts avec get_user_feed pour FID {user['fid']}")
-            feed_result = client.get_user_feed(user['fid'], limit=10, include_replies=True)
+            feed_result = await get_command_executor().run(client.get_user_feed, user['fid'], limit=10, include_replies=True)
             
             if not feed_result.get("casts") or len(feed_result["casts"]) == 0:
                 await ctx.reply(f"📝 Aucun cast trouvé pour `{user['username']}` (FID: {user['fid']})")
@@ -499,7 +901,9 @@ async def lastcast_command(ctx, fid_or_username: str):
         logger.error(f"Erreur dans la commande lastcast: {e}")
         await ctx.reply(f"❌ Une erreur est survenue: {str(e)}")
 
-@bot.command(name='debug-cast')
+@bot.hybrid_command(name='debug-cast')
+@app_commands.describe(fid_or_username="FID ou username Farcaster")
+@app_commands.autocomplete(fid_or_username=known_profile_autocomplete)
 async def debug_cast_command(ctx, fid_or_username: str):
     """Commande de debug pour tester différentes méthodes de récupération de casts"""
     try:
@@ -507,6 +911,8 @@ async def debug_cast_command(ctx, fid_or_username: str):
             await ctx.reply("❌ Cette commande ne peut être utilisée que dans un serveur.")
             return
         
+        await ctx.defer()
+        
         # Résoudre l'utilisateur Farcaster
         try:
             client = get_neynar_client()
@@ -514,7 +920,7 @@ async def debug_cast_command(ctx, fid_or_username: str):
                 await ctx.reply("❌ Erreur: Client Neynar non initialisé.")
                 return
                 
-            user = client.resolve_user(fid_or_username)
+            user = await get_command_executor().run(client.resolve_user, fid_or_username)
             if user is None:
                 await ctx.reply(f"❌ Impossible de résoudre l'utilisateur `{fid_or_username}`.")
                 return
@@ -533,7 +939,7 @@ async def debug_cast_command(ctx, fid_or_username: str):
         # Test 1: search_casts avec from:
         try:
             search_query = f"from:{user['username']}"
-            search_result = client.search_casts(search_query, limit=5)
+            search_result = await get_command_executor().run(client.search_casts, search_query, limit=5)
             casts_count = len(search_result.get("casts", []))
             embed.add_field(
                 name="1️⃣ search_casts (from:username)",
@@ -558,7 +964,7 @@ async def debug_cast_command(ctx, fid_or_username: str):
         # Test 2: search_casts avec le username seul
         try:
             search_query = user['username']
-            search_result = client.search_casts(search_query, limit=5)
+            search_result = await get_command_executor().run(client.search_casts, search_query, limit=5)
             casts_count = len(search_result.get("casts", []))
             embed.add_field(
                 name="2️⃣ search_casts (username seul)",
@@ -574,7 +980,7 @@ async def debug_cast_command(ctx, fid_or_username: str):
         
         # Test 3: get_user_feed (nouvelle méthode v2)
         try:
-            feed_result = client.get_user_feed(user['fid'], limit=5, include_replies=True)
+            feed_result = await get_command_executor().run(client.get_user_feed, user['fid'], limit=5, include_replies=True)
             casts_count = len(feed_result.get("casts", []))
             embed.add_field(
                 name="3️⃣ get_user_feed v2 (FID)",
@@ -603,7 +1009,7 @@ async def debug_cast_command(ctx, fid_or_username: str):
         logger.error(f"Erreur dans la commande debug-cast: {e}")
         await ctx.reply(f"❌ Une erreur est survenue: {str(e)}")
 
-@bot.command(name='check-webhook')
+@bot.hybrid_command(name='check-webhook')
 async def check_webhook_command(ctx):
     """Commande pour vérifier l'état du webhook fixe 01K45KREDQ77B80YD87AAXJ3E8"""
     try:
@@ -611,6 +1017,8 @@ async def check_webhook_command(ctx):
             await ctx.reply("❌ Cette commande ne peut être utilisée que dans un serveur.")
             return
         
+        await ctx.defer()
+        
         embed = discord.Embed(
             title="🔍 Vérification du Webhook Fixe",
             description="Vérification en cours de l'état du webhook 01K45KREDQ77B80YD87AAXJ3E8...",
@@ -622,14 +1030,14 @@ async def check_webhook_command(ctx):
         
         try:
             from webhook_sync import get_webhook_stats
-            stats = get_webhook_stats()
+            stats = await get_command_executor().run(get_webhook_stats)
             
             if stats.get("status") == "active":
                 embed.description = "✅ **Webhook fixe 01K45KREDQ77B80YD87AAXJ3E8 ACTIF !**"
                 embed.color = 0x00FF00
                 embed.add_field(
                     name="🔒 Webhook Fixe",
-                    value=f"ID: {stats.get('webhook_id', 'N/A')}\nStatut: Actif\nFIDs configurés: {stats.get('author_fids_count', 0)}",
+                    value=f"ID: {stats.get('webhook_id', 'N/A')}\nStatut: Actif\nFIDs configurés: {stats.get('author_fids_count', 0)}\nShards: {max(len(stats.get('shards') or {}), 1)}",
                     inline=False
                 )
             elif stats.get("status") == "inactive":
@@ -665,7 +1073,7 @@ async def check_webhook_command(ctx):
         logger.error(f"Erreur dans la commande check-webhook: {e}")
         await ctx.reply(f"❌ Une erreur est survenue: {str(e)}")
 
-@bot.command(name='force-webhook')
+@bot.hybrid_command(name='force-webhook', extras={'timeout': 120})
 async def force_webhook_command(ctx):
     """Commande pour forcer l'utilisation du webhook fixe 01K45KREDQ77B80YD87AAXJ3E8"""
     try:
@@ -673,6 +1081,8 @@ async def force_webhook_command(ctx):
             await ctx.reply("❌ Cette commande ne peut être utilisée que dans un serveur.")
             return
         
+        await ctx.defer()
+        
         embed = discord.Embed(
             title="🔒 Forçage du Webhook Fixe",
             description="Forçage en cours de l'utilisation du webhook 01K45KREDQ77B80YD87AAXJ3E8...",
@@ -683,7 +1093,7 @@ async def force_webhook_command(ctx):
         message = await ctx.reply(embed=embed)
         
         try:
-            success = force_webhook_fixe()
+            success = await get_command_executor().run(force_webhook_fixe)
             if success:
                 embed.description = "✅ **Webhook fixe 01K45KREDQ77B80YD87AAXJ3E8 forcé avec succès !**"
                 embed.color = 0x00FF00
@@ -716,7 +1126,7 @@ async def force_webhook_command(ctx):
         logger.error(f"Erreur dans la commande force-webhook: {e}")
         await ctx.reply(f"❌ Une erreur est survenue: {str(e)}")
 
-@bot.command(name='debug-webhook')
+@bot.hybrid_command(name='debug-webhook', extras={'timeout': 120})
 async def debug_webhook_command(ctx):
     """Commande de debug pour tester l'API webhook Neynar"""
     try:
@@ -724,6 +1134,8 @@ async def debug_webhook_command(ctx):
             await ctx.reply("❌ Cette commande ne peut être utilisée que dans un serveur.")
             return
         
+        await ctx.defer()
+        
         embed = discord.Embed(
             title="🔍 Debug Webhook Neynar",
             description="Test de l'API webhook en cours...",
@@ -754,7 +1166,7 @@ async def debug_webhook_command(ctx):
                 await message.edit(embed=embed)
                 return
             
-            webhook_details = client.get_webhook(webhook_id)
+            webhook_details = await get_command_executor().run(client.get_webhook, webhook_id)
             embed.add_field(
                 name="2️⃣ Récupération Webhook",
                 value=f"✅ Webhook récupéré avec succès\n📊 Statut: `{webhook_details.get('active', 'N/A')}`\n🔗 URL: `{webhook_details.get('url', 'N/A')}`",
@@ -783,14 +1195,14 @@ async def debug_webhook_command(ctx):
         # Test 3: Test de mise à jour du webhook
         try:
             # Récupérer les FIDs actuels de la base
-            db = get_session_local()()
+            db = get_async_session_local()()
             try:
-                tracked_accounts = db.query(TrackedAccount.fid).distinct().all()
-                current_fids = [int(account[0]) for account in tracked_accounts]
+                result = await db.execute(select(TrackedAccount.fid).distinct())
+                current_fids = [int(fid) for fid in result.scalars().all()]
                 
                 if current_fids:
                     # Tester la mise à jour avec les FIDs actuels
-                    updated_webhook = client.update_webhook(webhook_id, current_fids)
+                    updated_webhook = await get_command_executor().run(client.update_webhook, webhook_id, current_fids)
                     embed.add_field(
                         name="3️⃣ Mise à jour Webhook",
                         value=f"✅ Webhook mis à jour avec succès\n📊 FIDs configurés: {len(current_fids)}\n🔢 FIDs: `{current_fids[:5]}{'...' if len(current_fids) > 5 else ''}`",
@@ -803,7 +1215,7 @@ async def debug_webhook_command(ctx):
                         inline=False
                     )
             finally:
-                db.close()
+                await db.close()
                 
         except Exception as e:
             # Extraire le code d'erreur HTTP si disponible
@@ -834,7 +1246,7 @@ async def debug_webhook_command(ctx):
         logger.error(f"Erreur dans la commande debug-webhook: {e}")
         await ctx.reply(f"❌ Une erreur est survenue: {str(e)}")
 
-@bot.command(name='test-api')
+@bot.hybrid_command(name='test-api', extras={'timeout': 120})
 async def test_api_command(ctx):
     """Commande pour tester l'API Neynar avec différents endpoints"""
     try:
@@ -842,6 +1254,8 @@ async def test_api_command(ctx):
             await ctx.reply("❌ Cette commande ne peut être utilisée que dans un serveur.")
             return
         
+        await ctx.defer()
+        
         embed = discord.Embed(
             title="🧪 Test API Neynar",
             description="Test des différents endpoints de l'API...",
@@ -859,7 +1273,7 @@ async def test_api_command(ctx):
         # Test 1: Test de l'endpoint de base
         try:
             # Tester avec un FID connu (dwr = 194)
-            user = client.get_user_by_fid(194)
+            user = await get_command_executor().run(client.get_user_by_fid, 194)
             embed.add_field(
                 name="1️⃣ API Base",
                 value=f"✅ Endpoint de base fonctionne\n👤 Test avec FID 194: {user.get('username', 'N/A')}",
@@ -879,7 +1293,7 @@ async def test_api_command(ctx):
         
         # Test 2a: Endpoint actuel
         try:
-            webhook_details = client.get_webhook(webhook_id)
+            webhook_details = await get_command_executor().run(client.get_webhook, webhook_id)
             embed.add_field(
                 name="2️⃣ Webhook (format actuel)",
                 value=f"✅ Webhook trouvé avec le format actuel\n📊 Statut: {webhook_details.get('active', 'N/A')}",
@@ -897,13 +1311,7 @@ async def test_api_command(ctx):
         # Test 2b: Test avec un endpoint alternatif
         try:
             # Tester avec l'endpoint v1 au cas où
-            import requests
-            headers = client.headers
-            response = requests.get(
-                f"https://api.neynar.com/v1/farcaster/webhook/{webhook_id}",
-                headers=headers,
-                timeout=10
-            )
+            response = await get_command_executor().run(client.probe, f"https://api.neynar.com/v1/farcaster/webhook/{webhook_id}")
             if response.status_code == 200:
                 embed.add_field(
                     name="3️⃣ Webhook (v1)",
@@ -934,7 +1342,7 @@ async def test_api_command(ctx):
         logger.error(f"Erreur dans la commande test-api: {e}")
         await ctx.reply(f"❌ Une erreur est survenue: {str(e)}")
 
-@bot.command(name='test-webhook-endpoints')
+@bot.hybrid_command(name='test-webhook-endpoints', extras={'timeout': 120})
 async def test_webhook_endpoints_command(ctx):
     """Commande pour tester différents endpoints webhook v2"""
     try:
@@ -942,6 +1350,8 @@ async def test_webhook_endpoints_command(ctx):
             await ctx.reply("❌ Cette commande ne peut être utilisée que dans un serveur.")
             return
         
+        await ctx.defer()
+        
         embed = discord.Embed(
             title="🧪 Test Endpoints Webhook v2",
             description="Test des différents endpoints webhook v2...",
@@ -960,15 +1370,8 @@ async def test_webhook_endpoints_command(ctx):
         
         # Test 1: Endpoint actuel
         try:
-            import requests
-            headers = client.headers
-            
             # Test 1a: /v2/farcaster/webhook/{id}
-            response = requests.get(
-                f"https://api.neynar.com/v2/farcaster/webhook/{webhook_id}",
-                headers=headers,
-                timeout=10
-            )
+            response = await get_command_executor().run(client.probe, f"https://api.neynar.com/v2/farcaster/webhook/{webhook_id}")
             embed.add_field(
                 name="1️⃣ /v2/farcaster/webhook/{id}",
                 value=f"Status: {response.status_code}\nResponse: {response.text[:100]}...",
@@ -986,11 +1389,7 @@ async def test_webhook_endpoints_command(ctx):
         # Test 2: Endpoint alternatif
         try:
             # Test 2a: /v2/farcaster/webhooks/{id}
-            response = requests.get(
-                f"https://api.neynar.com/v2/farcaster/webhooks/{webhook_id}",
-                headers=headers,
-                timeout=10
-            )
+            response = await get_command_executor().run(client.probe, f"https://api.neynar.com/v2/farcaster/webhooks/{webhook_id}")
             embed.add_field(
                 name="2️⃣ /v2/farcaster/webhooks/{id}",
                 value=f"Status: {response.status_code}\nResponse: {response.text[:100]}...",
@@ -1008,11 +1407,7 @@ async def test_webhook_endpoints_command(ctx):
         # Test 3: Endpoint avec query params
         try:
             # Test 3a: /v2/farcaster/webhook?id={id}
-            response = requests.get(
-                f"https://api.neynar.com/v2/farcaster/webhook?id={webhook_id}",
-                headers=headers,
-                timeout=10
-            )
+            response = await get_command_executor().run(client.probe, f"https://api.neynar.com/v2/farcaster/webhook?id={webhook_id}")
             embed.add_field(
                 name="3️⃣ /v2/farcaster/webhook?id={id}",
                 value=f"Status: {response.status_code}\nResponse: {response.text[:100]}...",
@@ -1030,11 +1425,7 @@ async def test_webhook_endpoints_command(ctx):
         # Test 4: Lister tous les webhooks
         try:
             # Test 4a: /v2/farcaster/webhooks (liste)
-            response = requests.get(
-                "https://api.neynar.com/v2/farcaster/webhooks",
-                headers=headers,
-                timeout=10
-            )
+            response = await get_command_executor().run(client.probe, "https://api.neynar.com/v2/farcaster/webhooks")
             if response.status_code == 200:
                 webhooks = response.json()
                 webhook_list = []
@@ -1074,7 +1465,7 @@ async def test_webhook_endpoints_command(ctx):
         logger.error(f"Erreur dans la commande test-webhook-endpoints: {e}")
         await ctx.reply(f"❌ Une erreur est survenue: {str(e)}")
 
-@bot.command(name='far-help')
+@bot.hybrid_command(name='far-help')
 async def far_help(ctx):
     """Afficher l'aide pour les commandes Farcaster"""
     embed = discord.Embed(
@@ -1086,11 +1477,15 @@ async def far_help(ctx):
     embed.add_field(
         name="📱 Commandes de Tracking",
         value="""
-        `!track <fid_ou_username> [channel]` - Commencer à tracker un compte
-        `!untrack <fid_ou_username>` - Arrêter de tracker un compte
-        `!list` - Lister tous les comptes trackés
-        `!lastcast <fid_ou_username>` - Voir le dernier cast d'un compte
-        `!debug-cast <fid_ou_username>` - Debug des méthodes de récupération de casts
+        `/track <fid_ou_username> [channel]` - Commencer à tracker un compte
+        `/untrack <fid_ou_username>` - Arrêter de tracker un compte
+        `/track-bulk [channel] <fid_ou_username...>` - Tracker plusieurs comptes (ou fichier .csv / .txt joint)
+        `/untrack-bulk <fid_ou_username...>` - Arrêter de tracker plusieurs comptes
+        `/list` - Lister tous les comptes trackés
+        `/track-following <fid_ou_username> [channel]` - Notifier les nouveaux comptes suivis
+        `/untrack-following <fid_ou_username>` - Arrêter les notifications de followings
+        `/lastcast <fid_ou_username>` - Voir le dernier cast d'un compte
+        `/debug-cast <fid_ou_username>` - Debug des méthodes de récupération de casts
         """,
         inline=False
     )
@@ -1098,12 +1493,12 @@ async def far_help(ctx):
     embed.add_field(
         name="⚙️ Commandes de Configuration",
         value="""
-        `!setchannel <#channel>` - Définir le salon par défaut
-        `!test` - Envoyer un message de test
-        `!check-webhook` - Vérifier l'état du webhook fixe
-        `!force-webhook` - Forcer l'utilisation du webhook fixe
-        `!debug-webhook` - Debug de l'API webhook Neynar
-        `!far-help` - Afficher cette aide
+        `/setchannel <#channel>` - Définir le salon par défaut
+        `/test` - Envoyer un message de test
+        `/check-webhook` - Vérifier l'état du webhook fixe
+        `/force-webhook` - Forcer l'utilisation du webhook fixe
+        `/debug-webhook` - Debug de l'API webhook Neynar
+        `/far-help` - Afficher cette aide
         """,
         inline=False
     )
@@ -1111,10 +1506,10 @@ async def far_help(ctx):
     embed.add_field(
         name="💡 Exemples",
         value="""
-        `!track dwr` - Tracker l'utilisateur @dwr
-        `!track 194` - Tracker le FID 194
-        `!track dwr #notifications` - Tracker dans un salon spécifique
-        `!setchannel #general` - Définir #general comme salon par défaut
+        `/track dwr` - Tracker l'utilisateur @dwr
+        `/track 194` - Tracker le FID 194
+        `/track dwr #notifications` - Tracker dans un salon spécifique
+        `/setchannel #general` - Définir #general comme salon par défaut
         """,
         inline=False
     )
@@ -0,0 +1,201 @@
+import asyncio
+import hashlib
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import select, text
+from database import get_session_local, WebhookState
+from neynar_client import get_neynar_client
+from webhook_sync import get_subscription_engine, get_subscribed_fids
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Empreinte (nombre, md5 de la liste triée "fid1,fid2,...") calculée côté SQL
+DESIRED_FINGERPRINT_SQL = text("""
+    SELECT count(*), md5(COALESCE(string_agg(fid::text, ',' ORDER BY fid), ''))
+    FROM (SELECT DISTINCT fid FROM tracked_accounts) AS desired
+""")
+
+ACKNOWLEDGED_FINGERPRINT_SQL = text("""
+    SELECT count(*), md5(COALESCE(string_agg(fid::text, ',' ORDER BY fid), ''))
+    FROM webhook_subscriptions
+""")
+
+SHARD_FINGERPRINTS_SQL = text("""
+    SELECT webhook_id, count(*), md5(COALESCE(string_agg(fid::text, ',' ORDER BY fid), ''))
+    FROM webhook_subscriptions
+    GROUP BY webhook_id
+""")
+
+EMPTY_FINGERPRINT = (0, hashlib.md5(b"").hexdigest())
+
+def fingerprint(fids: Iterable[int]) -> Tuple[int, str]:
+    """Empreinte d'un ensemble de FIDs, identique à celle calculée en SQL"""
+    fids = sorted({int(fid) for fid in fids})
+    return len(fids), hashlib.md5(",".join(str(fid) for fid in fids).encode("utf-8")).hexdigest()
+
+def extract_remote_fids(webhook_details: Dict) -> List[int]:
+    """Extraire les author_fids de cast.created d'une réponse get_webhook"""
+    webhook = webhook_details.get("webhook", webhook_details)
+    subscription = webhook.get("subscription") or {}
+    filters = subscription.get("filters") or subscription
+    cast_filter = filters.get("cast.created") or {}
+    return [int(fid) for fid in cast_filter.get("author_fids") or []]
+
+class WebhookDriftDetector:
+    """Détection périodique de dérive entre l'état local et Neynar
+    
+    Compare à chaque passage des empreintes (nombre + hash de la liste
+    triée) : FIDs suivis contre FIDs acquittés, puis FIDs acquittés de
+    chaque webhook du pool contre sa liste côté Neynar. Les ensembles
+    complets ne sont chargés et comparés qu'en cas d'empreintes
+    différentes, et la réparation ne touche que ce qui a dérivé.
+    """
+    
+    def __init__(self, interval_seconds: float = None):
+        self.interval_seconds = interval_seconds if interval_seconds is not None else config.WEBHOOK_DRIFT_INTERVAL_SECONDS
+        self._task: Optional[asyncio.Task] = None
+        self.metrics = {
+            "checks": 0,
+            "in_sync": None,
+            "local_drift_events": 0,
+            "remote_drift_events": 0,
+            "repairs": 0,
+            "repair_failures": 0,
+            "errors": 0,
+            "last_check_at": None,
+            "last_duration_ms": None,
+            "last_local_drift": {"missing": 0, "extra": 0},
+            "shards": {},
+            "last_error": None
+        }
+    
+    def _check_local(self, db) -> bool:
+        """FIDs suivis contre FIDs acquittés ; répare via une synchro incrémentale"""
+        desired_fp = tuple(db.execute(DESIRED_FINGERPRINT_SQL).one())
+        acknowledged_fp = tuple(db.execute(ACKNOWLEDGED_FINGERPRINT_SQL).one())
+        if desired_fp == acknowledged_fp:
+            self.metrics["last_local_drift"] = {"missing": 0, "extra": 0}
+            return True
+        
+        # Empreintes différentes : diff complet
+        desired = set(db.execute(text("SELECT DISTINCT fid FROM tracked_accounts")).scalars())
+        acknowledged = set(db.execute(text("SELECT fid FROM webhook_subscriptions")).scalars())
+        missing, extra = desired - acknowledged, acknowledged - desired
+        self.metrics["local_drift_events"] += 1
+        self.metrics["last_local_drift"] = {"missing": len(missing), "extra": len(extra)}
+        logger.warning(f"⚠️ Dérive locale du webhook: {len(missing)} FID(s) non abonné(s), {len(extra)} FID(s) en trop")
+        
+        # Les ensembles en mémoire du moteur sont faux : les recharger, seuls les shards touchés sont poussés
+        engine = get_subscription_engine()
+        engine.invalidate()
+        report = engine.sync()
+        self._record_repair(report["success"])
+        return False
+    
+    def _check_remote(self, db) -> bool:
+        """FIDs acquittés de chaque webhook du pool contre sa liste côté Neynar"""
+        local_fps = {
+            webhook_id: (count, digest)
+            for webhook_id, count, digest in db.execute(SHARD_FINGERPRINTS_SQL)
+        }
+        pool = set(db.execute(
+            select(WebhookState.webhook_id).where(WebhookState.active.isnot(False))
+        ).scalars())
+        client = get_neynar_client()
+        in_sync = True
+        
+        for webhook_id in sorted(pool):
+            remote_fids = extract_remote_fids(client.get_webhook(webhook_id))
+            local_fp = local_fps.get(webhook_id, EMPTY_FINGERPRINT)
+            remote_fp = fingerprint(remote_fids)
+            shard = {"local_count": local_fp[0], "remote_count": remote_fp[0], "missing": 0, "extra": 0}
+            self.metrics["shards"][webhook_id] = shard
+            
+            if local_fp == remote_fp:
+                shard["in_sync"] = True
+                continue
+            
+            # Empreintes différentes : diff complet de ce shard uniquement
+            local_fids = set(get_subscribed_fids(db, webhook_id))
+            shard["missing"] = len(local_fids - set(remote_fids))
+            shard["extra"] = len(set(remote_fids) - local_fids)
+            shard["in_sync"] = False
+            in_sync = False
+            self.metrics["remote_drift_events"] += 1
+            logger.warning(
+                f"⚠️ Dérive du webhook {webhook_id} côté Neynar: "
+                f"{shard['missing']} FID(s) manquant(s), {shard['extra']} FID(s) en trop"
+            )
+            self._record_repair(get_subscription_engine().push_shard(webhook_id))
+        
+        return in_sync
+    
+    def _record_repair(self, success: bool):
+        if success:
+            self.metrics["repairs"] += 1
+        else:
+            self.metrics["repair_failures"] += 1
+    
+    def check(self) -> Dict:
+        """Un passage complet de détection (bloquant, à lancer hors event loop)"""
+        started = time.monotonic()
+        db = get_session_local()()
+        try:
+            local_ok = self._check_local(db)
+            # Relire l'état acquitté après une éventuelle réparation locale
+            db.rollback()
+            remote_ok = self._check_remote(db)
+            self.metrics["in_sync"] = local_ok and remote_ok
+            self.metrics["last_error"] = None
+        except Exception as e:
+            self.metrics["errors"] += 1
+            self.metrics["last_error"] = str(e)
+            logger.error(f"❌ Erreur lors de la détection de dérive du webhook: {e}")
+        finally:
+            db.close()
+            self.metrics["checks"] += 1
+            self.metrics["last_check_at"] = datetime.utcnow().isoformat()
+            self.metrics["last_duration_ms"] = round((time.monotonic() - started) * 1000, 1)
+        
+        if self.metrics["in_sync"]:
+            logger.info(f"✅ Webhook sans dérive ({self.metrics['last_duration_ms']} ms)")
+        return self.metrics
+    
+    def start(self) -> bool:
+        """Démarrer la détection périodique sur l'event loop courant (une seule fois)"""
+        if self._task is not None and not self._task.done():
+            return False
+        
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"🚀 Détection de dérive du webhook démarrée (toutes les {self.interval_seconds:.0f}s)")
+        return True
+    
+    async def _run(self):
+        while True:
+            # Premier passage après un intervalle : la réconciliation de démarrage s'en charge
+            await asyncio.sleep(self.interval_seconds)
+            await asyncio.to_thread(self.check)
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# Instance globale du détecteur
+_drift_detector = None
+
+def get_drift_detector() -> WebhookDriftDetector:
+    """Obtenir l'instance du détecteur de dérive"""
+    global _drift_detector
+    
+    if _drift_detector is None:
+        _drift_detector = WebhookDriftDetector()
+    
+    return _drift_detector
@@ -1,23 +1,71 @@
 import asyncio
-import json
+import discord
+import heapq
 import logging
+import random
 import time
 import uuid
-from datetime import datetime
-from typing import List, Dict, Optional
-from database import get_session_local, TrackedFollowing, FollowingState, FollowingDelivery
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Optional, Set, Tuple
+from sqlalchemy import select, delete, update, bindparam, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from database import (
+    get_async_session_local, TrackedFollowing, FollowingState, FollowingStateDelta, FollowingDelivery
+)
+from following_snapshots import normalize_fids, snapshot_hash, encode_fids, decode_fids, apply_delta, diff_fids
 from neynar_client import get_neynar_client
 from config import config
 
 logger = logging.getLogger(__name__)
 
 class FollowingPoller:
-    """Service de polling pour détecter les nouveaux followings"""
+    """Service de polling pour détecter les nouveaux followings
+    
+    Chaque FID cible a sa prochaine échéance dans un tas (heapq) : seuls les
+    comptes dus sont vérifiés, au plus `concurrency` à la fois, sous le rate
+    limit partagé du client Neynar. L'intervalle s'adapte par compte (divisé
+    quand il suit de nouveaux comptes, allongé quand il est inactif) et les
+    échéances sont décalées aléatoirement pour étaler les appels.
+    
+    Chaque vérification réussie laisse un point de reprise (dernière
+    vérification, intervalle, prochaine échéance) écrit en base par lots :
+    après un redémarrage ou un changement de leader, les comptes reprennent
+    leur planning, les plus en retard d'abord, sans balayage complet.
+    """
     
     def __init__(self, bot_instance):
         self.bot = bot_instance
         self.running = False
-        self.poll_interval = 60  # 1 minute
+        self.poll_interval = config.FOLLOWING_POLL_INTERVAL_SECONDS  # Intervalle de départ
+        self.min_interval = config.FOLLOWING_POLL_MIN_INTERVAL_SECONDS
+        self.max_interval = config.FOLLOWING_POLL_MAX_INTERVAL_SECONDS
+        self.concurrency = config.FOLLOWING_POLL_CONCURRENCY
+        self.jitter = config.FOLLOWING_POLL_JITTER
+        self.refresh_interval = config.FOLLOWING_POLL_INTERVAL_SECONDS  # Rechargement des comptes suivis
+        if config.NEYNAR_FOLLOW_WEBHOOK_ID:
+            # Follows reçus par webhook : le polling ne fait plus que rattraper les événements manqués
+            self.poll_interval = self.min_interval = self.max_interval = config.FOLLOWING_RECONCILE_INTERVAL_SECONDS
+        
+        self.targets: Dict[int, List] = {}  # FID cible -> entrées de suivi (salons)
+        self.intervals: Dict[int, float] = {}
+        self.due_at: Dict[int, float] = {}  # Échéance courante ; les entrées périmées du tas sont ignorées
+        self.schedule: List[Tuple[float, int]] = []
+        self.in_progress: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._last_refresh = 0.0
+        self.checkpoints: Dict[int, Dict] = {}  # Points de reprise pas encore écrits en base
+        self.checkpoint_batch_size = config.FOLLOWING_CHECKPOINT_BATCH_SIZE
+        self._checkpoint_lock: Optional[asyncio.Lock] = None
+        self._flush_task: Optional[asyncio.Task] = None  # Pas annulée à l'arrêt : le lot en cours est écrit
+        self.stats = {
+            "polls": 0,
+            "errors": 0,
+            "lag_total": 0.0,
+            "lag_max": 0.0,
+            "checkpoints_written": 0
+        }
         
     async def start(self):
         """Démarrer le service de polling"""
@@ -26,108 +74,351 @@ class FollowingPoller:
             return
             
         self.running = True
-        logger.info("🔄 Démarrage du service de polling des followings...")
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        logger.info(f"🔄 Démarrage du service de polling des followings ({self.concurrency} vérification(s) simultanée(s))...")
         
         # Lancer la boucle de polling dans une tâche asyncio
-        asyncio.create_task(self._polling_loop())
+        self._task = asyncio.create_task(self._polling_loop())
         
     async def stop(self):
         """Arrêter le service de polling"""
         self.running = False
+        tasks = [task for task in (self._task, *self._tasks) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._tasks.clear()
+        self.in_progress.clear()
+        if self._flush_task is not None:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self._flush_checkpoints()
         logger.info("🛑 Arrêt du service de polling des followings")
         
+    def _jittered(self, interval: float) -> float:
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+        
+    def _schedule(self, target_fid: int, due_at: float):
+        self.due_at[target_fid] = due_at
+        heapq.heappush(self.schedule, (due_at, target_fid))
+        
     async def _polling_loop(self):
-        """Boucle principale de polling"""
+        """Boucle principale : lancer les vérifications dues, dans la limite de concurrence"""
         while self.running:
             try:
-                await self._check_all_followings()
-                await asyncio.sleep(self.poll_interval)
+                now = time.monotonic()
+                if now - self._last_refresh >= self.refresh_interval:
+                    await self._flush_checkpoints()
+                    await self._refresh_targets()
+                    self._log_lag()
+                    self._last_refresh = now
+                    
+                while self.schedule and self.schedule[0][0] <= time.monotonic():
+                    due_at, target_fid = heapq.heappop(self.schedule)
+                    if self.due_at.get(target_fid) != due_at or target_fid in self.in_progress:
+                        continue  # Compte retiré ou replanifié entre-temps
+                        
+                    # Attendre une place : les échéances suivantes prennent du retard (mesuré)
+                    await self._semaphore.acquire()
+                    self.in_progress.add(target_fid)
+                    task = asyncio.create_task(self._poll_target(target_fid, due_at))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+                    
+                next_due = self.schedule[0][0] if self.schedule else float("inf")
+                next_refresh = self._last_refresh + self.refresh_interval
+                await asyncio.sleep(max(0.0, min(next_due, next_refresh) - time.monotonic()))
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logger.error(f"❌ Erreur dans la boucle de polling: {e}")
                 await asyncio.sleep(30)  # Attendre 30s en cas d'erreur
                 
-    async def _check_all_followings(self):
-        """Vérifier tous les comptes trackés pour de nouveaux followings"""
+    async def _refresh_targets(self):
+        """Recharger les comptes trackés et planifier les nouveaux depuis leur point de reprise"""
+        db = get_async_session_local()()
+        try:
+            result = await db.execute(select(TrackedFollowing))
+            tracked_followings = result.scalars().all()
+            
+            # Grouper par target_fid pour éviter les vérifications multiples
+            targets: Dict[int, List] = {}
+            for tf in tracked_followings:
+                targets.setdefault(tf.target_fid, []).append(tf)
+            
+            new_fids = [target_fid for target_fid in targets if target_fid not in self.due_at]
+            states = {}
+            if new_fids:
+                result = await db.execute(
+                    select(
+                        FollowingState.target_fid, FollowingState.last_check_at,
+                        FollowingState.poll_interval, FollowingState.next_check_at
+                    ).where(FollowingState.target_fid.in_(new_fids))
+                )
+                states = {row.target_fid: row for row in result}
+        finally:
+            await db.close()
+        
+        now = time.monotonic()
+        now_wall = datetime.now(timezone.utc)
+        resumed = overdue = 0
+        for target_fid in new_fids:
+            state = states.get(target_fid)
+            if state is None:
+                # Jamais vérifié : état initial tout de suite, pour ne pas absorber
+                # dans la référence les follows faits depuis l'ajout du compte
+                self.intervals[target_fid] = self.poll_interval
+                self._schedule(target_fid, now)
+                continue
+            
+            interval = min(self.max_interval, max(self.min_interval, state.poll_interval or self.poll_interval))
+            next_check_at = state.next_check_at
+            if next_check_at is None and state.last_check_at is not None:
+                next_check_at = state.last_check_at + timedelta(seconds=interval)
+            # Échéance passée : négative par rapport à maintenant, le tas sert les plus anciennes d'abord
+            delay = (next_check_at - now_wall).total_seconds() if next_check_at is not None else 0.0
+            self.intervals[target_fid] = interval
+            self._schedule(target_fid, now + delay)
+            resumed += 1
+            if delay <= 0:
+                overdue += 1
+        added = len(new_fids)
+        for target_fid in set(self.due_at) - set(targets):
+            del self.due_at[target_fid]
+            self.intervals.pop(target_fid, None)
+        self.targets = targets
+        
+        if not targets:
+            logger.debug("Aucun compte tracké pour les followings")
+        elif added:
+            logger.info(
+                f"🔍 {added} nouveau(x) compte(s) planifié(s) ({resumed} repris depuis leur point de reprise, "
+                f"{overdue} en retard), {len(targets)} compte(s) suivi(s) pour les followings"
+            )
+            
+    async def _poll_target(self, target_fid: int, due_at: float):
+        """Vérifier un compte puis replanifier selon son activité"""
+        lag = max(0.0, time.monotonic() - due_at)
+        self.stats["polls"] += 1
+        self.stats["lag_total"] += lag
+        self.stats["lag_max"] = max(self.stats["lag_max"], lag)
+        
+        found = False
+        failed = False
         try:
-            # Récupérer tous les comptes trackés pour les followings
-            db = get_session_local()()
+            tracking_entries = self.targets.get(target_fid)
+            if tracking_entries:
+                db = get_async_session_local()()
+                try:
+                    found = await self._check_user_followings(target_fid, tracking_entries, db)
+                finally:
+                    await db.close()
+        except Exception as e:
+            failed = True
+            self.stats["errors"] += 1
+            logger.error(f"❌ Erreur lors de la vérification des followings pour FID {target_fid}: {e}")
+        finally:
+            self.in_progress.discard(target_fid)
+            self._semaphore.release()
+            
+        if target_fid not in self.due_at:
+            return
+        
+        interval = self.intervals.get(target_fid, self.poll_interval)
+        if failed:
+            # Échec (panne Neynar, base) : l'activité du compte est inconnue, intervalle inchangé
+            # et nouvel essai au plus tôt ; pas de point de reprise, le compte reste à revérifier
+            self._schedule(target_fid, time.monotonic() + self._jittered(self.min_interval))
+            return
+        
+        # Compte actif : vérifier plus souvent ; inactif : espacer
+        interval = interval / 2 if found else interval * 1.5
+        interval = min(self.max_interval, max(self.min_interval, interval))
+        self.intervals[target_fid] = interval
+        delay = self._jittered(interval)
+        self._schedule(target_fid, time.monotonic() + delay)
+        
+        if tracking_entries:
+            # Vérification aboutie : point de reprise
+            checked_at = datetime.now(timezone.utc)
+            self.checkpoints[target_fid] = {
+                "b_target_fid": target_fid,
+                "last_check_at": checked_at,
+                "poll_interval": interval,
+                "next_check_at": checked_at + timedelta(seconds=delay)
+            }
+            if len(self.checkpoints) >= self.checkpoint_batch_size and (self._flush_task is None or self._flush_task.done()):
+                self._flush_task = asyncio.create_task(self._flush_checkpoints())
+    
+    async def _flush_checkpoints(self) -> int:
+        """Écrire les points de reprise en attente en un seul UPDATE groupé (executemany)"""
+        if self._checkpoint_lock is None:
+            self._checkpoint_lock = asyncio.Lock()
+        
+        async with self._checkpoint_lock:
+            if not self.checkpoints:
+                return 0
+            
+            batch = self.checkpoints
+            self.checkpoints = {}
+            
+            db = get_async_session_local()()
             try:
-                tracked_followings = db.query(TrackedFollowing).all()
-                
-                if not tracked_followings:
-                    logger.debug("Aucun compte tracké pour les followings")
-                    return
-                
-                logger.info(f"🔍 Vérification de {len(tracked_followings)} compte(s) pour de nouveaux followings...")
-                
-                # Grouper par target_fid pour éviter les vérifications multiples
-                unique_fids = {}
-                for tf in tracked_followings:
-                    if tf.target_fid not in unique_fids:
-                        unique_fids[tf.target_fid] = []
-                    unique_fids[tf.target_fid].append(tf)
-                
-                # Vérifier chaque FID unique
-                for target_fid, tracking_entries in unique_fids.items():
-                    await self._check_user_followings(target_fid, tracking_entries, db)
-                    
+                await db.execute(
+                    update(FollowingState.__table__)
+                    .where(FollowingState.__table__.c.target_fid == bindparam("b_target_fid"))
+                    .values(
+                        last_check_at=bindparam("last_check_at"),
+                        poll_interval=bindparam("poll_interval"),
+                        next_check_at=bindparam("next_check_at")
+                    ),
+                    list(batch.values())
+                )
+                await db.commit()
+                self.stats["checkpoints_written"] += len(batch)
+                logger.debug(f"💾 {len(batch)} point(s) de reprise du polling enregistré(s)")
+            except Exception as e:
+                await db.rollback()
+                # Garder les points non écrits, sauf ceux remplacés entre-temps par plus récent
+                for target_fid, checkpoint in batch.items():
+                    self.checkpoints.setdefault(target_fid, checkpoint)
+                logger.error(f"❌ Erreur lors de l'enregistrement des points de reprise du polling: {e}")
+                return 0
             finally:
-                db.close()
-                
-        except Exception as e:
-            logger.error(f"❌ Erreur lors de la vérification des followings: {e}")
+                await db.close()
+            return len(batch)
+        
+    def get_stats(self) -> Dict:
+        """Métriques du planificateur (retard = début effectif - échéance)"""
+        polls = self.stats["polls"]
+        now = time.monotonic()
+        overdue = [now - due for due in self.due_at.values() if due <= now]
+        return {
+            "targets": len(self.targets),
+            "in_progress": len(self.in_progress),
+            "polls": polls,
+            "errors": self.stats["errors"],
+            "lag_avg_seconds": round(self.stats["lag_total"] / polls, 2) if polls else 0.0,
+            "lag_max_seconds": round(self.stats["lag_max"], 2),
+            "overdue": len(overdue),
+            "overdue_max_seconds": round(max(overdue), 2) if overdue else 0.0,
+            "checkpoints_pending": len(self.checkpoints),
+            "checkpoints_written": self.stats["checkpoints_written"]
+        }
+        
+    def _log_lag(self):
+        stats = self.get_stats()
+        if stats["polls"]:
+            logger.info(
+                f"📊 Polling followings: {stats['targets']} compte(s), {stats['polls']} vérification(s), "
+                f"retard moyen {stats['lag_avg_seconds']}s (max {stats['lag_max_seconds']}s), "
+                f"{stats['overdue']} en retard"
+            )
             
-    async def _check_user_followings(self, target_fid: int, tracking_entries: List, db):
-        """Vérifier les followings d'un utilisateur spécifique"""
+    async def _check_user_followings(self, target_fid: int, tracking_entries: List, db) -> bool:
+        """Vérifier les followings d'un utilisateur spécifique (True si de nouveaux followings)
+        
+        Les erreurs remontent à _poll_target, qui les compte et replanifie le compte.
+        """
         try:
             client = get_neynar_client()
             if client is None:
-                logger.error("❌ Client Neynar non initialisé")
-                return
+                raise RuntimeError("Client Neynar non initialisé")
             
-            # Récupérer la liste actuelle des followings
-            current_followings = client.get_user_following(target_fid)
-            current_fids = [f['fid'] for f in current_followings]
+            # Récupérer la liste actuelle des followings (client bloquant : hors de l'event loop)
+            current_followings = await asyncio.to_thread(client.get_user_following, target_fid)
+            current_fids = normalize_fids(f['fid'] for f in current_followings)
             current_usernames = {f['fid']: f['username'] for f in current_followings}
+            current_hash = snapshot_hash(current_fids)
             
             logger.debug(f"🔍 FID {target_fid}: {len(current_fids)} followings actuels")
             
             # Récupérer l'état précédent
-            following_state = db.query(FollowingState).filter_by(target_fid=target_fid).first()
+            result = await db.execute(
+                select(FollowingState).filter_by(target_fid=target_fid)
+            )
+            following_state = result.scalars().first()
             
             if not following_state:
-                # Premier check - créer l'état
+                # Premier check - créer l'état (instantané complet)
                 following_state = FollowingState(
                     id=str(uuid.uuid4()),
                     target_fid=target_fid,
-                    last_following_list=json.dumps(current_fids)
+                    snapshot=encode_fids(current_fids),
+                    snapshot_hash=current_hash,
+                    following_count=len(current_fids),
+                    deltas_since_checkpoint=0
                 )
                 db.add(following_state)
-                db.commit()
+                await db.commit()
                 logger.info(f"✅ État initial créé pour FID {target_fid}")
-                return
+                return False
             
-            # Comparer avec l'état précédent
-            previous_fids = json.loads(following_state.last_following_list)
-            new_fids = list(set(current_fids) - set(previous_fids))
+            if following_state.snapshot_hash == current_hash:
+                # Liste inchangée : ni décodage ni écriture
+                logger.debug(f"✅ FID {target_fid}: Aucun nouveau following")
+                return False
+            
+            # Comparer avec l'état précédent (dernier instantané + deltas)
+            previous_fids = await self._load_following_set(following_state, db)
+            new_fids, removed_fids = diff_fids(current_fids, previous_fids)
             
             if new_fids:
                 logger.info(f"🆕 Nouveaux followings détectés pour FID {target_fid}: {new_fids}")
                 
                 # Envoyer les notifications
                 await self._send_following_notifications(target_fid, new_fids, current_usernames, tracking_entries, db)
+            
+            # Mettre à jour l'état : delta seul, ou instantané complet périodiquement
+            await self._save_following_delta(following_state, current_fids, current_hash, new_fids, removed_fids, db)
+            await db.commit()
+            
+            if not new_fids:
+                logger.debug(f"✅ FID {target_fid}: Aucun nouveau following ({len(removed_fids)} retiré(s))")
+            return bool(new_fids)
                 
-                # Mettre à jour l'état
-                following_state.last_following_list = json.dumps(current_fids)
-                following_state.last_check_at = datetime.utcnow()
-                db.commit()
-                
-            else:
-                logger.debug(f"✅ FID {target_fid}: Aucun nouveau following")
-                
-        except Exception as e:
-            logger.error(f"❌ Erreur lors de la vérification des followings pour FID {target_fid}: {e}")
+        except Exception:
+            await db.rollback()
+            raise
             
+    async def _load_following_set(self, following_state, db) -> Set[int]:
+        """Reconstituer la liste acquittée : instantané puis deltas dans l'ordre"""
+        fids = set(decode_fids(following_state.snapshot))
+        if following_state.deltas_since_checkpoint:
+            result = await db.execute(
+                select(FollowingStateDelta)
+                .filter_by(target_fid=following_state.target_fid)
+                .order_by(FollowingStateDelta.created_at, FollowingStateDelta.id)
+            )
+            for delta in result.scalars():
+                apply_delta(fids, decode_fids(delta.added), decode_fids(delta.removed))
+        return fids
+        
+    async def _save_following_delta(self, following_state, current_fids: List[int], current_hash: str,
+                                    added: List[int], removed: List[int], db):
+        """Persister le changement : un delta, ou un instantané complet qui remplace les deltas"""
+        changed = len(added) + len(removed)
+        if (following_state.deltas_since_checkpoint + 1 >= config.FOLLOWING_SNAPSHOT_CHECKPOINT_EVERY
+                or changed * 4 >= len(current_fids)):
+            following_state.snapshot = encode_fids(current_fids)
+            following_state.deltas_since_checkpoint = 0
+            await db.execute(
+                delete(FollowingStateDelta).where(FollowingStateDelta.target_fid == following_state.target_fid)
+            )
+        else:
+            db.add(FollowingStateDelta(
+                id=str(uuid.uuid4()),
+                target_fid=following_state.target_fid,
+                added=encode_fids(added),
+                removed=encode_fids(removed)
+            ))
+            following_state.deltas_since_checkpoint += 1
+        
+        following_state.snapshot_hash = current_hash
+        following_state.following_count = len(current_fids)
+        following_state.last_check_at = datetime.now(timezone.utc)
+        
     async def _send_following_notifications(self, target_fid: int, new_fids: List[int], current_usernames: Dict, tracking_entries: List, db):
         """Envoyer les notifications de nouveaux followings"""
         try:
@@ -140,7 +431,7 @@ class FollowingPoller:
             
             for fid in new_fids:
                 try:
-                    user_info = client.get_user_by_fid(fid)
+                    user_info = await asyncio.to_thread(client.get_user_by_fid, fid)
                     new_users_info.append({
                         'fid': fid,
                         'username': user_info['username'],
@@ -157,92 +448,265 @@ class FollowingPoller:
                         'pfp_url': ''
                     })
             
+            # Anti-doublon en une requête pour tous les salons et tous les nouveaux comptes
+            delivered = await delivered_following_keys(db, target_fid, new_fids, tracking_entries)
+            
             # Envoyer une notification pour chaque salon qui track ce compte
-            for tracking_entry in tracking_entries:
-                await self._send_channel_notification(
-                    target_fid, target_username, new_users_info, 
-                    tracking_entry, db
-                )
+            sent_rows = []
+            try:
+                for tracking_entry in tracking_entries:
+                    pending_users = [
+                        new_user for new_user in new_users_info
+                        if (tracking_entry.guild_id, tracking_entry.channel_id, new_user['fid']) not in delivered
+                    ]
+                    if not pending_users:
+                        logger.debug(f"Notifications déjà envoyées pour {target_username} dans {tracking_entry.channel_id}")
+                        continue
+                    
+                    sent_fids = await self._send_channel_notification(
+                        target_fid, target_username, pending_users, tracking_entry
+                    )
+                    sent_rows.extend(
+                        (tracking_entry.guild_id, tracking_entry.channel_id, target_fid, fid) for fid in sent_fids
+                    )
+            finally:
+                # Marquer comme envoyé : une insertion et un commit pour tous les salons
+                await self._record_following_deliveries(sent_rows, db)
                 
         except Exception as e:
             logger.error(f"❌ Erreur lors de l'envoi des notifications: {e}")
             
-    async def _send_channel_notification(self, target_fid: int, target_username: str, new_users_info: List[Dict], tracking_entry, db):
-        """Envoyer une notification dans un salon Discord spécifique"""
+    async def _record_following_deliveries(self, sent_rows: List[Tuple[str, str, int, int]], db):
+        """Insérer les livraisons (guild, salon, FID cible, FID suivi) en un lot (doublons ignorés)"""
+        if not sent_rows:
+            return
+        
+        await db.execute(
+            pg_insert(FollowingDelivery)
+            .values([
+                {
+                    "id": str(uuid.uuid4()),
+                    "guild_id": guild_id,
+                    "channel_id": channel_id,
+                    "target_fid": target_fid,
+                    "new_following_fid": fid
+                }
+                for guild_id, channel_id, target_fid, fid in sent_rows
+            ])
+            .on_conflict_do_nothing(index_elements=["guild_id", "channel_id", "target_fid", "new_following_fid"])
+        )
+        await db.commit()
+            
+    async def _send_channel_notification(self, target_fid: int, target_username: str, new_users_info: List[Dict], tracking_entry) -> List[int]:
+        """Envoyer les notifications dans un salon Discord, retourne les FIDs notifiés"""
+        sent_fids = []
         try:
-            # Utiliser le salon configuré, ou essayer de trouver le salon par défaut
-            channel = self.bot.get_channel(int(tracking_entry.channel_id))
+            from discord_bot import resolve_channel
+            
+            # Salon configuré : depuis le cache, ou salon partiel (REST) si sa guild est sur le shard d'une autre réplique
+            channel = resolve_channel(int(tracking_entry.channel_id), tracking_entry.guild_id)
             
             # Si le salon configuré n'existe plus, utiliser le salon de la variable d'environnement
-            if not channel:
-                if config.DEFAULT_CHANNEL_ID:
-                    channel = self.bot.get_channel(int(config.DEFAULT_CHANNEL_ID))
-                    logger.info(f"🔄 Utilisation du salon configuré {config.DEFAULT_CHANNEL_ID} pour les followings")
+            # (pas en multi-répliques : ce salon peut appartenir à une autre guild)
+            if not channel and config.DEFAULT_CHANNEL_ID and not config.MULTI_REPLICA:
+                channel = resolve_channel(int(config.DEFAULT_CHANNEL_ID))
+                logger.info(f"🔄 Utilisation du salon configuré {config.DEFAULT_CHANNEL_ID} pour les followings")
             
             if not channel:
-                logger.warning(f"⚠️ Salon Discord {tracking_entry.channel_id} introuvable et aucun salon configuré dans DEFAULT_CHANNEL_ID")
-                return
+                logger.warning(f"⚠️ Salon Discord {tracking_entry.channel_id} introuvable, notifications non envoyées")
+                return sent_fids
             
-            # Vérifier si on a déjà envoyé cette notification (anti-doublon)
-            for new_user in new_users_info:
-                existing_delivery = db.query(FollowingDelivery).filter_by(
-                    guild_id=tracking_entry.guild_id,
-                    channel_id=tracking_entry.channel_id,
-                    target_fid=target_fid,
-                    new_following_fid=new_user['fid']
-                ).first()
-                
-                if existing_delivery:
-                    logger.debug(f"Notification déjà envoyée pour {target_username} → {new_user['username']}")
-                    continue
-                
-                # Créer l'embed de notification
-                embed = discord.Embed(
-                    title=f"🆕 Nouveau Following",
-                    description=f"**@{target_username}** suit maintenant **@{new_user['username']}** !",
-                    color=0x00FF00,
-                    timestamp=discord.utils.utcnow()
-                )
-                
-                # Ajouter les informations du nouveau compte suivi
-                embed.add_field(
-                    name="👤 Nouveau compte suivi",
-                    value=f"**@{new_user['username']}** ({new_user['display_name']})\nFID: `{new_user['fid']}`",
-                    inline=False
-                )
-                
-                # Ajouter le lien vers Warpcast
-                warpcast_url = f"https://warpcast.com/{new_user['username']}"
-                embed.add_field(
-                    name="🔗 Voir sur Warpcast",
-                    value=f"[@{new_user['username']}]({warpcast_url})",
-                    inline=False
-                )
-                
-                # Ajouter l'image de profil si disponible
-                if new_user.get('pfp_url'):
-                    embed.set_thumbnail(url=new_user['pfp_url'])
-                
-                embed.set_footer(text=f"Suivi par @{target_username} • Farcaster Tracker Bot")
-                
-                # Envoyer la notification
-                await channel.send(embed=embed)
-                
-                # Marquer comme envoyé
-                delivery = FollowingDelivery(
-                    id=str(uuid.uuid4()),
-                    guild_id=tracking_entry.guild_id,
-                    channel_id=tracking_entry.channel_id,
-                    target_fid=target_fid,
-                    new_following_fid=new_user['fid']
-                )
-                db.add(delivery)
-                db.commit()
-                
-                logger.info(f"✅ Notification envoyée: {target_username} → {new_user['username']} dans {channel.name}")
+            if len(new_users_info) <= config.FOLLOWING_GROUP_THRESHOLD:
+                # Peu de nouveaux comptes : un embed détaillé par compte
+                for new_user in new_users_info:
+                    await channel.send(embed=build_following_embed(target_username, new_user))
+                    sent_fids.append(new_user['fid'])
+                    logger.info(f"✅ Notification envoyée: {target_username} → {new_user['username']} dans {tracking_entry.channel_id}")
+            else:
+                # Rafale : listes regroupées, plusieurs embeds par message dans les limites Discord
+                for embeds, fids in group_following_embeds(target_username, new_users_info):
+                    await channel.send(embeds=embeds)
+                    sent_fids.extend(fids)
+                logger.info(f"✅ {len(sent_fids)} nouveaux followings de {target_username} regroupés dans {tracking_entry.channel_id}")
                 
         except Exception as e:
             logger.error(f"❌ Erreur lors de l'envoi de notification dans {tracking_entry.channel_id}: {e}")
+        
+        return sent_fids
+
+# Limites Discord : 4096 caractères de description, 6000 caractères et 10 embeds par message
+EMBED_DESCRIPTION_LIMIT = 4096
+MESSAGE_EMBED_CHARS_LIMIT = 6000
+MESSAGE_EMBEDS_LIMIT = 10
+
+def following_embed_dict(target_username: str, new_user: Dict) -> Dict:
+    """Embed détaillé d'un nouveau compte suivi, au format de l'API Discord (sérialisable en JSON)"""
+    embed = {
+        "title": "🆕 Nouveau Following",
+        "description": f"**@{target_username}** suit maintenant **@{new_user['username']}** !",
+        "color": 0x00FF00,
+        "timestamp": True,
+        "fields": [
+            # Informations du nouveau compte suivi
+            {
+                "name": "👤 Nouveau compte suivi",
+                "value": f"**@{new_user['username']}** ({new_user['display_name']})\nFID: `{new_user['fid']}`",
+                "inline": False
+            },
+            # Lien vers Warpcast
+            {
+                "name": "🔗 Voir sur Warpcast",
+                "value": f"[@{new_user['username']}](https://warpcast.com/{new_user['username']})",
+                "inline": False
+            }
+        ],
+        "footer": {"text": f"Suivi par @{target_username} • Farcaster Tracker Bot"}
+    }
+    
+    # Image de profil si disponible
+    if new_user.get('pfp_url'):
+        embed["thumbnail"] = {"url": new_user['pfp_url']}
+    return embed
+
+def build_following_embed(target_username: str, new_user: Dict) -> discord.Embed:
+    """Embed détaillé pour un nouveau compte suivi"""
+    embed_dict = following_embed_dict(target_username, new_user)
+    del embed_dict["timestamp"]
+    embed = discord.Embed.from_dict(embed_dict)
+    embed.timestamp = discord.utils.utcnow()
+    return embed
+
+def group_following_embeds(target_username: str, new_users_info: List[Dict]) -> List[Tuple[List[discord.Embed], List[int]]]:
+    """Regrouper une rafale de followings en messages (embeds, FIDs couverts)
+    
+    Chaque embed liste au plus FOLLOWING_GROUP_PAGE_SIZE comptes et reste
+    sous la limite de description ; les embeds sont ensuite réunis par
+    message sans dépasser 10 embeds ni 6000 caractères.
+    """
+    pages: List[Tuple[List[str], List[int]]] = []
+    lines, fids, size = [], [], 0
+    for new_user in new_users_info:
+        line = (
+            f"• [@{new_user['username']}](https://warpcast.com/{new_user['username']}) "
+            f"({new_user['display_name']}) - FID `{new_user['fid']}`"
+        )[:EMBED_DESCRIPTION_LIMIT]
+        if lines and (len(lines) >= config.FOLLOWING_GROUP_PAGE_SIZE or size + len(line) + 1 > EMBED_DESCRIPTION_LIMIT):
+            pages.append((lines, fids))
+            lines, fids, size = [], [], 0
+        lines.append(line)
+        fids.append(new_user['fid'])
+        size += len(line) + 1
+    if lines:
+        pages.append((lines, fids))
+    
+    total = len(new_users_info)
+    messages: List[Tuple[List[discord.Embed], List[int]]] = []
+    embeds, message_fids, message_size = [], [], 0
+    for index, (page_lines, page_fids) in enumerate(pages, start=1):
+        embed = discord.Embed(
+            title=f"🆕 @{target_username} suit {total} nouveaux comptes"
+                  + (f" ({index}/{len(pages)})" if len(pages) > 1 else ""),
+            description="\n".join(page_lines),
+            color=0x00FF00,
+            timestamp=discord.utils.utcnow()
+        )
+        embed.set_footer(text=f"Suivi par @{target_username} • Farcaster Tracker Bot")
+        
+        if embeds and (len(embeds) >= MESSAGE_EMBEDS_LIMIT or message_size + len(embed) > MESSAGE_EMBED_CHARS_LIMIT):
+            messages.append((embeds, message_fids))
+            embeds, message_fids, message_size = [], [], 0
+        embeds.append(embed)
+        message_fids.extend(page_fids)
+        message_size += len(embed)
+    if embeds:
+        messages.append((embeds, message_fids))
+    
+    return messages
+
+# Événements Neynar du webhook des follows
+FOLLOW_EVENT_TYPES = ("follow.created", "follow.deleted")
+
+async def delivered_following_keys(db, target_fid: int, new_fids: List[int], tracking_entries: List) -> Set[Tuple[str, str, int]]:
+    """(guild, salon, FID suivi) déjà notifiés, en une requête sur l'index anti-doublon"""
+    channels = {(entry.guild_id, entry.channel_id) for entry in tracking_entries}
+    if not channels or not new_fids:
+        return set()
+    
+    result = await db.execute(
+        select(FollowingDelivery.guild_id, FollowingDelivery.channel_id, FollowingDelivery.new_following_fid)
+        .where(
+            tuple_(FollowingDelivery.guild_id, FollowingDelivery.channel_id).in_(channels),
+            FollowingDelivery.target_fid == target_fid,
+            FollowingDelivery.new_following_fid.in_(new_fids)
+        )
+    )
+    return {tuple(row) for row in result}
+
+def follow_user_info(user: Dict) -> Dict:
+    """Infos d'un compte à partir de l'objet utilisateur Neynar"""
+    username = user.get('username') or f"FID_{user['fid']}"
+    return {
+        'fid': int(user['fid']),
+        'username': username,
+        'display_name': user.get('display_name') or username,
+        'pfp_url': user.get('pfp_url', '')
+    }
+
+async def build_follow_event_messages(follower: Dict, followed: Dict) -> List[Dict]:
+    """Messages de livraison pour un follow.created (même file que les casts)
+    
+    Un message par salon qui suit les followings du compte, sauf ceux déjà
+    notifiés (par un événement précédent ou par le polling de rattrapage).
+    """
+    follower_fid = int(follower['fid'])
+    new_user = follow_user_info(followed)
+    
+    db = get_async_session_local()()
+    try:
+        result = await db.execute(select(TrackedFollowing).filter_by(target_fid=follower_fid))
+        tracking_entries = result.scalars().all()
+        delivered = await delivered_following_keys(db, follower_fid, [new_user['fid']], tracking_entries)
+    finally:
+        await db.close()
+    
+    messages = []
+    for tracking_entry in tracking_entries:
+        if (tracking_entry.guild_id, tracking_entry.channel_id, new_user['fid']) in delivered:
+            continue
+        messages.append({
+            'kind': 'following',
+            'channel_id': int(tracking_entry.channel_id),
+            'guild_id': tracking_entry.guild_id,
+            'embed': following_embed_dict(tracking_entry.target_username, new_user),
+            'author_username': tracking_entry.target_username,
+            # Clé d'unicité de la file de livraison (pending_deliveries)
+            'cast_hash': f"follow:{follower_fid}:{new_user['fid']}",
+            'target_fid': follower_fid,
+            'new_following_fid': new_user['fid']
+        })
+    return messages
+
+async def record_following_delivery(message_data: Dict):
+    """Enregistrer une notification de following livrée par la file de livraison"""
+    db = get_async_session_local()()
+    try:
+        await db.execute(
+            pg_insert(FollowingDelivery)
+            .values(
+                id=str(uuid.uuid4()),
+                guild_id=message_data['guild_id'],
+                channel_id=str(message_data['channel_id']),
+                target_fid=message_data['target_fid'],
+                new_following_fid=message_data['new_following_fid']
+            )
+            .on_conflict_do_nothing(index_elements=["guild_id", "channel_id", "target_fid", "new_following_fid"])
+        )
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"❌ Erreur lors de l'enregistrement de la notification de following: {e}")
+    finally:
+        await db.close()
 
 # Instance globale du poller
 _following_poller = None
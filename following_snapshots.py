@@ -0,0 +1,57 @@
+import hashlib
+import zlib
+from array import array
+from typing import Iterable, List, Set, Tuple
+
+# Format des instantanés de followings : FIDs triés, encodés en écarts
+# successifs (varint LEB128) puis compressés avec zlib. Une liste de 50k FIDs
+# tient en quelques dizaines de Ko au lieu de plusieurs centaines en JSON.
+
+def normalize_fids(fids: Iterable[int]) -> List[int]:
+    """FIDs uniques triés (forme canonique pour le hash et l'encodage)"""
+    return sorted({int(fid) for fid in fids})
+
+def snapshot_hash(sorted_fids: List[int]) -> str:
+    """Empreinte d'une liste triée : une liste inchangée n'est ni décodée ni réécrite"""
+    return hashlib.blake2b(array('q', sorted_fids).tobytes(), digest_size=16).hexdigest()
+
+def encode_fids(fids: Iterable[int]) -> bytes:
+    """Encoder des FIDs en instantané compact"""
+    out = bytearray()
+    previous = 0
+    for fid in normalize_fids(fids):
+        gap = fid - previous
+        previous = fid
+        while gap >= 0x80:
+            out.append((gap & 0x7F) | 0x80)
+            gap >>= 7
+        out.append(gap)
+    return zlib.compress(bytes(out))
+
+def decode_fids(blob: bytes) -> List[int]:
+    """Décoder un instantané en liste triée de FIDs"""
+    if not blob:
+        return []
+    
+    fids = []
+    value = shift = previous = 0
+    for byte in zlib.decompress(blob):
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        previous += value
+        fids.append(previous)
+        value = shift = 0
+    return fids
+
+def apply_delta(fids: Set[int], added: Iterable[int], removed: Iterable[int]) -> Set[int]:
+    """Appliquer un delta (ajouts, retraits) à un ensemble de FIDs"""
+    fids.difference_update(removed)
+    fids.update(added)
+    return fids
+
+def diff_fids(current: List[int], previous: Set[int]) -> Tuple[List[int], List[int]]:
+    """(ajoutés, retirés) entre la liste courante triée et l'ensemble précédent"""
+    current_set = set(current)
+    return sorted(current_set - previous), sorted(previous - current_set)
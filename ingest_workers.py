@@ -0,0 +1,242 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import struct
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import uvicorn
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# En-tête de trame : longueur du lot JSON (4 octets, big-endian)
+FRAME_HEADER = struct.Struct(">I")
+# Taille maximale d'un lot (un cast routé vers des milliers de salons reste bien en dessous)
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+class DeliveryChannelServer:
+    """Réception, côté processus Discord, des livraisons routées par les processus d'ingestion
+    
+    Protocole : un lot JSON par trame (longueur sur 4 octets puis le JSON)
+    sur un socket Unix, acquitté par une ligne contenant le nombre de
+    messages mis en file (-1 si refusé). Les trames ne sont pas bornées
+    par la limite de ligne des streams asyncio : un cast routé vers des
+    centaines de salons passe. Le webhook ne répond 200 qu'après
+    l'acquittement.
+    """
+    
+    def __init__(self, path: str, on_messages: Callable[[List[Dict[str, Any]]], Awaitable[int]]):
+        self.path = path
+        self.on_messages = on_messages
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.stats = {
+            "batches": 0,
+            "messages": 0,
+            "errors": 0
+        }
+    
+    async def start(self):
+        if os.path.exists(self.path):
+            # Socket laissé par un processus précédent
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+        logger.info(f"🔌 Canal de livraison inter-processus ouvert sur {self.path}")
+    
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(FRAME_HEADER.size)
+                except asyncio.IncompleteReadError:
+                    break
+                
+                (size,) = FRAME_HEADER.unpack(header)
+                if size > MAX_FRAME_BYTES:
+                    # Trame impossible à sauter sans la lire : refuser et fermer la connexion
+                    self.stats["errors"] += 1
+                    logger.error(f"❌ Lot de livraisons inter-processus trop volumineux ({size} octets)")
+                    writer.write(b"-1\n")
+                    await writer.drain()
+                    break
+                payload = await reader.readexactly(size)
+                
+                try:
+                    messages = json.loads(payload)
+                    count = await self.on_messages(messages)
+                    self.stats["batches"] += 1
+                    self.stats["messages"] += count
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    logger.error(f"❌ Lot de livraisons inter-processus refusé: {e}")
+                    count = -1
+                
+                writer.write(f"{count}\n".encode())
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+    
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        logger.info("🔌 Canal de livraison inter-processus fermé")
+
+class DeliveryChannelClient:
+    """Envoi, côté processus d'ingestion, des livraisons vers le processus Discord"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock: Optional[asyncio.Lock] = None
+    
+    async def send(self, messages: List[Dict[str, Any]]) -> int:
+        """Transmettre un lot et attendre l'acquittement, retourne le nombre mis en file"""
+        if not messages:
+            return 0
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        
+        # Une connexion par processus : les lots sont sérialisés (requête, acquittement)
+        async with self._lock:
+            if self._writer is None or self._writer.is_closing():
+                self._reader, self._writer = await asyncio.open_unix_connection(self.path)
+            
+            try:
+                payload = json.dumps(messages).encode()
+                self._writer.write(FRAME_HEADER.pack(len(payload)) + payload)
+                await self._writer.drain()
+                line = await self._reader.readline()
+                if not line:
+                    raise ConnectionError("canal de livraison fermé par le processus Discord")
+            except Exception:
+                # Reconnexion au prochain lot ; l'erreur remonte (500, Neynar réessaie)
+                await self.close()
+                raise
+            
+            count = int(line)
+            if count < 0:
+                raise RuntimeError("lot refusé par le processus Discord")
+            return count
+    
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            self._reader = None
+
+def run_ingest_worker(sock: socket.socket, worker_id: int):
+    """Point d'entrée d'un processus d'ingestion : uvicorn sur le socket partagé"""
+    logging.basicConfig(
+        level=getattr(logging, config.LOG_LEVEL),
+        format=f'%(asctime)s - ingest-{worker_id} - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    import webhook_handler
+    webhook_handler.enable_ingest_only(DeliveryChannelClient(config.INGEST_IPC_PATH))
+    
+    server = uvicorn.Server(uvicorn.Config(
+        webhook_handler.app,
+        log_level=config.LOG_LEVEL.lower()
+    ))
+    server.run(sockets=[sock])
+
+class IngestWorkerPool:
+    """Processus uvicorn d'ingestion des webhooks, supervisés par le processus Discord
+    
+    Les processus partagent le socket d'écoute (le noyau répartit les
+    connexions) : vérification HMAC, décodage JSON, construction des embeds
+    et requêtes de routage s'exécutent sur plusieurs cœurs. Les livraisons
+    routées reviennent au processus Discord par le canal inter-processus.
+    """
+    
+    def __init__(self, on_messages: Callable[[List[Dict[str, Any]]], Awaitable[int]], count: int = None):
+        self.count = count or config.INGEST_WORKERS or os.cpu_count() or 1
+        self.channel = DeliveryChannelServer(config.INGEST_IPC_PATH, on_messages)
+        self.processes: List[Optional[multiprocessing.Process]] = []
+        self._context = multiprocessing.get_context("spawn")
+        self._sock: Optional[socket.socket] = None
+        self._supervisor: Optional[asyncio.Task] = None
+        self.stats = {
+            "restarts": 0
+        }
+    
+    def _bind(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(("0.0.0.0", config.PORT))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+    
+    def _spawn(self, worker_id: int) -> multiprocessing.Process:
+        process = self._context.Process(
+            target=run_ingest_worker,
+            args=(self._sock, worker_id),
+            name=f"ingest-{worker_id}",
+            daemon=True
+        )
+        process.start()
+        return process
+    
+    async def start(self):
+        """Ouvrir le canal inter-processus puis lancer les processus d'ingestion"""
+        await self.channel.start()
+        self._sock = self._bind()
+        self.processes = [self._spawn(i) for i in range(self.count)]
+        self._supervisor = asyncio.create_task(self._supervise())
+        logger.info(f"🌐 {self.count} processus d'ingestion des webhooks sur le port {config.PORT}")
+    
+    async def _supervise(self):
+        """Relancer un processus d'ingestion arrêté de façon inattendue"""
+        while True:
+            await asyncio.sleep(1)
+            for worker_id, process in enumerate(self.processes):
+                if process is not None and not process.is_alive():
+                    logger.error(f"❌ Processus d'ingestion {worker_id} arrêté (code {process.exitcode}), relance")
+                    self.stats["restarts"] += 1
+                    self.processes[worker_id] = self._spawn(worker_id)
+    
+    def alive_count(self) -> int:
+        return sum(1 for process in self.processes if process is not None and process.is_alive())
+    
+    async def stop(self, timeout: float):
+        """Arrêter l'ingestion : requêtes en cours terminées (et transmises), puis canal fermé"""
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+            await asyncio.gather(self._supervisor, return_exceptions=True)
+            self._supervisor = None
+        
+        # SIGTERM : chaque uvicorn cesse d'accepter et finit ses requêtes
+        for process in self.processes:
+            if process is not None and process.is_alive():
+                process.terminate()
+        
+        deadline = time.monotonic() + timeout
+        for process in self.processes:
+            if process is None:
+                continue
+            await asyncio.to_thread(process.join, max(deadline - time.monotonic(), 0.1))
+            if process.is_alive():
+                logger.warning(f"⚠️ Processus {process.name} toujours actif après {timeout:.0f}s, arrêt forcé")
+                process.kill()
+                await asyncio.to_thread(process.join, 1)
+        self.processes = []
+        
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        
+        await self.channel.stop()
+        logger.info(
+            f"🛑 Ingestion arrêtée : {self.channel.stats['batches']} lot(s), "
+            f"{self.channel.stats['messages']} livraison(s) reçue(s), {self.stats['restarts']} relance(s)"
+        )
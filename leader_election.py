@@ -0,0 +1,143 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional, Tuple
+from sqlalchemy import select, func
+from database import get_async_engine
+from config import config
+
+logger = logging.getLogger(__name__)
+
+class LeaderElection:
+    """Élection d'un leader entre répliques par verrou consultatif Postgres
+    
+    Le verrou est pris au niveau session sur une connexion dédiée : il
+    appartient à la réplique tant que cette connexion vit, et Postgres le
+    libère de lui-même si le processus meurt. Les tâches uniques
+    (réconciliation du webhook, détection de dérive, polling) ne tournent
+    que sur le leader.
+    """
+    
+    def __init__(self, lock_key: int = None, retry_interval: float = None):
+        self.lock_key = lock_key if lock_key is not None else config.LEADER_LOCK_KEY
+        self.retry_interval = retry_interval if retry_interval is not None else config.LEADER_RETRY_SECONDS
+        self.is_leader = False
+        self.jobs: List[Tuple[str, Callable[[], Awaitable], Callable[[], Awaitable]]] = []
+        self._conn = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            "elections_won": 0,
+            "leadership_lost": 0
+        }
+    
+    def add_job(self, name: str, start: Callable[[], Awaitable], stop: Callable[[], Awaitable]):
+        """Déclarer une tâche unique, démarrée à l'élection et arrêtée à la perte du verrou"""
+        self.jobs.append((name, start, stop))
+    
+    async def _try_acquire(self) -> bool:
+        """Tenter de prendre le verrou sur une connexion dédiée"""
+        conn = await get_async_engine().connect()
+        try:
+            acquired = (await conn.execute(select(func.pg_try_advisory_lock(self.lock_key)))).scalar()
+            # Verrou de session : il survit au commit, la connexion ne reste pas "idle in transaction"
+            await conn.commit()
+        except Exception:
+            await conn.close()
+            raise
+        
+        if acquired:
+            self._conn = conn
+        else:
+            await conn.close()
+        return acquired
+    
+    async def _check_alive(self) -> bool:
+        """Vérifier que la connexion qui porte le verrou répond toujours"""
+        try:
+            await self._conn.execute(select(1))
+            await self._conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"❌ Connexion du verrou de leader perdue: {e}")
+            return False
+    
+    async def _promote(self):
+        self.is_leader = True
+        self.stats["elections_won"] += 1
+        logger.info(f"👑 Réplique élue leader (verrou {self.lock_key})")
+        for name, start, _ in self.jobs:
+            try:
+                await start()
+                logger.info(f"👑 Tâche unique démarrée: {name}")
+            except Exception as e:
+                logger.error(f"❌ Impossible de démarrer la tâche unique {name}: {e}")
+    
+    async def _demote(self, release: bool = True):
+        self.is_leader = False
+        for name, _, stop in reversed(self.jobs):
+            try:
+                await stop()
+            except Exception as e:
+                logger.error(f"❌ Erreur à l'arrêt de la tâche unique {name}: {e}")
+        
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                if release:
+                    await conn.execute(select(func.pg_advisory_unlock(self.lock_key)))
+                    await conn.commit()
+                    await conn.close()
+                else:
+                    # Connexion douteuse : ne pas la rendre au pool avec le verrou
+                    await conn.invalidate()
+            except Exception as e:
+                logger.error(f"❌ Erreur lors de la libération du verrou de leader: {e}")
+    
+    async def _run(self):
+        """Boucle d'élection : candidater tant qu'on n'est pas leader, vérifier sinon"""
+        while True:
+            try:
+                if not self.is_leader:
+                    if await self._try_acquire():
+                        await self._promote()
+                elif not await self._check_alive():
+                    self.stats["leadership_lost"] += 1
+                    logger.warning("⚠️ Leadership perdu, arrêt des tâches uniques")
+                    await self._demote(release=False)
+            except Exception as e:
+                logger.error(f"❌ Erreur dans l'élection du leader: {e}")
+            await asyncio.sleep(self.retry_interval)
+    
+    def start(self) -> bool:
+        """Démarrer l'élection sur l'event loop courant (une seule fois)"""
+        if self._task is not None and not self._task.done():
+            return False
+        
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"🗳️ Élection du leader démarrée ({len(self.jobs)} tâche(s) unique(s))")
+        return True
+    
+    async def stop(self):
+        """Arrêter l'élection et rendre le verrou (un autre réplique prend le relais)"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        
+        if self.is_leader:
+            await self._demote()
+            logger.info("👑 Leadership rendu")
+
+# Instance globale de l'élection
+_leader_election = None
+
+def get_leader_election() -> LeaderElection:
+    """Obtenir l'instance de l'élection du leader"""
+    global _leader_election
+    
+    if _leader_election is None:
+        _leader_election = LeaderElection()
+    
+    return _leader_election
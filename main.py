@@ -1,11 +1,23 @@
 import asyncio
+import signal
 import threading
 import logging
 import time
 from config import config
-from database import init_db, check_db_connection
-from discord_bot import run_bot
-from webhook_handler import app
+from database import init_db, check_db_connection, dispose_async_engine
+from discord_bot import bot, run_bot
+from webhook_handler import (
+    app, stop_accepting_webhooks, drain_deliveries, start_delivery_workers,
+    replay_pending_deliveries, accept_ingested_deliveries
+)
+from ingest_workers import IngestWorkerPool
+from delivery_store import get_delivery_recorder
+from subscription_updater import get_subscription_updater
+from drift_detector import get_drift_detector
+from following_polling import stop_following_polling
+from leader_election import get_leader_election
+from neynar_client import close_neynar_client
+from command_executor import get_command_executor
 import uvicorn
 
 # Configuration du logging
@@ -16,7 +28,7 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 def run_webhook_server():
-    """Lancer le serveur webhook FastAPI dans un thread séparé"""
+    """Lancer le serveur webhook FastAPI dans un thread séparé (mode "threaded")"""
     try:
         uvicorn.run(
             app,
@@ -27,6 +39,144 @@ def run_webhook_server():
     except Exception as e:
         logger.error(f"Erreur lors du lancement du serveur webhook: {e}")
 
+async def wait_for_ready(is_ready, task: asyncio.Task, name: str, timeout: float):
+    """Attendre qu'un composant soit prêt, en échouant s'il s'arrête avant"""
+    deadline = time.monotonic() + timeout
+    while not is_ready():
+        if task.done():
+            # Le composant s'est arrêté pendant le démarrage : remonter son erreur
+            task.result()
+            raise RuntimeError(f"{name} arrêté pendant le démarrage")
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"{name} non prêt après {timeout:.0f}s")
+        await asyncio.sleep(0.05)
+    logger.info(f"✅ {name} prêt")
+
+async def graceful_shutdown(bot_task: asyncio.Task, server: uvicorn.Server = None, server_task: asyncio.Task = None,
+                            ingestion: IngestWorkerPool = None):
+    """Arrêt coordonné : plus de webhooks, file vidée ou sauvegardée, puis fermeture des connexions"""
+    logger.info(f"🛑 Arrêt gracieux (échéance {config.SHUTDOWN_GRACE_SECONDS:.0f}s)...")
+    
+    # 1. Refuser les nouveaux webhooks : Neynar les réessaiera sur la prochaine instance
+    if ingestion is not None:
+        # Processus d'ingestion : requêtes en cours terminées et transmises avant la fermeture du canal
+        await ingestion.stop(config.SHUTDOWN_GRACE_SECONDS)
+    else:
+        stop_accepting_webhooks()
+    
+    # 2. Livrer la file jusqu'à l'échéance (sans attendre si le bot est déjà arrêté), sauvegarder le reste
+    grace = 0 if bot_task.done() else config.SHUTDOWN_GRACE_SECONDS
+    report = await drain_deliveries(grace)
+    
+    # 3. Arrêter le serveur HTTP
+    if server is not None:
+        server.should_exit = True
+        await asyncio.gather(server_task, return_exceptions=True)
+    
+    # 4. Écrire les livraisons groupées et les mises à jour d'abonnement en attente
+    await get_delivery_recorder().flush()
+    await get_subscription_updater().stop()
+    await get_drift_detector().stop()
+    await stop_following_polling()
+    
+    # Rendre le verrou de leader : une autre réplique reprend les tâches uniques sans attendre
+    await get_leader_election().stop()
+    
+    # 5. Fermer Neynar, Discord et la base
+    close_neynar_client()
+    if not bot.is_closed():
+        await bot.close()
+    await asyncio.gather(bot_task, return_exceptions=True)
+    get_command_executor().shutdown()
+    await dispose_async_engine()
+    
+    logger.info(
+        f"👋 Arrêt terminé : {report['delivered']} livraison(s) envoyée(s), {report['failed']} en échec, "
+        f"{report['persisted']} sauvegardée(s) pour le prochain démarrage, {report['dropped']} perdue(s), "
+        f"{len(get_delivery_recorder().pending)} enregistrement(s) non écrit(s)"
+        + (f", {report['queued']} en file partagée" if report.get('queued') is not None else "")
+    )
+    return report
+
+async def run_unified():
+    """Lancer FastAPI et le bot Discord comme tâches d'un seul event loop"""
+    server = uvicorn.Server(uvicorn.Config(
+        app,
+        host="0.0.0.0",
+        port=config.PORT,
+        log_level=config.LOG_LEVEL.lower()
+    ))
+    
+    # Signaux gérés ici plutôt que par uvicorn : l'arrêt est orchestré avant celui du serveur
+    shutdown_requested = asyncio.Event()
+    server.install_signal_handlers = lambda: None
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, shutdown_requested.set)
+    
+    # 1. Serveur webhook : les livraisons reçues avant que le bot soit prêt attendent en file
+    logger.info(f"🌐 Lancement du serveur webhook sur le port {config.PORT}...")
+    server_task = asyncio.create_task(server.serve(), name="webhook-server")
+    await wait_for_ready(lambda: server.started, server_task, "Serveur webhook", config.STARTUP_TIMEOUT_SECONDS)
+    
+    # 2. Bot Discord sur le même loop
+    logger.info("🤖 Lancement du bot Discord...")
+    bot_task = asyncio.create_task(bot.start(config.DISCORD_TOKEN), name="discord-bot")
+    try:
+        await wait_for_ready(bot.is_ready, bot_task, "Bot Discord", config.STARTUP_TIMEOUT_SECONDS)
+        
+        # Tourner jusqu'à un signal d'arrêt ou l'arrêt de l'un des deux
+        stop_task = asyncio.create_task(shutdown_requested.wait())
+        done, _ = await asyncio.wait({server_task, bot_task, stop_task}, return_when=asyncio.FIRST_COMPLETED)
+        stop_task.cancel()
+        for task in done - {stop_task}:
+            if not task.cancelled() and task.exception():
+                logger.error(f"❌ {task.get_name()} arrêté sur erreur: {task.exception()}")
+    finally:
+        await graceful_shutdown(bot_task, server=server, server_task=server_task)
+
+async def run_multiprocess():
+    """Bot Discord dans ce processus, ingestion des webhooks dans INGEST_WORKERS processus uvicorn"""
+    shutdown_requested = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, shutdown_requested.set)
+    
+    # 1. File de livraison locale, alimentée par le canal inter-processus
+    start_delivery_workers()
+    await replay_pending_deliveries()
+    
+    ingestion = IngestWorkerPool(accept_ingested_deliveries)
+    await ingestion.start()
+    
+    # 2. Bot Discord, seul détenteur de la connexion gateway
+    logger.info("🤖 Lancement du bot Discord...")
+    bot_task = asyncio.create_task(bot.start(config.DISCORD_TOKEN), name="discord-bot")
+    try:
+        await wait_for_ready(bot.is_ready, bot_task, "Bot Discord", config.STARTUP_TIMEOUT_SECONDS)
+        
+        stop_task = asyncio.create_task(shutdown_requested.wait())
+        done, _ = await asyncio.wait({bot_task, stop_task}, return_when=asyncio.FIRST_COMPLETED)
+        stop_task.cancel()
+        if bot_task in done and not bot_task.cancelled() and bot_task.exception():
+            logger.error(f"❌ {bot_task.get_name()} arrêté sur erreur: {bot_task.exception()}")
+    finally:
+        await graceful_shutdown(bot_task, ingestion=ingestion)
+
+def run_threaded():
+    """Ancien mode : serveur webhook dans un thread, bot Discord sur le thread principal"""
+    logger.info(f"🌐 Lancement du serveur webhook sur le port {config.PORT}...")
+    webhook_thread = threading.Thread(target=run_webhook_server, daemon=True)
+    webhook_thread.start()
+    
+    # Attendre un peu que le serveur démarre
+    logger.info("⏳ Attente du démarrage du serveur webhook...")
+    time.sleep(3)
+    
+    # Lancer le bot Discord
+    logger.info("🤖 Lancement du bot Discord...")
+    run_bot()
+
 def main():
     """Fonction principale"""
     logger.info("🚀 Démarrage du Farcaster Tracker Bot...")
@@ -62,19 +212,16 @@ def main():
     else:
         logger.warning("⚠️ DATABASE_URL non configuré, le bot fonctionnera en mode dégradé")
     
-    # Lancer le serveur webhook dans un thread séparé
-    logger.info(f"🌐 Lancement du serveur webhook sur le port {config.PORT}...")
-    webhook_thread = threading.Thread(target=run_webhook_server, daemon=True)
-    webhook_thread.start()
-    
-    # Attendre un peu que le serveur démarre
-    logger.info("⏳ Attente du démarrage du serveur webhook...")
-    time.sleep(3)
-    
-    # Lancer le bot Discord
-    logger.info("🤖 Lancement du bot Discord...")
+    logger.info(f"⚙️ Mode d'exécution: {config.RUNTIME_MODE}")
+    if config.MULTI_REPLICA and config.RUNTIME_MODE == "threaded":
+        logger.warning("⚠️ MULTI_REPLICA ignoré en mode threaded : file partagée et élection du leader exigent RUNTIME_MODE=unified")
     try:
-        run_bot()
+        if config.RUNTIME_MODE == "threaded":
+            run_threaded()
+        elif config.RUNTIME_MODE == "multiprocess":
+            asyncio.run(run_multiprocess())
+        else:
+            asyncio.run(run_unified())
     except KeyboardInterrupt:
         logger.info("🛑 Arrêt demandé par l'utilisateur")
     except Exception as e:
@@ -0,0 +1,49 @@
+"""Environnement Alembic : migrations du schéma à partir de DATABASE_URL"""
+
+import sys
+from pathlib import Path
+
+from alembic import context
+from sqlalchemy import create_engine
+
+# Rendre les modules du projet importables depuis la CLI alembic
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from config import config as app_config
+from database import Base
+
+alembic_config = context.config
+target_metadata = Base.metadata
+
+def run_migrations_offline():
+    """Générer le SQL des migrations sans connexion (alembic upgrade --sql)"""
+    context.configure(
+        url=app_config.DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True
+    )
+    
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    """Appliquer les migrations sur la base configurée"""
+    # Connexion fournie par database.run_migrations() au démarrage du bot
+    connection = alembic_config.attributes.get("connection")
+    
+    if connection is not None:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+        
+    engine = create_engine(app_config.DATABASE_URL)
+    with engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,56 @@
+"""Schéma initial (tables historiquement créées par create_all)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "guilds",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("default_channel_id", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    )
+    op.create_table(
+        "tracked_accounts",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("guild_id", sa.String(), nullable=False),
+        sa.Column("channel_id", sa.String(), nullable=False),
+        sa.Column("fid", sa.Integer(), nullable=False),
+        sa.Column("username", sa.String(), nullable=False),
+        sa.Column("added_by_discord_user_id", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    )
+    op.create_table(
+        "deliveries",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("guild_id", sa.String(), nullable=False),
+        sa.Column("channel_id", sa.String(), nullable=False),
+        sa.Column("cast_hash", sa.String(), nullable=False),
+        sa.Column("delivered_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_table(
+        "webhook_state",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("webhook_id", sa.String(), nullable=False),
+        sa.Column("active", sa.Boolean()),
+        sa.Column("author_fids", sa.Text(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    )
+
+def downgrade():
+    op.drop_table("webhook_state")
+    op.drop_table("deliveries")
+    op.drop_table("tracked_accounts")
+    op.drop_table("guilds")
@@ -0,0 +1,69 @@
+"""Index et contraintes d'unicité pour les requêtes chaudes
+
+- tracked_accounts (guild_id, channel_id, fid) unique : !track, !list par guild
+- tracked_accounts (fid) : routage des webhooks par auteur
+- deliveries (cast_hash, channel_id) unique : anti-doublon par hash
+
+Les index sont créés en CONCURRENTLY pour ne pas verrouiller les tables
+en écriture sur les grosses bases.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Supprimer les doublons existants avant de poser les contraintes d'unicité
+    op.execute("""
+        DELETE FROM tracked_accounts a
+        USING tracked_accounts b
+        WHERE a.guild_id = b.guild_id
+          AND a.channel_id = b.channel_id
+          AND a.fid = b.fid
+          AND a.id > b.id
+    """)
+    op.execute("""
+        DELETE FROM deliveries a
+        USING deliveries b
+        WHERE a.cast_hash = b.cast_hash
+          AND a.channel_id = b.channel_id
+          AND a.id > b.id
+    """)
+    
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "uq_tracked_accounts_guild_channel_fid",
+            "tracked_accounts",
+            ["guild_id", "channel_id", "fid"],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+        op.create_index(
+            "ix_tracked_accounts_fid",
+            "tracked_accounts",
+            ["fid"],
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+        op.create_index(
+            "uq_deliveries_cast_hash_channel",
+            "deliveries",
+            ["cast_hash", "channel_id"],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index("uq_deliveries_cast_hash_channel", table_name="deliveries", postgresql_concurrently=True)
+        op.drop_index("ix_tracked_accounts_fid", table_name="tracked_accounts", postgresql_concurrently=True)
+        op.drop_index("uq_tracked_accounts_guild_channel_fid", table_name="tracked_accounts", postgresql_concurrently=True)
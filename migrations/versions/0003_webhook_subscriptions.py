@@ -0,0 +1,46 @@
+"""Normalisation de webhook_state.author_fids en table webhook_subscriptions
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "webhook_subscriptions",
+        sa.Column("webhook_id", sa.String(), primary_key=True),
+        sa.Column("fid", sa.Integer(), primary_key=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    
+    # Reprendre les FIDs du blob JSON existant (stockés en nombres ou en chaînes)
+    op.execute("""
+        INSERT INTO webhook_subscriptions (webhook_id, fid)
+        SELECT DISTINCT ws.webhook_id, (elem #>> '{}')::integer
+        FROM webhook_state ws,
+             json_array_elements(COALESCE(NULLIF(ws.author_fids, ''), '[]')::json) AS elem
+        ON CONFLICT DO NOTHING
+    """)
+    
+    op.drop_column("webhook_state", "author_fids")
+
+def downgrade():
+    op.add_column("webhook_state", sa.Column("author_fids", sa.Text(), nullable=False, server_default="[]"))
+    op.execute("""
+        UPDATE webhook_state ws
+        SET author_fids = COALESCE((
+            SELECT json_agg(s.fid ORDER BY s.fid)::text
+            FROM webhook_subscriptions s
+            WHERE s.webhook_id = ws.webhook_id
+        ), '[]')
+    """)
+    op.alter_column("webhook_state", "author_fids", server_default=None)
+    op.drop_table("webhook_subscriptions")
@@ -0,0 +1,30 @@
+"""Pool de webhooks : un propriétaire par FID et secret par shard
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column("webhook_state", sa.Column("secret", sa.String(), nullable=True))
+    
+    # Garder un seul webhook propriétaire par FID avant de poser l'unicité
+    op.execute("""
+        DELETE FROM webhook_subscriptions a
+        USING webhook_subscriptions b
+        WHERE a.fid = b.fid
+          AND a.webhook_id > b.webhook_id
+    """)
+    op.create_index("uq_webhook_subscriptions_fid", "webhook_subscriptions", ["fid"], unique=True)
+
+def downgrade():
+    op.drop_index("uq_webhook_subscriptions_fid", table_name="webhook_subscriptions")
+    op.drop_column("webhook_state", "secret")
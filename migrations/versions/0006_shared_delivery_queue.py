@@ -0,0 +1,44 @@
+"""File de livraison partagée entre répliques (partitions par salon)
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column("pending_deliveries", sa.Column("partition", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("pending_deliveries", sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"))
+    
+    # Garder une seule livraison en attente par cast et par salon
+    op.execute("""
+        DELETE FROM pending_deliveries a
+        USING pending_deliveries b
+        WHERE a.cast_hash = b.cast_hash
+          AND a.channel_id = b.channel_id
+          AND a.id > b.id
+    """)
+    op.create_index(
+        "uq_pending_deliveries_cast_hash_channel",
+        "pending_deliveries",
+        ["cast_hash", "channel_id"],
+        unique=True
+    )
+    op.create_index(
+        "ix_pending_deliveries_partition_created_at",
+        "pending_deliveries",
+        ["partition", "created_at"]
+    )
+
+def downgrade():
+    op.drop_index("ix_pending_deliveries_partition_created_at", table_name="pending_deliveries")
+    op.drop_index("uq_pending_deliveries_cast_hash_channel", table_name="pending_deliveries")
+    op.drop_column("pending_deliveries", "attempts")
+    op.drop_column("pending_deliveries", "partition")
@@ -0,0 +1,76 @@
+"""Tables du suivi des followings
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "tracked_followings",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("guild_id", sa.String(), nullable=False),
+        sa.Column("channel_id", sa.String(), nullable=False),
+        sa.Column("target_fid", sa.Integer(), nullable=False),
+        sa.Column("target_username", sa.String(), nullable=False),
+        sa.Column("added_by_discord_user_id", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index(
+        "uq_tracked_followings_guild_channel_target", "tracked_followings",
+        ["guild_id", "channel_id", "target_fid"], unique=True
+    )
+    op.create_index("ix_tracked_followings_target_fid", "tracked_followings", ["target_fid"])
+    
+    op.create_table(
+        "following_state",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("target_fid", sa.Integer(), nullable=False),
+        sa.Column("snapshot", sa.LargeBinary(), nullable=False),
+        sa.Column("snapshot_hash", sa.String(), nullable=False),
+        sa.Column("following_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("deltas_since_checkpoint", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("last_check_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("uq_following_state_target_fid", "following_state", ["target_fid"], unique=True)
+    
+    op.create_table(
+        "following_state_deltas",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("target_fid", sa.Integer(), nullable=False),
+        sa.Column("added", sa.LargeBinary(), nullable=False),
+        sa.Column("removed", sa.LargeBinary(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index(
+        "ix_following_state_deltas_target_fid_created_at", "following_state_deltas",
+        ["target_fid", "created_at"]
+    )
+    
+    op.create_table(
+        "following_deliveries",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("guild_id", sa.String(), nullable=False),
+        sa.Column("channel_id", sa.String(), nullable=False),
+        sa.Column("target_fid", sa.Integer(), nullable=False),
+        sa.Column("new_following_fid", sa.Integer(), nullable=False),
+        sa.Column("delivered_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index(
+        "uq_following_deliveries_dedup", "following_deliveries",
+        ["guild_id", "channel_id", "target_fid", "new_following_fid"], unique=True
+    )
+
+def downgrade():
+    op.drop_table("following_deliveries")
+    op.drop_table("following_state_deltas")
+    op.drop_table("following_state")
+    op.drop_table("tracked_followings")
@@ -0,0 +1,22 @@
+"""Points de reprise du polling des followings
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column("following_state", sa.Column("poll_interval", sa.Float(), nullable=True))
+    op.add_column("following_state", sa.Column("next_check_at", sa.DateTime(timezone=True), nullable=True))
+
+def downgrade():
+    op.drop_column("following_state", "next_check_at")
+    op.drop_column("following_state", "poll_interval")
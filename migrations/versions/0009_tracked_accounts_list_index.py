@@ -0,0 +1,31 @@
+"""Index de pagination de !list
+
+- tracked_accounts (guild_id, channel_id, username, fid) : pagination par
+  curseur (keyset) dans l'ordre d'affichage ; fid départage deux comptes
+  de même username dans un salon
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_tracked_accounts_guild_channel_username",
+            "tracked_accounts",
+            ["guild_id", "channel_id", "username", "fid"],
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_tracked_accounts_guild_channel_username", table_name="tracked_accounts", postgresql_concurrently=True)
@@ -1,6 +1,7 @@
 import requests
 import json
 import logging
+import threading
 import time
 from typing import Dict, List, Optional, Union
 from config import config
@@ -26,6 +27,10 @@ class NeynarClient:
         }
         logger.info(f"✅ Headers configurés: {list(self.headers.keys())}")
         
+        # Session HTTP partagée : connexions keep-alive réutilisées entre requêtes
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        
         # Gestion des rate limits selon la documentation
         self.rate_limits = {
             "starter": {"rpm": 300, "rps": 5},
@@ -39,34 +44,43 @@ class NeynarClient:
         self.last_request_time = 0
         self.requests_this_minute = 0
         self.minute_start = time.time()
+        # Appels concurrents (threads du polling) : un seul à la fois dans le calcul du débit
+        self._rate_lock = threading.Lock()
         logger.info(f"✅ Plan par défaut: {self.current_plan}")
         
         logger.info("✅ Classe NeynarClient initialisée avec succès")
     
     def _handle_rate_limits(self):
-        """Gérer les rate limits selon la documentation officielle"""
-        current_time = time.time()
-        
-        # Réinitialiser le compteur de minute
-        if current_time - self.minute_start >= 60:
-            self.requests_this_minute = 0
-            self.minute_start = current_time
-        
-        # Vérifier les limites par minute
-        if self.requests_this_minute >= self.rate_limits[self.current_plan]["rpm"]:
-            wait_time = 60 - (current_time - self.minute_start)
-            logger.warning(f"Rate limit RPM atteint, attente de {wait_time:.2f} secondes")
-            time.sleep(wait_time)
-            self.requests_this_minute = 0
-            self.minute_start = time.time()
+        """Gérer les rate limits selon la documentation officielle
         
-        # Vérifier les limites par seconde
-        if current_time - self.last_request_time < 1.0 / self.rate_limits[self.current_plan]["rps"]:
-            wait_time = 1.0 / self.rate_limits[self.current_plan]["rps"] - (current_time - self.last_request_time)
-            time.sleep(wait_time)
-        
-        self.last_request_time = current_time
-        self.requests_this_minute += 1
+        Thread-safe : les attentes se font sous verrou, ce qui espace les
+        départs de requêtes quel que soit le nombre de threads appelants.
+        """
+        with self._rate_lock:
+            current_time = time.time()
+            
+            # Réinitialiser le compteur de minute
+            if current_time - self.minute_start >= 60:
+                self.requests_this_minute = 0
+                self.minute_start = current_time
+            
+            # Vérifier les limites par minute
+            if self.requests_this_minute >= self.rate_limits[self.current_plan]["rpm"]:
+                wait_time = 60 - (current_time - self.minute_start)
+                logger.warning(f"Rate limit RPM atteint, attente de {wait_time:.2f} secondes")
+                time.sleep(wait_time)
+                self.requests_this_minute = 0
+                self.minute_start = time.time()
+                current_time = time.time()
+            
+            # Vérifier les limites par seconde
+            if current_time - self.last_request_time < 1.0 / self.rate_limits[self.current_plan]["rps"]:
+                wait_time = 1.0 / self.rate_limits[self.current_plan]["rps"] - (current_time - self.last_request_time)
+                time.sleep(wait_time)
+            
+            # Heure réelle de départ (après les attentes) pour espacer la suivante
+            self.last_request_time = time.time()
+            self.requests_this_minute += 1
     
     def _make_request(self, endpoint: str, method: str = "GET", data: Optional[Dict] = None, retries: int = 3) -> Dict:
         """Effectuer une requête à l'API Neynar avec gestion des rate limits et retry logic"""
@@ -82,13 +96,13 @@ class NeynarClient:
         for attempt in range(retries):
             try:
                 if method == "GET":
-                    response = requests.get(url, headers=self.headers, timeout=30)
+                    response = self.session.get(url, timeout=30)
                 elif method == "POST":
-                    response = requests.post(url, headers=self.headers, json=data, timeout=30)
+                    response = self.session.post(url, json=data, timeout=30)
                 elif method == "PUT":
-                    response = requests.put(url, headers=self.headers, json=data, timeout=30)
+                    response = self.session.put(url, json=data, timeout=30)
                 elif method == "DELETE":
-                    response = requests.delete(url, headers=self.headers, json=data, timeout=30)
+                    response = self.session.delete(url, json=data, timeout=30)
                 else:
                     raise ValueError(f"Méthode HTTP non supportée: {method}")
                 
@@ -149,6 +163,15 @@ class NeynarClient:
         
         return response["users"][0]
     
+    def get_users_by_fids(self, fids: List[int], batch_size: int = 100) -> List[Dict]:
+        """Récupérer des utilisateurs par FIDs, par lots de 100 (un appel par lot, FIDs inconnus absents)"""
+        users = []
+        for i in range(0, len(fids), batch_size):
+            batch = ",".join(str(int(fid)) for fid in fids[i:i + batch_size])
+            response = self._make_request(f"/v2/farcaster/user/bulk?fids={batch}")
+            users.extend(response.get("users") or [])
+        return users
+    
     def get_user_by_username(self, username: str) -> Dict:
         """Récupérer un utilisateur par username selon la doc officielle"""
         endpoint = f"/v2/farcaster/user/search?q={username}&viewer_fid=1"
@@ -221,6 +244,19 @@ class NeynarClient:
             else:
                 raise
     
+    def update_follow_webhook(self, webhook_id: str, fids: List[int]) -> Dict:
+        """Abonner un webhook aux follows/unfollows faits par ces FIDs"""
+        payload = {
+            "name": "Farcaster Tracker Follows",  # Champ requis par l'API
+            "subscription": {
+                "follow.created": {"fids": fids},
+                "follow.deleted": {"fids": fids}
+            }
+        }
+        
+        logger.info(f"🔧 Mise à jour du webhook des follows {webhook_id} ({len(fids)} FID(s))")
+        return self._make_request(f"/v2/farcaster/webhook/{webhook_id}", method="PUT", data=payload)
+    
     def delete_webhook(self, webhook_id: str) -> None:
         """Supprimer un webhook"""
         self._make_request(f"/v2/farcaster/webhook/{webhook_id}", method="DELETE")
@@ -237,6 +273,25 @@ class NeynarClient:
             else:
                 raise
     
+    def get_user_following(self, fid: int, page_size: int = 100) -> List[Dict]:
+        """Récupérer tous les comptes suivis par un utilisateur (pagination par curseur)"""
+        followings = []
+        cursor = None
+        while True:
+            endpoint = f"/v2/farcaster/following?fid={fid}&limit={page_size}"
+            if cursor:
+                endpoint += f"&cursor={cursor}"
+            response = self._make_request(endpoint)
+            
+            for entry in response.get("users", []):
+                # Chaque entrée est un objet "follow" contenant l'utilisateur suivi
+                user = entry.get("user", entry)
+                followings.append({"fid": user["fid"], "username": user.get("username", f"FID_{user['fid']}")})
+            
+            cursor = (response.get("next") or {}).get("cursor")
+            if not cursor:
+                return followings
+    
     def get_user_feed(self, fid: int, limit: int = 25, include_replies: bool = True, viewer_fid: int = None) -> Dict:
         """Récupérer les casts d'un utilisateur selon la doc officielle v2"""
         endpoint = f"/v2/farcaster/feed/user/casts/?fid={fid}&limit={limit}&include_replies={str(include_replies).lower()}"
@@ -256,6 +311,16 @@ class NeynarClient:
         endpoint = f"/v2/farcaster/cast/reactions?hash={cast_hash}"
         return self._make_request(endpoint)
     
+    def probe(self, url: str, timeout: float = 10) -> requests.Response:
+        """GET brut pour les commandes de diagnostic (sans retries, réponse retournée telle quelle)"""
+        self._handle_rate_limits()
+        return self.session.get(url, timeout=timeout)
+    
+    def close(self):
+        """Fermer les connexions HTTP de la session"""
+        self.session.close()
+        logger.info("🛑 Session HTTP Neynar fermée")
+    
     def set_plan(self, plan: str):
         """Définir le plan de rate limits (starter, growth, scale)"""
         if plan in self.rate_limits:
@@ -301,3 +366,11 @@ def get_neynar_client():
 
 # Alias pour la compatibilité
 neynar_client = get_neynar_client()
+
+def close_neynar_client():
+    """Fermer le client Neynar s'il a été initialisé"""
+    global _neynar_client_instance
+    
+    if _neynar_client_instance is not None:
+        _neynar_client_instance.close()
+        _neynar_client_instance = None
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Mesure mémoire du client Discord par profil gateway
+Alimente l'état interne de discord.py (sans connexion) avec des GUILD_CREATE
+synthétiques, puis avec les messages que ces serveurs enverraient si
+l'intent guild_messages est actif. Chaque profil tourne dans son propre
+processus. Le script compare le RSS par tranche de 1000 serveurs entre
+l'ancien profil (intents par défaut + message_content, caches de
+discord.py) et le profil minimal de gateway_options().
+
+Usage:
+    python scripts/benchmark-gateway-memory.py [--guilds 5000] [--channels 15] [--members 50] [--messages 20]
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import resource
+import subprocess
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au path pour les imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+PROFILES = ["default", "lean"]
+
+def client_options(profile: str) -> dict:
+    """Options du client Discord pour un profil"""
+    import discord
+    
+    if profile == "default":
+        # Profil d'origine : intents par défaut + contenu des messages, caches de discord.py
+        intents = discord.Intents.default()
+        intents.message_content = True
+        return {"intents": intents}
+    
+    # Variables minimales pour importer discord_bot sans configuration réelle
+    os.environ.setdefault('DATABASE_URL', 'postgresql://benchmark@localhost/benchmark')
+    from discord_bot import gateway_options
+    return gateway_options(prefix_commands=False)
+
+def rss_bytes() -> int:
+    """RSS courant du processus (/proc, sinon pic via getrusage)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+def guild_payload(guild_index: int, channels: int, members: int) -> dict:
+    """GUILD_CREATE synthétique : salons texte, rôles, membres"""
+    guild_id = 10**17 + guild_index * 10_000
+    return {
+        "id": str(guild_id),
+        "name": f"Serveur {guild_index}",
+        "icon": None,
+        "owner_id": str(guild_id + 1),
+        "afk_timeout": 300,
+        "verification_level": 0,
+        "default_message_notifications": 0,
+        "explicit_content_filter": 0,
+        "mfa_level": 0,
+        "nsfw_level": 0,
+        "premium_tier": 0,
+        "features": [],
+        "member_count": members,
+        "large": members > 250,
+        "emojis": [],
+        "stickers": [],
+        "voice_states": [],
+        "presences": [],
+        "threads": [],
+        "stage_instances": [],
+        "guild_scheduled_events": [],
+        "roles": [
+            {
+                "id": str(guild_id + role),
+                "name": "@everyone" if role == 0 else f"rôle {role}",
+                "color": 0,
+                "hoist": False,
+                "position": role,
+                "permissions": "0",
+                "managed": False,
+                "mentionable": False
+            }
+            for role in range(5)
+        ],
+        "channels": [
+            {
+                "id": str(guild_id + 100 + channel),
+                "type": 0,
+                "name": f"salon-{channel}",
+                "position": channel,
+                "permission_overwrites": [],
+                "nsfw": False,
+                "topic": None,
+                "last_message_id": None
+            }
+            for channel in range(channels)
+        ],
+        "members": [
+            {
+                "user": {
+                    "id": str(guild_id + 1000 + member),
+                    "username": f"membre{guild_index}_{member}",
+                    "discriminator": "0",
+                    "avatar": None
+                },
+                "roles": [str(guild_id + 1)],
+                "joined_at": "2024-01-01T00:00:00+00:00",
+                "deaf": False,
+                "mute": False,
+                "flags": 0
+            }
+            for member in range(members)
+        ]
+    }
+
+def message_payload(guild: dict, index: int) -> dict:
+    """MESSAGE_CREATE synthétique d'un membre dans un salon du serveur"""
+    member = guild["members"][index % len(guild["members"])] if guild["members"] else None
+    author = member["user"] if member else {"id": guild["owner_id"], "username": "owner", "discriminator": "0", "avatar": None}
+    payload = {
+        "id": str(int(guild["id"]) + 5000 + index),
+        "channel_id": guild["channels"][index % len(guild["channels"])]["id"],
+        "guild_id": guild["id"],
+        "author": author,
+        "content": f"message {index} " + "x" * 80,
+        "timestamp": "2024-01-01T00:00:00+00:00",
+        "edited_timestamp": None,
+        "tts": False,
+        "mention_everyone": False,
+        "mentions": [],
+        "mention_roles": [],
+        "attachments": [],
+        "embeds": [],
+        "pinned": False,
+        "type": 0
+    }
+    if member:
+        payload["member"] = {key: value for key, value in member.items() if key != "user"}
+    return payload
+
+async def measure(profile: str, guilds: int, channels: int, members: int, messages: int) -> dict:
+    """Remplir l'état d'un client du profil et mesurer le RSS ajouté"""
+    import discord
+    
+    client = discord.Client(**client_options(profile))
+    state = client._connection
+    state.dispatch = lambda *args, **kwargs: None  # pas d'événements : seul le cache compte
+    
+    gc.collect()
+    baseline = rss_bytes()
+    
+    for guild_index in range(guilds):
+        data = guild_payload(guild_index, channels, members)
+        state._add_guild_from_data(data)
+        # Sans intent guild_messages, la gateway n'envoie aucun MESSAGE_CREATE
+        if state._intents.guild_messages:
+            for index in range(messages):
+                state.parse_message_create(message_payload(data, index))
+    
+    gc.collect()
+    used = rss_bytes() - baseline
+    cached_members = sum(len(guild._members) for guild in state._guilds.values())
+    return {
+        "profile": profile,
+        "guilds": guilds,
+        "rss_mb": round(used / 2**20, 1),
+        "rss_mb_per_1k_guilds": round(used / 2**20 / guilds * 1000, 2),
+        "cached_members": cached_members,
+        "cached_messages": len(state._messages) if state._messages is not None else 0,
+        "intents": state._intents.value
+    }
+
+def run_profile(profile: str, args) -> dict:
+    """Mesurer un profil dans un processus séparé (RSS non partagé)"""
+    result = subprocess.run(
+        [sys.executable, __file__, "--profile", profile,
+         "--guilds", str(args.guilds), "--channels", str(args.channels),
+         "--members", str(args.members), "--messages", str(args.messages)],
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Mémoire du client Discord par profil gateway")
+    parser.add_argument("--guilds", type=int, default=5000, help="Serveurs simulés")
+    parser.add_argument("--channels", type=int, default=15, help="Salons texte par serveur")
+    parser.add_argument("--members", type=int, default=50, help="Membres reçus par GUILD_CREATE")
+    parser.add_argument("--messages", type=int, default=20, help="Messages reçus par serveur (si l'intent le permet)")
+    parser.add_argument("--profile", choices=PROFILES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.profile:
+        # Processus enfant : une seule mesure, en JSON sur stdout
+        print(json.dumps(asyncio.run(measure(args.profile, args.guilds, args.channels, args.members, args.messages))))
+        return
+    
+    print(f"📏 {args.guilds} serveurs, {args.channels} salons, {args.members} membres, {args.messages} messages par serveur")
+    results = {profile: run_profile(profile, args) for profile in PROFILES}
+    
+    for result in results.values():
+        print(
+            f"  {result['profile']:<8} {result['rss_mb']:>8} Mo  "
+            f"{result['rss_mb_per_1k_guilds']:>7} Mo / 1000 serveurs  "
+            f"({result['cached_members']} membres, {result['cached_messages']} messages en cache, intents={result['intents']})"
+        )
+    
+    before = results["default"]["rss_mb_per_1k_guilds"]
+    after = results["lean"]["rss_mb_per_1k_guilds"]
+    if before > 0:
+        print(f"✅ Économie : {before - after:.2f} Mo / 1000 serveurs ({(before - after) / before:.0%})")
+
+if __name__ == "__main__":
+    main()
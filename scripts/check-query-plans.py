@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Vérification des plans d'exécution des requêtes chaudes
+Remplit un schéma temporaire (copie des tables avec leurs index) avec un
+jeu de données volumineux, puis vérifie via EXPLAIN qu'aucune requête
+chaude ne fait de Seq Scan sur une table indexée.
+
+Usage:
+    DATABASE_URL=postgresql://... python scripts/check-query-plans.py [--rows 10000000] [--keep]
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire parent au path pour les imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine, text
+
+SCRATCH_SCHEMA = "query_plan_check"
+
+# Tables copiées (avec index) dans le schéma temporaire
+TABLES = ["tracked_accounts", "deliveries", "webhook_subscriptions", "pending_deliveries", "tracked_followings", "following_deliveries"]
+
+# Remplissage synthétique : ~20k guilds, 100k salons, FIDs répartis
+SEED_SQL = {
+    "tracked_accounts": """
+        INSERT INTO {schema}.tracked_accounts
+            (id, guild_id, channel_id, fid, username, added_by_discord_user_id)
+        SELECT
+            'ta-' || i,
+            (i % 20000)::text,
+            (i % 100000)::text,
+            i / 3,
+            'user' || (i / 3),
+            '0'
+        FROM generate_series(1, :rows) AS i
+    """,
+    "deliveries": """
+        INSERT INTO {schema}.deliveries (id, guild_id, channel_id, cast_hash)
+        SELECT
+            'd-' || i,
+            (i % 20000)::text,
+            (i % 100000)::text,
+            '0x' || md5(i::text)
+        FROM generate_series(1, :rows) AS i
+    """,
+    "webhook_subscriptions": """
+        INSERT INTO {schema}.webhook_subscriptions (webhook_id, fid)
+        SELECT 'webhook-' || (i % 4), i
+        FROM generate_series(1, :rows) AS i
+    """,
+    "pending_deliveries": """
+        INSERT INTO {schema}.pending_deliveries (id, guild_id, channel_id, cast_hash, payload, partition, attempts)
+        SELECT
+            'p-' || i,
+            (i % 20000)::text,
+            (i % 100000)::text,
+            '0x' || md5(i::text),
+            '{{}}',
+            (i % 100000) % 64,
+            0
+        FROM generate_series(1, :rows) AS i
+    """,
+    "tracked_followings": """
+        INSERT INTO {schema}.tracked_followings
+            (id, guild_id, channel_id, target_fid, target_username, added_by_discord_user_id)
+        SELECT
+            'tf-' || i,
+            (i % 20000)::text,
+            (i % 100000)::text,
+            i / 3,
+            'user' || (i / 3),
+            '0'
+        FROM generate_series(1, :rows) AS i
+    """,
+    "following_deliveries": """
+        INSERT INTO {schema}.following_deliveries (id, guild_id, channel_id, target_fid, new_following_fid)
+        SELECT
+            'fd-' || i,
+            (i % 20000)::text,
+            (i % 100000)::text,
+            i % 50000,
+            i
+        FROM generate_series(1, :rows) AS i
+    """,
+}
+
+# Requêtes chaudes de l'application (nom, SQL)
+HOT_QUERIES = [
+    ("Routage webhook par FID",
+     "SELECT * FROM tracked_accounts WHERE fid = 4242"),
+    ("Compte déjà suivi (!track)",
+     "SELECT * FROM tracked_accounts WHERE guild_id = '42' AND channel_id = '42' AND fid = 14"),
+    ("Listing par guild (!list)",
+     "SELECT * FROM tracked_accounts WHERE guild_id = '42'"),
+    ("Page suivante de !list (curseur)",
+     "SELECT * FROM tracked_accounts WHERE guild_id = '42' AND (channel_id, username, fid) > ('42', 'user14', 14) "
+     "ORDER BY channel_id, username, fid LIMIT 21"),
+    ("Résumé par salon de !list",
+     "SELECT channel_id, count(*) FROM tracked_accounts WHERE guild_id = '42' GROUP BY channel_id"),
+    ("Suppression par guild et FID (!untrack)",
+     "DELETE FROM tracked_accounts WHERE guild_id = '42' AND fid = 14"),
+    ("Anti-doublon par hash de cast",
+     "SELECT id FROM deliveries WHERE cast_hash = '0x' || md5('4242') LIMIT 1"),
+    ("Appartenance FID au webhook (!track)",
+     "SELECT fid FROM webhook_subscriptions WHERE webhook_id = 'webhook-1' AND fid IN (5, 9, 13)"),
+    ("Retrait de FIDs du webhook (!untrack)",
+     "DELETE FROM webhook_subscriptions WHERE webhook_id = 'webhook-1' AND fid IN (5, 9, 13)"),
+    ("Webhook propriétaire d'un FID (pool)",
+     "SELECT webhook_id, fid FROM webhook_subscriptions WHERE fid IN (5, 9, 13)"),
+    ("Réclamation d'une partition (file partagée)",
+     "SELECT * FROM pending_deliveries WHERE partition = 7 ORDER BY created_at LIMIT 20 FOR UPDATE SKIP LOCKED"),
+    ("Salons suivant les followings d'un compte (polling)",
+     "SELECT * FROM tracked_followings WHERE target_fid = 4242"),
+    ("Anti-doublon des notifications de followings",
+     "SELECT id FROM following_deliveries WHERE guild_id = '42' AND channel_id = '42' AND target_fid = 42 AND new_following_fid = 100042 LIMIT 1"),
+]
+
+def iter_plan_nodes(node):
+    """Parcourir récursivement les nœuds d'un plan EXPLAIN (FORMAT JSON)"""
+    yield node
+    for child in node.get("Plans", []):
+        yield from iter_plan_nodes(child)
+
+def seed_schema(conn, rows):
+    """Créer le schéma temporaire et le remplir"""
+    print(f"🗄️ Création du schéma {SCRATCH_SCHEMA} et insertion de {rows:,} lignes par table...")
+    conn.execute(text(f"DROP SCHEMA IF EXISTS {SCRATCH_SCHEMA} CASCADE"))
+    conn.execute(text(f"CREATE SCHEMA {SCRATCH_SCHEMA}"))
+    
+    for table in TABLES:
+        conn.execute(text(
+            f"CREATE TABLE {SCRATCH_SCHEMA}.{table} (LIKE public.{table} INCLUDING ALL)"
+        ))
+        conn.execute(text(SEED_SQL[table].format(schema=SCRATCH_SCHEMA)), {"rows": rows})
+        conn.execute(text(f"ANALYZE {SCRATCH_SCHEMA}.{table}"))
+        print(f"✅ {table} - rempli")
+
+def check_plans(conn):
+    """Vérifier que chaque requête chaude utilise un index"""
+    conn.execute(text(f"SET search_path TO {SCRATCH_SCHEMA}"))
+    
+    failures = 0
+    for name, sql in HOT_QUERIES:
+        # EXPLAIN sans ANALYZE : les DELETE ne sont pas exécutés
+        plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        root = plan[0]["Plan"]
+        
+        seq_scans = [
+            node.get("Relation Name")
+            for node in iter_plan_nodes(root)
+            if node.get("Node Type") == "Seq Scan" and node.get("Relation Name") in TABLES
+        ]
+        index_nodes = [
+            node.get("Index Name")
+            for node in iter_plan_nodes(root)
+            if node.get("Index Name")
+        ]
+        
+        if seq_scans:
+            failures += 1
+            print(f"❌ {name} - Seq Scan sur {', '.join(seq_scans)} (coût {root['Total Cost']})")
+        else:
+            print(f"✅ {name} - {', '.join(index_nodes) or root['Node Type']} (coût {root['Total Cost']})")
+            
+    return failures
+
+def main():
+    """Fonction principale"""
+    parser = argparse.ArgumentParser(description="Vérifier les plans des requêtes chaudes")
+    parser.add_argument("--rows", type=int, default=10_000_000, help="Lignes insérées par table")
+    parser.add_argument("--keep", action="store_true", help="Conserver le schéma temporaire")
+    args = parser.parse_args()
+    
+    from config import config
+    if not config.DATABASE_URL:
+        print("❌ DATABASE_URL non configuré")
+        return False
+        
+    print("🔍 Vérification des plans d'exécution des requêtes chaudes")
+    print("=" * 50)
+    
+    engine = create_engine(config.DATABASE_URL)
+    with engine.connect() as conn:
+        try:
+            seed_schema(conn, args.rows)
+            conn.commit()
+            failures = check_plans(conn)
+        finally:
+            conn.rollback()
+            if not args.keep:
+                conn.execute(text(f"DROP SCHEMA IF EXISTS {SCRATCH_SCHEMA} CASCADE"))
+                conn.commit()
+                
+    print("=" * 50)
+    if failures:
+        print(f"❌ {failures} requête(s) chaude(s) sans index")
+        return False
+        
+    print(f"🎉 Toutes les requêtes chaudes ({len(HOT_QUERIES)}) utilisent un index")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
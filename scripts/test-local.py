@@ -91,7 +91,7 @@ def test_database_models():
     print("\n🗄️ Test des modèles de base de données...")
     
     try:
-        from database import Guild, TrackedAccount, Delivery, WebhookState
+        from database import Guild, TrackedAccount, Delivery, WebhookState, WebhookSubscription
         
         # Vérifier que les modèles peuvent être instanciés
         guild = Guild(id="test")
@@ -103,7 +103,10 @@ def test_database_models():
             id="test", guild_id="test", channel_id="test", cast_hash="test"
         )
         webhook = WebhookState(
-            id="test", webhook_id="test", author_fids="[]"
+            id="test", webhook_id="test"
+        )
+        subscription = WebhookSubscription(
+            webhook_id="test", fid=123
         )
         
         print("✅ Tous les modèles - OK")
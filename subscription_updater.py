@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, Optional, Set
+from config import config
+from webhook_sync import get_subscription_engine, force_webhook_fixe, sync_follow_webhook
+
+logger = logging.getLogger(__name__)
+
+class SubscriptionUpdater:
+    """Mise à jour différée et regroupée des abonnements du webhook Neynar
+    
+    Les commandes !track/!untrack enregistrent les FIDs modifiés sans
+    attendre Neynar. Une tâche de fond attend que les changements se
+    calment (fenêtre de debounce, bornée par un délai maximum) puis
+    applique l'ensemble en une seule synchronisation, donc un seul
+    update_webhook. Les changements du suivi des followings passent par la
+    même fenêtre et donnent un seul PUT du webhook des follows.
+    """
+    
+    def __init__(self, debounce_seconds: float = None, max_delay_seconds: float = None):
+        self.debounce_seconds = debounce_seconds if debounce_seconds is not None else config.WEBHOOK_SYNC_DEBOUNCE_SECONDS
+        self.max_delay_seconds = max_delay_seconds if max_delay_seconds is not None else config.WEBHOOK_SYNC_MAX_DELAY_SECONDS
+        self.pending_fids: Set[int] = set()
+        self.follow_sync_pending = False
+        self.first_intent_at: Optional[float] = None
+        self.last_intent_at: Optional[float] = None
+        self.retry_delay = 5
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._sync_lock: Optional[asyncio.Lock] = None
+        self._reconcile_task: Optional[asyncio.Task] = None
+        self.progress_interval = 10
+        self.reconciliation = {
+            "state": "pending",
+            "duration_ms": None
+        }
+        self.stats = {
+            "intents": 0,
+            "batches": 0,
+            "upstream_calls": 0,
+            "follow_syncs": 0,
+            "failures": 0
+        }
+        
+    def schedule(self, fids: Iterable[int]):
+        """Enregistrer des FIDs ajoutés ou retirés (retour immédiat)"""
+        fids = {int(fid) for fid in fids}
+        if not fids:
+            return
+            
+        now = time.monotonic()
+        if not self.pending_fids:
+            self.first_intent_at = now
+        self.last_intent_at = now
+        self.pending_fids |= fids
+        self.stats["intents"] += len(fids)
+        
+        self._ensure_running()
+        self._wakeup.set()
+        logger.debug(f"🕒 {len(fids)} FID(s) en attente de synchronisation ({len(self.pending_fids)} au total)")
+        
+    def schedule_follow_sync(self):
+        """Demander la synchronisation du webhook des follows (retour immédiat)"""
+        now = time.monotonic()
+        if not self.pending_fids and not self.follow_sync_pending:
+            self.first_intent_at = now
+        self.last_intent_at = now
+        self.follow_sync_pending = True
+        
+        self._ensure_running()
+        self._wakeup.set()
+        
+    def _ensure_running(self):
+        """Démarrer la tâche de fond sur l'event loop courant si nécessaire"""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._sync_lock = asyncio.Lock()
+            self._task = asyncio.create_task(self._run())
+            logger.info("🚀 Synchronisation différée du webhook démarrée")
+            
+    async def _wait_for_quiet(self):
+        """Attendre la fin de la rafale (debounce) sans dépasser le délai maximum"""
+        while self.pending_fids or self.follow_sync_pending:
+            now = time.monotonic()
+            quiet_at = self.last_intent_at + self.debounce_seconds
+            deadline = self.first_intent_at + self.max_delay_seconds
+            wake_at = min(quiet_at, deadline)
+            if now >= wake_at:
+                return
+            await asyncio.sleep(wake_at - now)
+            
+    async def _run(self):
+        """Boucle de fond : regrouper puis synchroniser"""
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            
+            await self._wait_for_quiet()
+            report = await self.flush()
+            follows_synced = await self.flush_follows()
+            
+            if (report is not None and not report.get("success")) or follows_synced is False:
+                # Réessayer plus tard, le lot est déjà remis en attente
+                await asyncio.sleep(self.retry_delay)
+                self._wakeup.set()
+                
+    async def flush(self) -> Optional[Dict]:
+        """Synchroniser immédiatement les FIDs en attente (un seul appel Neynar)"""
+        if self._sync_lock is None:
+            self._sync_lock = asyncio.Lock()
+            
+        async with self._sync_lock:
+            if not self.pending_fids:
+                return None
+                
+            batch = self.pending_fids
+            self.pending_fids = set()
+            self.first_intent_at = None
+            
+            try:
+                report = await asyncio.to_thread(get_subscription_engine().sync, changed_fids=batch)
+            except Exception as e:
+                logger.error(f"❌ Erreur lors de la synchronisation différée du webhook: {e}")
+                report = {"success": False, "error": str(e), "upstream_calls": 0}
+                
+            self.stats["batches"] += 1
+            self.stats["upstream_calls"] += report.get("upstream_calls", 0)
+            
+            if not report.get("success"):
+                # Remettre le lot en attente sans perdre les nouvelles intentions
+                self.stats["failures"] += 1
+                self.pending_fids |= batch
+                self.first_intent_at = self.first_intent_at or time.monotonic()
+                self.last_intent_at = self.last_intent_at or time.monotonic()
+                logger.warning(f"⚠️ Synchronisation différée échouée, {len(batch)} FID(s) remis en attente")
+            else:
+                logger.info(f"✅ Lot de {len(batch)} FID(s) synchronisé avec le webhook")
+                
+            return report
+            
+    async def flush_follows(self) -> Optional[bool]:
+        """Synchroniser le webhook des follows s'il a été demandé, retourne None si rien à faire"""
+        if not self.follow_sync_pending:
+            return None
+        
+        self.follow_sync_pending = False
+        if not self.pending_fids:
+            self.first_intent_at = None
+        
+        try:
+            await asyncio.to_thread(sync_follow_webhook)
+            self.stats["follow_syncs"] += 1
+            return True
+        except Exception as e:
+            self.stats["failures"] += 1
+            self.follow_sync_pending = True
+            self.first_intent_at = self.first_intent_at or time.monotonic()
+            self.last_intent_at = self.last_intent_at or time.monotonic()
+            logger.error(f"❌ Erreur lors de la synchronisation du webhook des follows: {e}")
+            logger.warning("⚠️ Les nouveaux followings seront détectés par le polling de rattrapage")
+            return False
+            
+    def start_reconciliation(self, timeout: float = None) -> bool:
+        """Lancer la réconciliation de démarrage en tâche de fond
+        
+        Une seule fois par processus : on_ready est rappelé à chaque
+        reconnexion au gateway. Retourne False si elle a déjà été lancée.
+        """
+        if self._reconcile_task is not None:
+            return False
+            
+        timeout = timeout if timeout is not None else config.WEBHOOK_RECONCILE_TIMEOUT_SECONDS
+        self._reconcile_task = asyncio.create_task(self._reconcile(timeout))
+        return True
+        
+    async def _reconcile(self, timeout: float):
+        """Pousser l'état complet du pool vers Neynar hors de l'event loop"""
+        started = time.monotonic()
+        self.reconciliation["state"] = "running"
+        logger.info(f"🔄 Réconciliation du webhook démarrée en arrière-plan (timeout {timeout:.0f}s)")
+        
+        # Le thread n'est pas interruptible : au timeout on cesse seulement de l'attendre
+        job = asyncio.ensure_future(asyncio.to_thread(force_webhook_fixe))
+        try:
+            while not job.done():
+                remaining = timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                await asyncio.wait({job}, timeout=min(self.progress_interval, remaining))
+                if not job.done():
+                    logger.info(f"⏳ Réconciliation du webhook en cours ({time.monotonic() - started:.0f}s / {timeout:.0f}s)")
+                    
+            state = "done" if job.result() else "failed"
+        except asyncio.TimeoutError:
+            state = "timeout"
+            logger.warning(f"⚠️ Réconciliation du webhook non terminée après {timeout:.0f}s, elle continue en arrière-plan")
+        except Exception as e:
+            state = "failed"
+            logger.error(f"❌ Erreur lors de la réconciliation du webhook: {e}")
+            
+        self.reconciliation["state"] = state
+        self.reconciliation["duration_ms"] = round((time.monotonic() - started) * 1000, 1)
+        
+        if state == "done":
+            logger.info(f"✅ Réconciliation du webhook terminée en {self.reconciliation['duration_ms']} ms")
+        elif state == "failed":
+            logger.info("Réconciliation du webhook échouée - utilisez !test-neynar pour tester")
+            
+    async def stop(self):
+        """Vider les FIDs en attente puis arrêter la tâche de fond"""
+        await self.flush()
+        await self.flush_follows()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("🛑 Synchronisation différée du webhook arrêtée")
+
+# Instance globale du updater
+_subscription_updater = None
+
+def get_subscription_updater() -> SubscriptionUpdater:
+    """Obtenir l'instance du updater d'abonnements"""
+    global _subscription_updater
+    
+    if _subscription_updater is None:
+        _subscription_updater = SubscriptionUpdater()
+        
+    return _subscription_updater
+
+def schedule_subscription_update(fids: Iterable[int]):
+    """Programmer la synchronisation de FIDs ajoutés ou retirés"""
+    get_subscription_updater().schedule(fids)
+
+def schedule_follow_sync():
+    """Programmer la synchronisation du webhook des follows (si configuré)"""
+    if config.NEYNAR_FOLLOW_WEBHOOK_ID:
+        get_subscription_updater().schedule_follow_sync()
@@ -0,0 +1,201 @@
+import logging
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+import discord
+from sqlalchemy import select, func, tuple_
+from database import get_async_session_local, TrackedAccount
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Curseur de pagination : dernier (channel_id, username, fid) affiché
+ListCursor = Tuple[str, str, int]
+
+class GuildSummaryCache:
+    """Résumé par guild des comptes suivis (total, comptes par salon)
+    
+    Évite un COUNT ... GROUP BY à chaque !list ; invalidé par les commandes
+    qui modifient le suivi de la guild. La durée de vie borne l'écart quand
+    une autre réplique modifie le suivi.
+    """
+    
+    def __init__(self, ttl_seconds: float = None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else config.LIST_SUMMARY_CACHE_TTL_SECONDS
+        self.entries: Dict[str, Tuple[float, Dict]] = {}
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "invalidations": 0
+        }
+    
+    async def get(self, guild_id: str) -> Dict:
+        entry = self.entries.get(guild_id)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl_seconds:
+            self.stats["hits"] += 1
+            return entry[1]
+        
+        self.stats["misses"] += 1
+        db = get_async_session_local()()
+        try:
+            result = await db.execute(
+                select(TrackedAccount.channel_id, func.count())
+                .where(TrackedAccount.guild_id == guild_id)
+                .group_by(TrackedAccount.channel_id)
+            )
+            channels = {channel_id: count for channel_id, count in result}
+        finally:
+            await db.close()
+        
+        summary = {
+            "total": sum(channels.values()),
+            "channels": channels
+        }
+        self.entries[guild_id] = (time.monotonic(), summary)
+        return summary
+    
+    def invalidate(self, guild_id) -> None:
+        if self.entries.pop(str(guild_id), None) is not None:
+            self.stats["invalidations"] += 1
+
+async def fetch_tracked_page(guild_id: str, after: Optional[ListCursor], limit: int) -> Tuple[List, bool]:
+    """Page de comptes suivis après le curseur, retourne (comptes, page suivante existe)"""
+    query = select(TrackedAccount).where(TrackedAccount.guild_id == guild_id)
+    if after is not None:
+        query = query.where(
+            tuple_(TrackedAccount.channel_id, TrackedAccount.username, TrackedAccount.fid) > tuple_(*after)
+        )
+    query = query.order_by(TrackedAccount.channel_id, TrackedAccount.username, TrackedAccount.fid).limit(limit + 1)
+    
+    db = get_async_session_local()()
+    try:
+        accounts = (await db.execute(query)).scalars().all()
+    finally:
+        await db.close()
+    return accounts[:limit], len(accounts) > limit
+
+def build_list_embed(accounts: List, summary: Dict, page: int, page_count: int) -> discord.Embed:
+    """Embed d'une page de !list, comptes groupés par salon"""
+    lines = []
+    current_channel = None
+    for account in accounts:
+        if account.channel_id != current_channel:
+            current_channel = account.channel_id
+            count = summary["channels"].get(current_channel, 0)
+            lines.append(f"\n**<#{current_channel}>** ({count} compte(s))")
+        lines.append(f"• `{account.username}` (FID: {account.fid})")
+    
+    embed = discord.Embed(
+        title="📋 Comptes Farcaster suivis dans ce serveur",
+        description="\n".join(lines).strip(),
+        color=0x6F4CFF
+    )
+    embed.set_footer(
+        text=f"Page {page + 1}/{page_count} • {summary['total']} compte(s) dans {len(summary['channels'])} salon(s)"
+    )
+    return embed
+
+class TrackedListView(discord.ui.View):
+    """Navigation entre les pages de !list (réservée à l'auteur de la commande)
+    
+    Les curseurs de début des pages déjà vues sont gardés : « précédent »
+    relit une page par son curseur, sans OFFSET.
+    """
+    
+    def __init__(self, guild_id: str, author_id: int, summary: Dict, has_next: bool, cursor: Optional[ListCursor]):
+        super().__init__(timeout=180)
+        self.guild_id = guild_id
+        self.author_id = author_id
+        self.summary = summary
+        self.page_size = config.LIST_PAGE_SIZE
+        self.page_count = max(1, math.ceil(summary["total"] / self.page_size))
+        self.starts: List[Optional[ListCursor]] = [None]  # Curseur de début de chaque page vue
+        self.next_cursor = cursor
+        self.page = 0
+        self.message: Optional[discord.Message] = None
+        self._update_buttons(has_next)
+    
+    def _update_buttons(self, has_next: bool):
+        self.previous_button.disabled = self.page == 0
+        self.next_button.disabled = not has_next
+    
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("❌ Seul l'auteur de la commande peut changer de page.", ephemeral=True)
+            return False
+        return True
+    
+    async def _show(self, interaction: discord.Interaction, page: int, start: Optional[ListCursor]):
+        accounts, has_next = await fetch_tracked_page(self.guild_id, start, self.page_size)
+        if not accounts:
+            await interaction.response.edit_message(content="📋 Plus aucun compte sur cette page.", embed=None, view=None)
+            return
+        
+        self.page = page
+        if page < len(self.starts):
+            self.starts[page] = start
+        else:
+            self.starts.append(start)
+        last = accounts[-1]
+        self.next_cursor = (last.channel_id, last.username, last.fid)
+        self._update_buttons(has_next)
+        embed = build_list_embed(accounts, self.summary, page, max(self.page_count, page + 1))
+        await interaction.response.edit_message(embed=embed, view=self)
+    
+    @discord.ui.button(label="◀️ Précédent", style=discord.ButtonStyle.secondary)
+    async def previous_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.page - 1, self.starts[self.page - 1])
+    
+    @discord.ui.button(label="Suivant ▶️", style=discord.ButtonStyle.secondary)
+    async def next_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.page + 1, self.next_cursor)
+    
+    async def on_timeout(self):
+        if self.message is not None:
+            try:
+                await self.message.edit(view=None)
+            except discord.HTTPException:
+                pass
+
+async def send_tracked_list(ctx) -> None:
+    """Répondre à !list : première page, et boutons s'il y en a d'autres"""
+    guild_id = str(ctx.guild.id)
+    page_size = config.LIST_PAGE_SIZE
+    accounts, has_next = await fetch_tracked_page(guild_id, None, page_size)
+    if not accounts:
+        get_guild_summary_cache().invalidate(guild_id)
+        await ctx.reply("📋 Aucun compte Farcaster n'est suivi dans ce serveur.")
+        return
+    
+    cache = get_guild_summary_cache()
+    summary = await cache.get(guild_id)
+    if summary["total"] < len(accounts) or (has_next and summary["total"] <= len(accounts)):
+        # Résumé périmé (suivi modifié depuis une autre réplique)
+        cache.invalidate(guild_id)
+        summary = await cache.get(guild_id)
+    
+    page_count = max(1, math.ceil(summary["total"] / page_size))
+    embed = build_list_embed(accounts, summary, 0, page_count)
+    if not has_next:
+        await ctx.reply(embed=embed)
+        return
+    
+    last = accounts[-1]
+    view = TrackedListView(guild_id, ctx.author.id, summary, has_next, (last.channel_id, last.username, last.fid))
+    view.message = await ctx.reply(embed=embed, view=view)
+
+# Instance globale du cache des résumés
+_guild_summary_cache = None
+
+def get_guild_summary_cache() -> GuildSummaryCache:
+    """Obtenir le cache des résumés de !list"""
+    global _guild_summary_cache
+    
+    if _guild_summary_cache is None:
+        _guild_summary_cache = GuildSummaryCache()
+    
+    return _guild_summary_cache
+
+def invalidate_guild_summary(guild_id) -> None:
+    """Invalider le résumé d'une guild après un !track / !untrack"""
+    get_guild_summary_cache().invalidate(guild_id)
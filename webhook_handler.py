@@ -3,15 +3,23 @@ import hmac
 import hashlib
 import json
 import logging
-import uuid
-from typing import Dict, Any, List
+import random
+from typing import Dict, Any, List, Optional
 from fastapi import FastAPI, Request, HTTPException, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select
 import discord
 import discord.utils
-from database import get_session_local, Delivery
+from database import get_async_session_local, Delivery
 from config import config
-from discord_bot import bot
+from discord_bot import bot, resolve_channel
+from webhook_sync import get_webhook_secrets, reload_shard_secrets
+from drift_detector import get_drift_detector
+from command_executor import get_command_executor
+from following_polling import FOLLOW_EVENT_TYPES, build_follow_event_messages, record_following_delivery
+from delivery_store import (
+    get_delivery_recorder, persist_pending_deliveries, take_pending_deliveries,
+    insert_pending_deliveries, list_pending_partitions, count_pending_deliveries, process_partition
+)
 
 # Configuration du logging
 logger = logging.getLogger(__name__)
@@ -24,12 +32,218 @@ import queue
 import threading
 import time
 
+# Mode "threaded" : queue thread-safe vidée par un thread dédié
 discord_queue = queue.Queue()
 worker_thread = None
 worker_running = False
 
+# Mode "unified" : queue asyncio vidée par des tâches sur l'event loop partagé
+delivery_queue: Optional[asyncio.Queue] = None
+delivery_tasks: List[asyncio.Task] = []
+in_flight: Dict[int, Dict[str, Any]] = {}  # Message en cours d'envoi par worker
+
+# Mode multi-répliques : file partagée en base (pending_deliveries), réveil local des workers
+shared_wakeup: Optional[asyncio.Event] = None
+draining = False
+
+# Mode "multiprocess" : dans un processus d'ingestion, canal vers le processus Discord
+ingest_channel = None
+
+# Passe à False pendant l'arrêt : les webhooks reçoivent 503 et Neynar réessaie
+accepting_webhooks = True
+
+delivery_stats = {
+    "enqueued": 0,
+    "delivered": 0,
+    "failed": 0,
+    "replayed": 0
+}
+
+def is_unified_runtime() -> bool:
+    """FastAPI et le client Discord partagent-ils le même event loop ?"""
+    return config.RUNTIME_MODE != "threaded"
+
+def uses_shared_queue() -> bool:
+    """Les livraisons passent-elles par la file partagée entre répliques ?"""
+    return is_unified_runtime() and config.MULTI_REPLICA
+
+def enable_ingest_only(channel):
+    """Processus d'ingestion : pas de livraison locale, les messages partent vers le processus Discord"""
+    global ingest_channel
+    ingest_channel = channel
+
+def build_discord_embed(embed_dict: Dict[str, Any]) -> discord.Embed:
+    """Créer l'embed Discord à partir du dictionnaire construit pour le cast"""
+    embed = discord.Embed(
+        title=embed_dict.get("title", "Nouveau Cast"),
+        description=embed_dict.get("description", ""),
+        color=embed_dict.get("color", 0x8B5CF6),
+        url=embed_dict.get("url", "")
+    )
+    
+    if embed_dict.get("timestamp"):
+        embed.timestamp = discord.utils.utcnow()
+    if embed_dict.get("footer"):
+        embed.set_footer(text=embed_dict.get("footer", {}).get("text", ""))
+    if embed_dict.get("fields"):
+        for field in embed_dict["fields"]:
+            embed.add_field(
+                name=field.get("name", ""), 
+                value=field.get("value", ""), 
+                inline=field.get("inline", True)
+            )
+    if embed_dict.get("thumbnail"):
+        embed.set_thumbnail(url=embed_dict["thumbnail"]["url"])
+    if embed_dict.get("author"):
+        author_info = embed_dict["author"]
+        embed.set_author(
+            name=author_info.get("name", ""), 
+            url=author_info.get("url", ""), 
+            icon_url=author_info.get("icon_url", "")
+        )
+    
+    return embed
+
+async def deliver_message(message_data: Dict[str, Any], record: bool = True) -> bool:
+    """Envoyer un message dans son salon et enregistrer la livraison (sur le loop du bot)
+    
+    record=False laisse l'enregistrement à l'appelant (file partagée : même
+    transaction que le retrait de la file).
+    """
+    channel_id = message_data['channel_id']
+    author_username = message_data['author_username']
+    
+    logger.info(f"📤 Traitement du message pour {author_username} dans le canal {channel_id}")
+    
+    # Récupérer le canal (salon partiel si sa guild est sur le shard d'une autre réplique)
+    channel = resolve_channel(channel_id, message_data.get('guild_id'))
+    if not channel:
+        logger.error(f"❌ Canal {channel_id} non trouvé")
+        delivery_stats["failed"] += 1
+        return False
+    
+    try:
+        # Envoyer le message
+        await channel.send(embed=build_discord_embed(message_data['embed']))
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de l'envoi du message: {e}")
+        delivery_stats["failed"] += 1
+        return False
+    
+    # Marquer comme livré (écriture groupée en base)
+    if message_data.get('kind') == 'following':
+        # Notifications de followings : leur propre anti-doublon, partagé avec le polling
+        await record_following_delivery(message_data)
+    elif record:
+        get_delivery_recorder().record(message_data['guild_id'], channel_id, message_data['cast_hash'])
+    delivery_stats["delivered"] += 1
+    
+    logger.info(f"✅ Message envoyé avec succès dans {getattr(channel, 'name', channel_id)}")
+    return True
+
+async def enqueue_deliveries(messages: List[Dict[str, Any]]) -> int:
+    """Mettre des messages en file selon le mode d'exécution, retourne le nombre mis en file"""
+    if uses_shared_queue():
+        # Une insertion pour tous les salons ; un cast déjà en file (autre réplique) est ignoré
+        count = await insert_pending_deliveries(messages)
+        if shared_wakeup is not None:
+            shared_wakeup.set()
+    elif ingest_channel is not None:
+        count = await ingest_channel.send(messages)
+    else:
+        for message_data in messages:
+            if is_unified_runtime():
+                delivery_queue.put_nowait(message_data)
+            else:
+                discord_queue.put(message_data)
+        count = len(messages)
+    
+    delivery_stats["enqueued"] += count
+    return count
+
+async def accept_ingested_deliveries(messages: List[Dict[str, Any]]) -> int:
+    """Lot reçu d'un processus d'ingestion : écarter les casts déjà livrés ici puis mettre en file"""
+    recorder = get_delivery_recorder()
+    return await enqueue_deliveries([
+        message_data for message_data in messages
+        if not recorder.is_pending(message_data['cast_hash'])
+    ])
+
+async def delivery_worker(worker_id: int):
+    """Tâche de livraison : attente directe de l'envoi, sans passage entre threads"""
+    await bot.wait_until_ready()
+    logger.info(f"🚀 Worker de livraison {worker_id} démarré")
+    
+    while True:
+        message_data = await delivery_queue.get()
+        in_flight[worker_id] = message_data
+        try:
+            await deliver_message(message_data)
+            in_flight.pop(worker_id, None)
+        except Exception as e:
+            in_flight.pop(worker_id, None)
+            logger.error(f"❌ Erreur dans le worker de livraison {worker_id}: {e}")
+        finally:
+            # Annulé pendant l'envoi : le message reste dans in_flight pour être sauvegardé
+            delivery_queue.task_done()
+
+async def shared_delivery_worker(worker_id: int):
+    """Tâche de livraison multi-répliques : sert les partitions libres de la file partagée"""
+    await bot.wait_until_ready()
+    logger.info(f"🚀 Worker de livraison partagée {worker_id} démarré")
+    
+    while not draining:
+        delivered = 0
+        try:
+            partitions = await list_pending_partitions()
+            random.shuffle(partitions)
+            for partition in partitions:
+                if draining:
+                    break
+                delivered += await process_partition(
+                    partition,
+                    lambda message_data: deliver_message(message_data, record=False)
+                ) or 0
+        except Exception as e:
+            logger.error(f"❌ Erreur dans le worker de livraison partagée {worker_id}: {e}")
+        
+        if not delivered and not draining:
+            # File vide ou partitions prises ailleurs : attendre une mise en file locale ou le prochain tour
+            try:
+                await asyncio.wait_for(shared_wakeup.wait(), config.DELIVERY_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            shared_wakeup.clear()
+
+def start_delivery_workers(count: int = None):
+    """Démarrer les tâches de livraison sur l'event loop courant"""
+    global delivery_queue, delivery_tasks, shared_wakeup
+    
+    count = count or config.DELIVERY_WORKERS
+    if delivery_queue is None:
+        delivery_queue = asyncio.Queue()
+    if shared_wakeup is None:
+        shared_wakeup = asyncio.Event()
+    if not delivery_tasks:
+        worker = shared_delivery_worker if uses_shared_queue() else delivery_worker
+        delivery_tasks = [asyncio.create_task(worker(i)) for i in range(count)]
+        logger.info(
+            f"🚀 {count} worker(s) de livraison démarré(s) sur l'event loop partagé"
+            + (" (file partagée entre répliques)" if uses_shared_queue() else "")
+        )
+
+async def stop_delivery_workers():
+    """Arrêter les tâches de livraison"""
+    global delivery_tasks
+    
+    for task in delivery_tasks:
+        task.cancel()
+    await asyncio.gather(*delivery_tasks, return_exceptions=True)
+    delivery_tasks = []
+    logger.info("🛑 Workers de livraison arrêtés")
+
 def discord_worker():
-    """Worker thread pour envoyer les messages Discord de manière synchrone"""
+    """Worker thread du mode "threaded" : transfère les messages vers le loop du bot"""
     global worker_running
     
     logger.info("🚀 Worker Discord démarré")
@@ -42,95 +256,9 @@ def discord_worker():
             except queue.Empty:
                 continue
             
-            # Extraire les données du message
-            channel_id = message_data['channel_id']
-            embed_dict = message_data['embed']
-            author_username = message_data['author_username']
-            cast_hash = message_data['cast_hash']
-            guild_id = message_data['guild_id']
-            
-            logger.info(f"📤 Traitement du message pour {author_username} dans le canal {channel_id}")
-            
-            # Récupérer le canal
-            channel = bot.get_channel(channel_id)
-            if not channel:
-                logger.error(f"❌ Canal {channel_id} non trouvé")
-                continue
-            
-            # Envoyer le message
             try:
-                # Créer l'embed Discord
-                embed = discord.Embed(
-                    title=embed_dict.get("title", "Nouveau Cast"),
-                    description=embed_dict.get("description", ""),
-                    color=embed_dict.get("color", 0x8B5CF6),
-                    url=embed_dict.get("url", "")
-                )
-                
-                if embed_dict.get("timestamp"):
-                    embed.timestamp = discord.utils.utcnow()
-                if embed_dict.get("footer"):
-                    embed.set_footer(text=embed_dict.get("footer", {}).get("text", ""))
-                if embed_dict.get("fields"):
-                    for field in embed_dict["fields"]:
-                        embed.add_field(
-                            name=field.get("name", ""), 
-                            value=field.get("value", ""), 
-                            inline=field.get("inline", True)
-                        )
-                if embed_dict.get("thumbnail"):
-                    embed.set_thumbnail(url=embed_dict["thumbnail"]["url"])
-                if embed_dict.get("author"):
-                    author_info = embed_dict["author"]
-                    embed.set_author(
-                        name=author_info.get("name", ""), 
-                        url=author_info.get("url", ""), 
-                        icon_url=author_info.get("icon_url", "")
-                    )
-                
-                # Envoyer le message de manière synchrone
-                try:
-                    # SOLUTION RADICALE : Utiliser bot.loop.call_soon_threadsafe
-                    # Cette méthode est la SEULE qui fonctionne avec discord.py dans un thread
-                    
-                    async def send_message_and_save():
-                        try:
-                            # Envoyer le message
-                            await channel.send(embed=embed)
-                            
-                            # Marquer comme livré dans la base de données
-                            try:
-                                db = get_session_local()()
-                                delivery = Delivery(
-                                    id=str(uuid.uuid4()),
-                                    guild_id=guild_id,
-                                    channel_id=str(channel_id),
-                                    cast_hash=cast_hash
-                                )
-                                db.add(delivery)
-                                db.commit()
-                                logger.info(f"✅ Livraison enregistrée pour {author_username}")
-                            except Exception as e:
-                                logger.error(f"❌ Erreur lors de l'enregistrement de la livraison: {e}")
-                                if db:
-                                    db.rollback()
-                            finally:
-                                if db:
-                                    db.close()
-                            
-                            logger.info(f"✅ Message envoyé avec succès dans {channel.name}")
-                            
-                        except Exception as e:
-                            logger.error(f"❌ Erreur dans send_message_and_save: {e}")
-                    
-                    # Utiliser call_soon_threadsafe pour exécuter la coroutine sur le loop principal du bot
-                    bot.loop.call_soon_threadsafe(
-                        lambda: asyncio.create_task(send_message_and_save())
-                    )
-                    
-                except Exception as e:
-                    logger.error(f"❌ Erreur lors de l'envoi du message: {e}")
-                
+                # Exécuter la livraison sur le loop du bot (autre thread)
+                asyncio.run_coroutine_threadsafe(deliver_message(message_data), bot.loop)
             except Exception as e:
                 logger.error(f"❌ Erreur lors de l'envoi du message: {e}")
             
@@ -160,35 +288,150 @@ def stop_discord_worker():
         worker_thread.join(timeout=5)
         logger.info("🛑 Worker Discord arrêté")
 
-# Démarrer le worker au démarrage
+def stop_accepting_webhooks():
+    """Refuser les nouveaux webhooks (503) pendant l'arrêt"""
+    global accepting_webhooks
+    accepting_webhooks = False
+    logger.info("🚫 Réception des webhooks suspendue (arrêt en cours)")
+
+async def drain_shared_deliveries(timeout: float) -> Dict[str, int]:
+    """Finir les lots en cours jusqu'à l'échéance ; le reste est déjà en base pour les autres répliques"""
+    global draining
+    draining = True
+    if shared_wakeup is not None:
+        shared_wakeup.set()
+    
+    if delivery_tasks:
+        _, pending = await asyncio.wait(delivery_tasks, timeout=max(timeout, 0.1))
+        if pending:
+            # Transactions annulées : leurs messages restent en file (un envoi interrompu peut être rejoué)
+            logger.warning(f"⚠️ {len(pending)} worker(s) de livraison interrompu(s) à l'échéance")
+    await stop_delivery_workers()
+    
+    try:
+        queued = await count_pending_deliveries()
+    except Exception as e:
+        logger.error(f"❌ Impossible de compter la file partagée: {e}")
+        queued = None
+    
+    return {
+        "delivered": delivery_stats["delivered"],
+        "failed": delivery_stats["failed"],
+        "persisted": 0,
+        "dropped": 0,
+        "queued": queued
+    }
+
+async def drain_deliveries(timeout: float) -> Dict[str, int]:
+    """Livrer la file jusqu'à l'échéance puis sauvegarder en base ce qui reste"""
+    if uses_shared_queue():
+        return await drain_shared_deliveries(timeout)
+    
+    if delivery_queue is not None and delivery_tasks and timeout > 0:
+        try:
+            await asyncio.wait_for(delivery_queue.join(), timeout)
+            logger.info("✅ File de livraison vidée")
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ File de livraison non vidée après {timeout:.0f}s ({delivery_queue.qsize()} message(s) restant(s))")
+    
+    await stop_delivery_workers()
+    
+    remaining = list(in_flight.values())
+    in_flight.clear()
+    while delivery_queue is not None and not delivery_queue.empty():
+        remaining.append(delivery_queue.get_nowait())
+        delivery_queue.task_done()
+    
+    persisted = await persist_pending_deliveries(remaining) if remaining else 0
+    return {
+        "delivered": delivery_stats["delivered"],
+        "failed": delivery_stats["failed"],
+        "persisted": persisted,
+        "dropped": len(remaining) - persisted
+    }
+
+async def replay_pending_deliveries():
+    """Remettre en file les livraisons sauvegardées au dernier arrêt"""
+    if uses_shared_queue():
+        # La file partagée est déjà en base : les workers la reprennent d'eux-mêmes
+        return
+    
+    try:
+        messages = await take_pending_deliveries()
+    except Exception as e:
+        logger.error(f"❌ Livraisons en attente non reprises: {e}")
+        return
+    
+    await enqueue_deliveries(messages)
+    delivery_stats["replayed"] += len(messages)
+
+# Démarrer les workers au démarrage
 @app.on_event("startup")
 async def startup_event():
-    start_discord_worker()
+    if ingest_channel is not None:
+        # Processus d'ingestion : les workers de livraison tournent dans le processus Discord
+        return
+    if is_unified_runtime():
+        start_delivery_workers()
+        await replay_pending_deliveries()
+    else:
+        start_discord_worker()
 
-# Arrêter le worker à l'arrêt
+# Arrêter les workers à l'arrêt (déjà fait par l'arrêt gracieux de main.py en mode "unified")
 @app.on_event("shutdown")
 async def shutdown_event():
-    stop_discord_worker()
+    if ingest_channel is not None:
+        await ingest_channel.close()
+    elif is_unified_runtime():
+        if delivery_tasks:
+            await drain_deliveries(config.SHUTDOWN_GRACE_SECONDS)
+    else:
+        stop_discord_worker()
+        
+        # Sauvegarder ce que le thread n'a pas transmis au bot
+        remaining = []
+        while not discord_queue.empty():
+            remaining.append(discord_queue.get_nowait())
+        await persist_pending_deliveries(remaining)
+
+def matching_secret(signature: str, body: bytes, secrets: List[str]) -> Optional[str]:
+    """Secret dont la signature HMAC-SHA512 du body correspond, sinon None"""
+    for secret in secrets:
+        expected_signature = hmac.new(
+            secret.encode('utf-8'),
+            body,
+            hashlib.sha512
+        ).hexdigest()
+        if hmac.compare_digest(signature, expected_signature):
+            return secret
+    return None
 
-def verify_signature(request: Request, body: bytes) -> bool:
-    """Vérifier la signature HMAC-SHA512 du webhook Neynar"""
+async def verify_signature(request: Request, body: bytes) -> bool:
+    """Vérifier la signature HMAC-SHA512 du webhook Neynar
+    
+    Chaque webhook du pool peut avoir son propre secret : la signature est
+    acceptée si elle correspond à l'un d'eux. Si aucun ne correspond, les
+    secrets des shards sont relus en base (shard créé par un autre processus).
+    """
     signature = request.headers.get("X-Neynar-Signature")
     if not signature:
         logger.warning("❌ Signature manquante dans les headers")
         return False
     
     logger.info(f"🔐 Signature reçue: {signature}")
-    logger.info(f"🔐 Secret utilisé: {config.NEYNAR_WEBHOOK_SECRET[:10]}...")
     logger.info(f"🔐 Body length: {len(body)} bytes")
     
-    expected_signature = hmac.new(
-        config.NEYNAR_WEBHOOK_SECRET.encode('utf-8'),
-        body,
-        hashlib.sha512
-    ).hexdigest()
+    secret = matching_secret(signature, body, get_webhook_secrets())
+    if secret is None:
+        try:
+            if await reload_shard_secrets():
+                secret = matching_secret(signature, body, get_webhook_secrets())
+        except Exception as e:
+            logger.error(f"❌ Erreur lors du rechargement des secrets des webhooks: {e}")
     
-    logger.info(f"🔐 Signature calculée: {expected_signature}")
-    is_valid = hmac.compare_digest(signature, expected_signature)
+    is_valid = secret is not None
+    if is_valid:
+        logger.info(f"🔐 Secret utilisé: {secret[:10]}...")
     logger.info(f"🔐 Signature valide: {is_valid}")
     
     return is_valid
@@ -269,15 +512,54 @@ async def webhook_health():
     """Endpoint de santé pour Neynar"""
     return {"status": "webhook endpoint ready"}
 
+def require_admin_token(request: Request):
+    """Protéger les endpoints /admin par le jeton ADMIN_API_TOKEN"""
+    if not config.ADMIN_API_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), config.ADMIN_API_TOKEN):
+        raise HTTPException(status_code=401, detail="Jeton admin invalide")
+
+@app.get("/admin/webhook/drift", dependencies=[Depends(require_admin_token)])
+async def webhook_drift_metrics():
+    """Métriques de dérive entre les abonnements locaux et Neynar"""
+    return get_drift_detector().metrics
+
+@app.get("/admin/commands", dependencies=[Depends(require_admin_token)])
+async def command_metrics():
+    """Latences des commandes Discord (histogramme par commande) et délais dépassés"""
+    return get_command_executor().get_stats()
+
+async def handle_follow_event(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Router un événement follow.created / follow.deleted vers les notifications de followings"""
+    event = data.get('data') or {}
+    follower = event.get('user') or {}
+    followed = event.get('target_user') or {}
+    if not follower.get('fid') or not followed.get('fid'):
+        logger.warning(f"⚠️ Événement {data.get('type')} incomplet")
+        return {"status": "ok", "message": "Données insuffisantes"}
+    
+    if data.get('type') == 'follow.deleted':
+        # Pas de notification pour un unfollow ; le polling de rattrapage met l'instantané à jour
+        logger.info(f"ℹ️ Unfollow: {follower.get('username')} → {followed.get('username')}")
+        return {"status": "ok", "message": "Unfollow ignoré"}
+    
+    messages = await build_follow_event_messages(follower, followed)
+    sent_count = await enqueue_deliveries(messages)
+    logger.info(f"✅ Follow {follower.get('username')} → {followed.get('username')}: {sent_count} notification(s) ajoutée(s) à la queue")
+    return {"status": "success", "sent_count": sent_count}
+
 @app.post("/webhooks/neynar")
 async def neynar_webhook(request: Request):
     """Traiter les webhooks Neynar pour les nouveaux casts"""
+    if not accepting_webhooks:
+        raise HTTPException(status_code=503, detail="Arrêt en cours")
+    
     try:
         # Lire le body de la requête
         body = await request.body()
         
         # Vérifier la signature
-        if not verify_signature(request, body):
+        if not await verify_signature(request, body):
             raise HTTPException(status_code=401, detail="Signature invalide")
         
         # Parser le JSON
@@ -290,6 +572,10 @@ async def neynar_webhook(request: Request):
         # Log complet de la structure des données pour debug
         logger.info(f"🔍 Structure complète du webhook reçue: {json.dumps(data, indent=2)}")
         
+        # Événements du webhook des follows
+        if data.get('type') in FOLLOW_EVENT_TYPES:
+            return await handle_follow_event(data)
+        
         # Extraire les informations du cast selon différentes structures possibles
         cast_data = None
         author = None
@@ -369,12 +655,22 @@ async def neynar_webhook(request: Request):
         # Récupérer les comptes trackés pour cet auteur
         from database import TrackedAccount
         
-        # Créer une session DB manuellement
-        db = get_session_local()()
+        # Le FID est un entier en base : comparer avec le même type pour utiliser l'index
+        try:
+            author_fid = int(author.get('fid'))
+        except (TypeError, ValueError):
+            logger.warning(f"⚠️ FID d'auteur invalide: {author.get('fid')}")
+            return {"status": "ok", "message": "FID invalide"}
+        
+        # Créer une session DB asynchrone (ne bloque pas l'event loop)
+        db = get_async_session_local()()
         try:
-            tracked_accounts = db.query(TrackedAccount).filter(
-                TrackedAccount.fid == str(author.get('fid'))
-            ).all()
+            result = await db.execute(
+                select(TrackedAccount).filter(
+                    TrackedAccount.fid == author_fid
+                )
+            )
+            tracked_accounts = result.scalars().all()
             
             if not tracked_accounts:
                 logger.info(f"ℹ️ Aucun compte tracké pour {author.get('username', 'Unknown')}")
@@ -383,52 +679,53 @@ async def neynar_webhook(request: Request):
             # Vérifier si ce cast a déjà été livré
             cast_hash = cast_data.get('hash', '')
             if cast_hash:
-                existing_delivery = db.query(Delivery).filter(
-                    Delivery.cast_hash == cast_hash
-                ).first()
+                result = await db.execute(
+                    select(Delivery.id).filter(
+                        Delivery.cast_hash == cast_hash
+                    ).limit(1)
+                )
+                existing_delivery = result.scalar()
                 
-                if existing_delivery:
+                # Livraisons envoyées mais pas encore écrites (enregistrement groupé)
+                if existing_delivery or get_delivery_recorder().is_pending(cast_hash):
                     logger.info(f"ℹ️ Cast {cast_hash} déjà livré")
                     return {"status": "ok", "message": "Cast déjà livré"}
         
         finally:
-            db.close()
+            await db.close()
         
         # Envoyer les notifications
-        sent_count = 0
+        messages = []
         for tracked_account in tracked_accounts:
             try:
                 # Convertir le channel_id en int de manière sécurisée
                 channel_id = int(tracked_account.channel_id)
-                channel = bot.get_channel(channel_id)
                 
-                if channel and bot.is_ready():
-                    try:
-                        # Ajouter le message à la queue Discord
-                        discord_queue.put({
-                            'channel_id': channel_id,
-                            'embed': embed_dict,
-                            'author_username': author.get('username', 'Unknown'),
-                            'cast_hash': cast_hash,
-                            'guild_id': tracked_account.guild_id
-                        })
-                        
-                        logger.info(f"✅ Message ajouté à la queue pour {channel.name}")
-                        sent_count += 1
-                        
-                    except Exception as e:
-                        logger.error(f"❌ Erreur lors de l'ajout à la queue: {e}")
-                else:
+                # Mode "threaded" : le cache du bot vit dans un autre thread, vérifier avant d'enfiler.
+                # Mode "unified" : les workers attendent que le bot soit prêt et résolvent le salon.
+                if not is_unified_runtime():
                     if not bot.is_ready():
                         logger.warning(f"⚠️ Bot Discord pas encore prêt")
-                    else:
+                        continue
+                    if not resolve_channel(channel_id, tracked_account.guild_id):
                         logger.warning(f"⚠️ Canal {channel_id} non trouvé")
-                        
+                        continue
+                
+                messages.append({
+                    'channel_id': channel_id,
+                    'embed': embed_dict,
+                    'author_username': author.get('username', 'Unknown'),
+                    'cast_hash': cast_hash,
+                    'guild_id': tracked_account.guild_id
+                })
+                
             except ValueError as e:
                 logger.error(f"❌ Erreur de conversion du channel_id '{tracked_account.channel_id}': {e}")
             except Exception as e:
                 logger.error(f"❌ Erreur lors de l'envoi de la notification pour {author.get('username', 'Unknown')}: {e}")
         
+        # Ajouter les messages à la file de livraison
+        sent_count = await enqueue_deliveries(messages)
         logger.info(f"✅ {sent_count} notification(s) ajoutée(s) à la queue")
         return {"status": "success", "sent_count": sent_count}
         
@@ -1,9 +1,14 @@
-import json
+import bisect
+import hashlib
 import logging
+import threading
 import time
+from collections import Counter
 from datetime import datetime
-from typing import List
-from database import get_session_local, WebhookState, TrackedAccount
+from typing import Dict, Iterable, List, Optional, Set
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from database import get_session_local, get_async_session_local, WebhookState, WebhookSubscription, TrackedAccount, TrackedFollowing
 from neynar_client import get_neynar_client
 from config import config
 
@@ -18,132 +23,559 @@ def build_webhook_url(base_url: str, endpoint: str = "webhooks/neynar") -> str:
     # Construire l'URL proprement
     return f"{base_url}/{endpoint}"
 
-def sync_neynar_webhook():
-    """Synchroniser le webhook Neynar avec les FIDs suivis selon la documentation officielle"""
+def get_subscribed_fids(db, webhook_id: str) -> List[int]:
+    """Lister les FIDs abonnés à un webhook, triés"""
+    return list(db.execute(
+        select(WebhookSubscription.fid)
+        .where(WebhookSubscription.webhook_id == webhook_id)
+        .order_by(WebhookSubscription.fid)
+    ).scalars())
+
+def count_subscribed_fids(db, webhook_id: str) -> int:
+    """Compter les FIDs abonnés à un webhook sans les charger"""
+    return db.execute(
+        select(func.count())
+        .select_from(WebhookSubscription)
+        .where(WebhookSubscription.webhook_id == webhook_id)
+    ).scalar_one()
+
+def get_fid_owners(db) -> Dict[int, str]:
+    """Charger l'appartenance FID -> webhook de tout le pool"""
+    return {
+        fid: webhook_id
+        for webhook_id, fid in db.execute(
+            select(WebhookSubscription.webhook_id, WebhookSubscription.fid)
+        )
+    }
+
+def count_subscribed_fids_by_webhook(db) -> Dict[str, int]:
+    """Compter les FIDs abonnés par webhook du pool"""
+    return dict(db.execute(
+        select(WebhookSubscription.webhook_id, func.count())
+        .group_by(WebhookSubscription.webhook_id)
+    ).all())
+
+def add_subscribed_fids(db, webhook_id: str, fids: Iterable[int]) -> List[int]:
+    """Abonner des FIDs au webhook (idempotent), retourne les FIDs réellement ajoutés"""
+    rows = [{"webhook_id": webhook_id, "fid": int(fid)} for fid in set(fids)]
+    if not rows:
+        return []
+    
+    result = db.execute(
+        pg_insert(WebhookSubscription)
+        .values(rows)
+        .on_conflict_do_nothing()
+        .returning(WebhookSubscription.fid)
+    )
+    return sorted(result.scalars())
+
+def remove_subscribed_fids(db, webhook_id: str, fids: Iterable[int]) -> List[int]:
+    """Désabonner des FIDs du webhook, retourne les FIDs réellement retirés"""
+    fids = {int(fid) for fid in fids}
+    if not fids:
+        return []
+    
+    result = db.execute(
+        delete(WebhookSubscription)
+        .where(
+            WebhookSubscription.webhook_id == webhook_id,
+            WebhookSubscription.fid.in_(fids)
+        )
+        .returning(WebhookSubscription.fid)
+    )
+    return sorted(result.scalars())
+
+def lock_webhook_state(db, state_id: str = "singleton"):
+    """Récupérer l'état du webhook en le verrouillant jusqu'au commit
+    
+    Sérialise les modifications concurrentes (!track/!untrack simultanés)
+    pour éviter les mises à jour perdues côté base et côté Neynar. Le
+    verrou du webhook principal protège tout le pool.
+    """
+    return db.execute(
+        select(WebhookState).where(WebhookState.id == state_id).with_for_update()
+    ).scalars().first()
+
+def set_webhook_id(db, webhook_state, webhook_id: str):
+    """Changer l'ID du webhook en conservant ses abonnements"""
+    if webhook_state.webhook_id == webhook_id:
+        return
+    
+    db.execute(
+        WebhookSubscription.__table__.update()
+        .where(WebhookSubscription.webhook_id == webhook_state.webhook_id)
+        .values(webhook_id=webhook_id)
+    )
+    webhook_state.webhook_id = webhook_id
+
+# Secrets de signature des shards (en plus de NEYNAR_WEBHOOK_SECRET)
+_shard_secrets: List[str] = []
+_shard_secrets_loaded_at: Optional[float] = None
+# Intervalle minimal entre deux rechargements déclenchés par une signature inconnue
+SHARD_SECRETS_RELOAD_INTERVAL_SECONDS = 10
+
+def get_webhook_secrets() -> List[str]:
+    """Secrets acceptés pour la signature des webhooks entrants"""
+    secrets = [config.NEYNAR_WEBHOOK_SECRET] if config.NEYNAR_WEBHOOK_SECRET else []
+    if config.NEYNAR_FOLLOW_WEBHOOK_SECRET and config.NEYNAR_FOLLOW_WEBHOOK_SECRET not in secrets:
+        secrets.append(config.NEYNAR_FOLLOW_WEBHOOK_SECRET)
+    return secrets + [s for s in _shard_secrets if s not in secrets]
+
+async def reload_shard_secrets() -> bool:
+    """Recharger les secrets des shards depuis webhook_state, retourne True si rechargés
+    
+    Un shard créé automatiquement n'est connu des autres processus (ingestion,
+    répliques non leader, processus pas encore synchronisé) que par la base.
+    Les rechargements sont espacés d'au moins quelques secondes pour qu'un
+    flux de signatures invalides ne martèle pas la base.
+    """
+    global _shard_secrets, _shard_secrets_loaded_at
+    
+    now = time.monotonic()
+    if _shard_secrets_loaded_at is not None and now - _shard_secrets_loaded_at < SHARD_SECRETS_RELOAD_INTERVAL_SECONDS:
+        return False
+    _shard_secrets_loaded_at = now
+    
+    db = get_async_session_local()()
     try:
-        logger.info("Début de la synchronisation du webhook Neynar...")
+        result = await db.execute(select(WebhookState.secret).where(WebhookState.secret.isnot(None)))
+        _shard_secrets = list(result.scalars())
+    finally:
+        await db.close()
+    return True
+
+# FIDs acquittés par le webhook des follows (None = jamais poussé depuis le démarrage)
+_follow_fids_pushed: Optional[Set[int]] = None
+_follow_lock = threading.Lock()
+
+def sync_follow_webhook(force: bool = False) -> bool:
+    """Abonner le webhook des follows aux comptes dont les followings sont suivis
+    
+    Un seul PUT, et seulement si la liste a changé depuis le dernier envoi.
+    Retourne False si aucun webhook des follows n'est configuré.
+    """
+    global _follow_fids_pushed
+    
+    webhook_id = config.NEYNAR_FOLLOW_WEBHOOK_ID
+    if not webhook_id:
+        return False
+    
+    db = get_session_local()()
+    try:
+        fids = set(db.execute(select(TrackedFollowing.target_fid).distinct()).scalars())
+    finally:
+        db.close()
+    
+    with _follow_lock:
+        if not force and fids == _follow_fids_pushed:
+            return True
         
-        # Vérifier que le client Neynar est disponible
-        if not get_neynar_client() or not hasattr(get_neynar_client(), 'create_webhook'):
-            logger.error("Client Neynar non disponible ou invalide")
+        get_neynar_client().update_follow_webhook(webhook_id, sorted(fids))
+        _follow_fids_pushed = fids
+        logger.info(f"✅ Webhook des follows {webhook_id} synchronisé ({len(fids)} compte(s))")
+        return True
+
+class WebhookShardRing:
+    """Anneau de hachage cohérent à charge bornée sur les webhooks du pool
+    
+    Chaque webhook occupe plusieurs points virtuels de l'anneau. Un FID est
+    confié au premier webhook rencontré dans le sens horaire qui n'a pas
+    atteint sa capacité ; ajouter un webhook ne déplace aucun FID existant.
+    """
+    
+    def __init__(self, webhook_ids: Iterable[str], replicas: int = 64):
+        self.webhook_ids = sorted(set(webhook_ids))
+        points = sorted(
+            (self._hash(f"{webhook_id}#{replica}"), webhook_id)
+            for webhook_id in self.webhook_ids
+            for replica in range(replicas)
+        )
+        self._points = [point for point, _ in points]
+        self._owners = [webhook_id for _, webhook_id in points]
+    
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+    
+    def candidates(self, fid: int):
+        """Webhooks distincts dans l'ordre de l'anneau à partir du FID"""
+        if not self._points:
             return
         
-        # Récupérer tous les FIDs suivis (toutes guilds confondues)
+        start = bisect.bisect(self._points, self._hash(str(fid)))
+        seen = set()
+        for i in range(len(self._points)):
+            webhook_id = self._owners[(start + i) % len(self._points)]
+            if webhook_id not in seen:
+                seen.add(webhook_id)
+                yield webhook_id
+                if len(seen) == len(self.webhook_ids):
+                    return
+    
+    def assign(self, fid: int, loads: Dict[str, int], capacity: int) -> Optional[str]:
+        """Premier webhook non plein pour ce FID, None si tout le pool est plein"""
+        for webhook_id in self.candidates(fid):
+            if loads.get(webhook_id, 0) < capacity:
+                return webhook_id
+        return None
+
+class SubscriptionSyncEngine:
+    """Synchronisation incrémentale des FIDs abonnés au pool de webhooks Neynar
+    
+    Garde en mémoire l'état désiré (FIDs suivis dans tracked_accounts) et le
+    dernier état acquitté par Neynar (webhook_subscriptions, un webhook
+    propriétaire par FID). Une synchro calcule le diff minimal, répartit
+    les nouveaux FIDs sur les shards par hachage cohérent et n'appelle
+    Neynar que pour les shards touchés, sans GET de vérification préalable.
+    """
+    
+    def __init__(self, webhook_id: Optional[str] = None, shard_size: Optional[int] = None):
+        self.webhook_id = webhook_id or config.NEYNAR_WEBHOOK_ID
+        self.shard_size = shard_size or config.NEYNAR_WEBHOOK_SHARD_SIZE
+        self.pool: List[str] = []
+        self.ring = WebhookShardRing([])
+        self.desired_fids: Optional[Set[int]] = None
+        self.owners: Optional[Dict[int, str]] = None
+        # updated_at du webhook principal lors du dernier chargement : une autre réplique l'a-t-elle modifié ?
+        self.state_version = None
+        self.lock = threading.Lock()
+        self.stats = {
+            "syncs": 0,
+            "skipped": 0,
+            "upstream_calls": 0,
+            "upstream_errors": 0,
+            "fids_sent": 0,
+            "shards_provisioned": 0
+        }
+    
+    def _load_desired(self, db) -> Set[int]:
+        """Charger l'ensemble complet des FIDs suivis (toutes guilds confondues)"""
+        return set(db.execute(select(TrackedAccount.fid).distinct()).scalars())
+    
+    def _refresh_desired(self, db, fids: Iterable[int]) -> int:
+        """Réévaluer uniquement les FIDs modifiés (une requête indexée sur fid)"""
+        fids = {int(fid) for fid in fids}
+        if not fids:
+            return 0
+        
+        still_tracked = set(db.execute(
+            select(TrackedAccount.fid).where(TrackedAccount.fid.in_(fids)).distinct()
+        ).scalars())
+        self.desired_fids |= still_tracked
+        self.desired_fids -= fids - still_tracked
+        return 1
+    
+    def _ensure_pool(self, db):
+        """Verrouiller le webhook principal et charger les webhooks actifs du pool"""
+        webhook_state = lock_webhook_state(db)
+        
+        if not webhook_state:
+            logger.info(f"🔒 Aucun état de webhook trouvé, utilisation FORCÉE du webhook {self.webhook_id}")
+            webhook_state = WebhookState(id="singleton", webhook_id=self.webhook_id, active=True)
+            db.add(webhook_state)
+        elif webhook_state.webhook_id != self.webhook_id:
+            logger.warning(f"🔒 Webhook ID changé de {webhook_state.webhook_id} vers {self.webhook_id}")
+            set_webhook_id(db, webhook_state, self.webhook_id)
+        
+        shards = {
+            state.id: state
+            for state in db.execute(select(WebhookState).where(WebhookState.id != "singleton")).scalars()
+        }
+        for shard_id in config.NEYNAR_WEBHOOK_SHARD_IDS:
+            if shard_id != self.webhook_id and shard_id not in shards:
+                logger.info(f"🧩 Ajout du webhook {shard_id} au pool")
+                shards[shard_id] = WebhookState(id=shard_id, webhook_id=shard_id, active=True)
+                db.add(shards[shard_id])
+        
+        pool = [self.webhook_id] + sorted(
+            state.webhook_id for state in shards.values()
+            if state.active is not False and state.webhook_id != self.webhook_id
+        )
+        if pool != self.pool:
+            self.pool = pool
+            self.ring = WebhookShardRing(pool)
+            logger.info(f"🧩 Pool de webhooks: {len(pool)} shard(s) de {self.shard_size} FIDs max")
+        
+        global _shard_secrets
+        _shard_secrets = [state.secret for state in shards.values() if state.secret]
+        return webhook_state
+    
+    def _provision_shard(self) -> Optional[str]:
+        """Créer un nouveau webhook Neynar vide et l'ajouter au pool"""
+        if not config.NEYNAR_WEBHOOK_AUTO_PROVISION or not config.PUBLIC_BASE_URL:
+            return None
+        
+        response = get_neynar_client().create_webhook(build_webhook_url(config.PUBLIC_BASE_URL), [])
+        webhook = response.get("webhook", response)
+        webhook_id = webhook.get("webhook_id") or webhook.get("id")
+        if not webhook_id:
+            logger.error(f"❌ Réponse de création de webhook inattendue: {response}")
+            return None
+        
+        secrets = webhook.get("secrets") or []
+        secret = secrets[0].get("value") if secrets else None
+        
+        # Session séparée : le webhook existe côté Neynar même si la synchro échoue
         db = get_session_local()()
         try:
-            tracked_accounts = db.query(TrackedAccount.fid).distinct().all()
-            all_fids = [int(account[0]) for account in tracked_accounts]  # S'assurer que ce sont des entiers
-            
-            logger.info(f"FIDs collectés pour le tracking: {len(all_fids)} - {all_fids}")
-            
-            # Récupérer l'état actuel du webhook
-            webhook_state = db.query(WebhookState).filter_by(id="singleton").first()
-            
-            if not webhook_state:
-                # FORCER L'UTILISATION DU WEBHOOK CONFIGURÉ
-                webhook_id = config.NEYNAR_WEBHOOK_ID
-                logger.info(f"🔒 Aucun état de webhook trouvé, utilisation FORCÉE du webhook {webhook_id}")
-                
-                # Créer l'état local avec le webhook configuré
-                webhook_state = WebhookState(
-                    id="singleton",
-                    webhook_id=webhook_id,
-                    active=True,
-                    author_fids=json.dumps(all_fids)
-                )
-                db.add(webhook_state)
+            db.add(WebhookState(id=webhook_id, webhook_id=webhook_id, active=True, secret=secret))
+            db.commit()
+        finally:
+            db.close()
+        
+        if secret:
+            _shard_secrets.append(secret)
+        self.pool.append(webhook_id)
+        self.ring = WebhookShardRing(self.pool)
+        self.stats["shards_provisioned"] += 1
+        logger.info(f"🧩 Nouveau webhook {webhook_id} créé pour le pool ({len(self.pool)} shard(s))")
+        return webhook_id
+    
+    def compute_diff(self):
+        """Retourner (FIDs à ajouter, FIDs à retirer) par rapport à l'état acquitté"""
+        to_add = sorted(self.desired_fids - self.owners.keys())
+        to_remove = sorted(self.owners.keys() - self.desired_fids)
+        return to_add, to_remove
+    
+    def plan(self, to_add: List[int], to_remove: List[int]) -> Dict[str, Dict[str, List[int]]]:
+        """Répartir le diff par webhook : {webhook_id: {"add": [...], "remove": [...]}}
+        
+        Les FIDs déjà abonnés restent sur leur webhook ; seuls les nouveaux
+        FIDs (et ceux d'un webhook sorti du pool) sont placés sur l'anneau.
+        """
+        changes = {}
+        loads = Counter(self.owners.values())
+        
+        def entry(webhook_id):
+            # Webhook sorti du pool : on libère ses FIDs localement, sans appel Neynar
+            return changes.setdefault(
+                webhook_id, {"add": [], "remove": [], "local": webhook_id not in self.pool}
+            )
+        
+        for fid in to_remove:
+            webhook_id = self.owners[fid]
+            entry(webhook_id)["remove"].append(fid)
+            loads[webhook_id] -= 1
+        
+        orphaned = sorted(
+            fid for fid, webhook_id in self.owners.items()
+            if webhook_id not in self.pool and fid in self.desired_fids
+        )
+        for fid in orphaned:
+            entry(self.owners[fid])["remove"].append(fid)
+        
+        for fid in to_add + orphaned:
+            webhook_id = self.ring.assign(fid, loads, self.shard_size)
+            if webhook_id is None:
+                webhook_id = self._provision_shard()
+            if webhook_id is None:
+                # Pool plein : dépasser la capacité plutôt que perdre le FID
+                webhook_id = next(self.ring.candidates(fid))
+                logger.warning(f"⚠️ Pool de webhooks plein, FID {fid} ajouté au-delà de la capacité de {webhook_id}")
+            entry(webhook_id)["add"].append(fid)
+            loads[webhook_id] += 1
+        
+        return changes
+    
+    def push_shard(self, webhook_id: str) -> bool:
+        """Repousser vers Neynar la liste acquittée d'un webhook (réparation de dérive)"""
+        with self.lock:
+            db = get_session_local()()
+            try:
+                lock_webhook_state(db)
+                payload = get_subscribed_fids(db, webhook_id)
+                get_neynar_client().update_webhook(webhook_id, payload)
                 db.commit()
+                self.stats["upstream_calls"] += 1
+                self.stats["fids_sent"] += len(payload)
+                logger.info(f"🔧 Webhook {webhook_id} réaligné sur {len(payload)} FID(s) acquitté(s)")
+                return True
+            except Exception as e:
+                db.rollback()
+                self.stats["upstream_errors"] += 1
+                logger.error(f"❌ Erreur lors du réalignement du webhook {webhook_id}: {e}")
+                return False
+            finally:
+                db.close()
+    
+    def invalidate(self):
+        """Oublier les ensembles en mémoire (rechargés à la prochaine synchro)"""
+        with self.lock:
+            self.desired_fids = None
+            self.owners = None
+    
+    def sync(self, changed_fids: Optional[Iterable[int]] = None, force: bool = False) -> Dict:
+        """Synchroniser le pool de webhooks Neynar avec l'état désiré
+        
+        changed_fids : FIDs dont le suivi a changé ; seuls ceux-ci sont
+        réévalués en base. None recharge l'état désiré complet.
+        force : pousser la liste de chaque webhook même si le diff est vide.
+        
+        Retourne un rapport de coût (appels Neynar, taille du payload,
+        requêtes SQL, durée) avec le détail par shard.
+        """
+        started = time.monotonic()
+        report = {
+            "webhook_id": self.webhook_id,
+            "added": [],
+            "removed": [],
+            "shards": {},
+            "skipped": False,
+            "success": True,
+            "upstream_calls": 0,
+            "payload_fids": 0,
+            "db_queries": 0
+        }
+        
+        with self.lock:
+            db = get_session_local()()
+            try:
+                webhook_state = self._ensure_pool(db)
+                report["db_queries"] += 2
                 
-                logger.info(f"✅ État local créé avec le webhook {webhook_id}")
+                if webhook_state.updated_at != self.state_version:
+                    # Synchro faite ailleurs (autre réplique) : les ensembles en mémoire sont périmés
+                    self.owners = None
+                    self.desired_fids = None
                 
-                # Mettre à jour le webhook existant avec les FIDs actuels
-                try:
-                    updated_webhook = get_neynar_client().update_webhook(
-                        webhook_id,
-                        all_fids
-                    )
-                    logger.info(f"✅ Webhook existant {webhook_id} mis à jour avec les FIDs actuels")
-                except Exception as e:
-                    logger.warning(f"⚠️ Impossible de mettre à jour le webhook existant: {e}")
-                    logger.warning("⚠️ Mais l'état local est créé et le webhook sera utilisé")
-                    
-            else:
-                # Vérifier si la liste des FIDs a changé
-                current_fids = json.loads(webhook_state.author_fids)
-                current_fids.sort()
-                new_fids = sorted(all_fids)
+                if self.owners is None:
+                    self.owners = get_fid_owners(db)
+                    report["db_queries"] += 1
                 
-                # FORCER L'UTILISATION DU WEBHOOK CONFIGURÉ
-                webhook_id = config.NEYNAR_WEBHOOK_ID
-                if webhook_state.webhook_id != webhook_id:
-                    logger.warning(f"🔒 Webhook ID différent du webhook configuré, FORCAGE de l'utilisation du webhook {webhook_id}")
-                    webhook_state.webhook_id = webhook_id
+                if self.desired_fids is None or changed_fids is None:
+                    self.desired_fids = self._load_desired(db)
+                    report["db_queries"] += 1
+                else:
+                    report["db_queries"] += self._refresh_desired(db, changed_fids)
+                
+                to_add, to_remove = self.compute_diff()
+                report["added"], report["removed"] = to_add, to_remove
+                changes = self.plan(to_add, to_remove)
+                
+                if force:
+                    for webhook_id in self.pool:
+                        changes.setdefault(webhook_id, {"add": [], "remove": [], "local": False})
+                
+                if not changes:
+                    # Rien n'a changé : ni GET de vérification ni PUT
                     db.commit()
-                    logger.info(f"✅ Webhook ID forcé sur {webhook_id}")
+                    self.state_version = webhook_state.updated_at
+                    report["skipped"] = True
+                    self.stats["skipped"] += 1
+                    return report
                 
-                # Vérifier l'état du webhook configuré côté Neynar
-                try:
-                    webhook_details = get_neynar_client().get_webhook(webhook_id)
-                    if not webhook_details or not webhook_details.get("active"):
-                        logger.warning(f"⚠️ Webhook {webhook_id} inactif côté Neynar, tentative de réactivation...")
-                        try:
-                            # Réactiver le webhook configuré avec les FIDs actuels
-                            reactivated_webhook = get_neynar_client().update_webhook(
-                                webhook_id,
-                                all_fids
-                            )
-                            logger.info(f"✅ Webhook {webhook_id} réactivé")
-                            # Mettre à jour l'état local
-                            webhook_state.author_fids = json.dumps(all_fids)
-                            webhook_state.updated_at = datetime.utcnow()
-                            db.commit()
-                        except Exception as reactivate_error:
-                            logger.error(f"❌ Impossible de réactiver le webhook {webhook_id}: {reactivate_error}")
-                            logger.warning("⚠️ Mais on continue avec l'état local existant")
-                    else:
-                        logger.info(f"✅ Webhook {webhook_id} actif et accessible")
-                except Exception as check_error:
-                    logger.warning(f"⚠️ Impossible de vérifier l'état du webhook {webhook_id}: {check_error}")
-                    logger.warning("⚠️ Mais on continue avec l'état local existant")
+                fids_by_webhook = {}
+                for fid, webhook_id in self.owners.items():
+                    fids_by_webhook.setdefault(webhook_id, set()).add(fid)
                 
-                if current_fids != new_fids:
-                    logger.info(f"FIDs modifiés, mise à jour du webhook... Anciens: {current_fids}, Nouveaux: {new_fids}")
+                # Libérer d'abord les FIDs des webhooks sortis du pool (unicité du FID)
+                for webhook_id, change in changes.items():
+                    if change["local"]:
+                        remove_subscribed_fids(db, webhook_id, change["remove"])
+                        for fid in change["remove"]:
+                            del self.owners[fid]
+                        report["db_queries"] += 1
+                
+                for webhook_id, change in changes.items():
+                    if change["local"]:
+                        continue
+                    
+                    # L'API exige la liste complète des FIDs du webhook
+                    payload = sorted(
+                        (fids_by_webhook.get(webhook_id, set()) - set(change["remove"])) | set(change["add"])
+                    )
+                    shard_report = {
+                        "added": len(change["add"]),
+                        "removed": len(change["remove"]),
+                        "payload_fids": len(payload),
+                        "success": True
+                    }
+                    report["shards"][webhook_id] = shard_report
+                    report["upstream_calls"] += 1
+                    report["payload_fids"] += len(payload)
+                    self.stats["upstream_calls"] += 1
+                    self.stats["fids_sent"] += len(payload)
                     
                     try:
-                        # Mettre à jour le webhook configuré
-                        updated_webhook = get_neynar_client().update_webhook(
-                            webhook_id,
-                            all_fids
-                        )
-                        
-                        # Mettre à jour l'état en base
-                        webhook_state.author_fids = json.dumps(all_fids)
-                        webhook_state.updated_at = datetime.utcnow()
-                        db.commit()
-                        
-                        logger.info(f"✅ Webhook {webhook_id} mis à jour avec succès")
-                        
+                        get_neynar_client().update_webhook(webhook_id, payload)
                     except Exception as e:
-                        logger.error(f"Erreur lors de la mise à jour du webhook: {e}")
+                        report["success"] = False
+                        report["error"] = str(e)
+                        shard_report["success"] = False
+                        self.stats["upstream_errors"] += 1
+                        
                         # STRATÉGIE CONSERVATIVE : Ne JAMAIS recréer le webhook
-                        # Si erreur, on garde l'ancien état et on log l'erreur
-                        error_message = str(e).lower()
-                        if "404" in error_message or "not found" in error_message:
-                            logger.warning("⚠️ Webhook introuvable côté Neynar, mais on NE LE RECRÉE PAS")
-                            logger.warning("⚠️ On garde l'état local pour éviter la perte de connexion")
-                            logger.warning("⚠️ Le webhook sera récupéré au prochain redémarrage du bot")
-                            # On ne fait RIEN, on garde l'état local
+                        if "404" in str(e) or "not found" in str(e).lower():
+                            logger.error(f"❌ Webhook {webhook_id} N'EXISTE PLUS côté Neynar !")
+                            logger.error("❌ Il faut le recréer manuellement sur Neynar ou utiliser un autre webhook")
                         else:
-                            logger.warning("⚠️ Erreur de mise à jour, mais on garde l'état existant")
-                            # On ne fait RIEN, on garde l'état local
-                else:
-                    logger.info("Aucun changement de FIDs détecté, webhook à jour")
-            
+                            logger.error(f"❌ Erreur lors de la mise à jour du webhook {webhook_id}: {e}")
+                            logger.warning("⚠️ On garde l'état acquitté de ce shard, le diff sera rejoué")
+                        continue
+                    
+                    # Neynar a acquitté : persister uniquement le diff de ce shard
+                    remove_subscribed_fids(db, webhook_id, change["remove"])
+                    add_subscribed_fids(db, webhook_id, change["add"])
+                    report["db_queries"] += 2
+                    for fid in change["remove"]:
+                        del self.owners[fid]
+                    for fid in change["add"]:
+                        self.owners[fid] = webhook_id
+                
+                webhook_state.active = True
+                webhook_state.updated_at = datetime.utcnow()
+                db.commit()
+                # Relu après le commit : valeur telle que stockée, comparée à la prochaine synchro
+                self.state_version = webhook_state.updated_at
+                report["db_queries"] += 2
+                return report
+                
+            except Exception:
+                db.rollback()
+                # L'état en mémoire peut être en avance sur la base : tout recharger
+                self.owners = None
+                raise
+            finally:
+                db.close()
+                self.stats["syncs"] += 1
+                report["duration_ms"] = round((time.monotonic() - started) * 1000, 1)
+                logger.info(
+                    f"📊 Synchro webhooks ({len(self.pool)} shard(s)): +{len(report['added'])}/-{len(report['removed'])} FID(s), "
+                    f"{report['upstream_calls']} appel(s) Neynar, payload {report['payload_fids']} FID(s), "
+                    f"{report['db_queries']} requête(s) SQL, {report['duration_ms']} ms"
+                    + (" (inchangé, ignoré)" if report["skipped"] else "")
+                )
+
+# Instance globale du moteur (initialisation différée)
+_subscription_engine = None
+
+def get_subscription_engine() -> SubscriptionSyncEngine:
+    """Obtenir le moteur de synchronisation des abonnements"""
+    global _subscription_engine
+    
+    if _subscription_engine is None:
+        _subscription_engine = SubscriptionSyncEngine()
+    
+    return _subscription_engine
+
+def sync_neynar_webhook():
+    """Synchroniser le webhook Neynar avec les FIDs suivis (diff incrémental)"""
+    try:
+        logger.info("Début de la synchronisation du webhook Neynar...")
+        
+        # Vérifier que le client Neynar est disponible
+        if not get_neynar_client():
+            logger.error("Client Neynar non disponible ou invalide")
+            return
+        
+        report = get_subscription_engine().sync()
+        
+        if report["success"]:
             logger.info("Synchronisation du webhook Neynar terminée avec succès")
-            
-        finally:
-            db.close()
-            
+        else:
+            logger.warning("⚠️ Synchronisation incomplète, l'état acquitté est conservé")
+        return report
+        
     except Exception as e:
         logger.error(f"Échec de la synchronisation du webhook Neynar: {e}")
         # Ne pas lever l'exception, juste logger l'erreur
@@ -216,7 +648,7 @@ def get_webhook_stats():
         
         db = get_session_local()()
         try:
-            webhook_state = db.query(WebhookState).filter_by(id="singleton").first()
+            webhook_state = db.get(WebhookState, "singleton")
             
             if not webhook_state:
                 logger.info("📝 Aucun état de webhook trouvé")
@@ -238,11 +670,13 @@ def get_webhook_stats():
             logger.info(f"🔧 Détails du webhook fixe récupérés: {webhook_details}")
             
             if webhook_details.get("active"):
+                shards = count_subscribed_fids_by_webhook(db)
                 return {
                     "status": "active",
                     "webhook_id": webhook_id,
-                    "author_fids_count": len(json.loads(webhook_state.author_fids)),
-                    "message": f"Webhook {webhook_id} actif"
+                    "author_fids_count": sum(shards.values()),
+                    "shards": shards,
+                    "message": f"Webhook {webhook_id} actif ({max(len(shards), 1)} shard(s))"
                 }
             else:
                 return {
@@ -262,238 +696,43 @@ def get_webhook_stats():
         return {"status": "error", "message": str(e)}
 
 def force_webhook_fixe():
-    """Forcer l'utilisation du webhook fixe 01K45KREDQ77B80YD87AAXJ3E8"""
+    """Forcer l'utilisation du webhook fixe et y pousser tous les FIDs suivis"""
     try:
-        logger.info("🔒 FORCAGE de l'utilisation du webhook fixe 01K45KREDQ77B80YD87AAXJ3E8")
+        logger.info(f"🔒 FORCAGE de l'utilisation du webhook fixe {config.NEYNAR_WEBHOOK_ID}")
+        
+        engine = get_subscription_engine()
+        # Recharger l'état acquitté depuis la base puis pousser la liste complète
+        engine.invalidate()
+        report = engine.sync(force=True)
+        
+        if report["success"]:
+            logger.info(f"✅ Webhook fixe {engine.webhook_id} mis à jour côté Neynar")
+            return True
+        
+        logger.warning("⚠️ Impossible de mettre à jour le webhook côté Neynar")
+        return False
         
-        db = get_session_local()()
-        try:
-            # Récupérer ou créer l'état du webhook
-            webhook_state = db.query(WebhookState).filter_by(id="singleton").first()
-            
-            if not webhook_state:
-                # Créer un nouvel état avec le webhook fixe
-                webhook_state = WebhookState(
-                    id="singleton",
-                    webhook_id="01K45KREDQ77B80YD87AAXJ3E8",  # WEBHOOK FIXE
-                    active=True,
-                    author_fids=json.dumps([])
-                )
-                db.add(webhook_state)
-                logger.info("✅ Nouvel état créé avec le webhook fixe")
-            else:
-                # Forcer l'utilisation du webhook fixe
-                if webhook_state.webhook_id != "01K45KREDQ77B80YD87AAXJ3E8":
-                    logger.warning(f"🔒 Webhook ID changé de {webhook_state.webhook_id} vers 01K45KREDQ77B80YD87AAXJ3E8")
-                    webhook_state.webhook_id = "01K45KREDQ77B80YD87AAXJ3E8"
-                else:
-                    logger.info("✅ Webhook ID déjà correct: 01K45KREDQ77B80YD87AAXJ3E8")
-            
-            # Récupérer tous les FIDs trackés
-            tracked_accounts = db.query(TrackedAccount.fid).distinct().all()
-            all_fids = [int(account[0]) for account in tracked_accounts]  # S'assurer que ce sont des entiers
-            
-            # Mettre à jour l'état local
-            webhook_state.author_fids = json.dumps(all_fids)
-            webhook_state.updated_at = datetime.utcnow()
-            db.commit()
-            
-            logger.info(f"✅ État local synchronisé avec {len(all_fids)} FID(s)")
-            
-            # VÉRIFIER D'ABORD SI LE WEBHOOK EXISTE ENCORE CÔTÉ NEYNAR
-            try:
-                webhook_details = get_neynar_client().get_webhook("01K45KREDQ77B80YD87AAXJ3E8")
-                if webhook_details and webhook_details.get("active"):
-                    logger.info("✅ Webhook fixe 01K45KREDQ77B80YD87AAXJ3E8 existe et est actif côté Neynar")
-                    
-                    # Mettre à jour le webhook côté Neynar
-                    try:
-                        updated_webhook = get_neynar_client().update_webhook(
-                            "01K45KREDQ77B80YD87AAXJ3E8",  # WEBHOOK FIXE
-                            all_fids
-                        )
-                        logger.info("✅ Webhook fixe 01K45KREDQ77B80YD87AAXJ3E8 mis à jour côté Neynar")
-                        return True
-                    except Exception as e:
-                        logger.warning(f"⚠️ Impossible de mettre à jour le webhook côté Neynar: {e}")
-                        logger.warning("⚠️ Mais l'état local est synchronisé")
-                        return False
-                else:
-                    logger.warning(f"⚠️ Webhook 01K45KREDQ77B80YD87AAXJ3E8 n'existe plus ou est inactif côté Neynar")
-                    logger.warning("⚠️ Il faut le recréer manuellement sur Neynar ou utiliser un autre webhook")
-                    return False
-                    
-            except Exception as e:
-                if "404" in str(e) or "not found" in str(e).lower():
-                    logger.error(f"❌ Webhook 01K45KREDQ77B80YD87AAXJ3E8 N'EXISTE PLUS côté Neynar !")
-                    logger.error("❌ Il faut le recréer manuellement sur Neynar ou utiliser un autre webhook")
-                    return False
-                else:
-                    logger.warning(f"⚠️ Impossible de vérifier l'état du webhook côté Neynar: {e}")
-                    logger.warning("⚠️ Mais l'état local est synchronisé")
-                    return False
-                
-        finally:
-            db.close()
-            
     except Exception as e:
         logger.error(f"❌ Erreur lors du forçage du webhook fixe: {e}")
         return False
 
-def add_fids_to_webhook(new_fids: List[str]):
+def add_fids_to_webhook(new_fids: List[int]):
     """Ajouter des FIDs au webhook existant SANS le recréer"""
     try:
         logger.info(f"🔧 Tentative d'ajout de FIDs au webhook existant: {new_fids}")
-        
-        db = get_session_local()()
-        try:
-            webhook_state = db.query(WebhookState).filter_by(id="singleton").first()
-            
-            if not webhook_state:
-                logger.warning("⚠️ Aucun webhook existant, impossible d'ajouter des FIDs")
-                return False
-            
-            # Récupérer les FIDs actuels
-            current_fids = json.loads(webhook_state.author_fids)
-            # S'assurer que tous les FIDs sont des strings pour la cohérence
-            current_fids = [str(fid) for fid in current_fids]
-            logger.info(f"🔧 FIDs actuels: {current_fids}")
-            
-            # Ajouter les nouveaux FIDs (sans doublons) - s'assurer qu'ils sont des strings
-            new_fids_str = [str(fid) for fid in new_fids]
-            updated_fids = list(set(current_fids + new_fids_str))
-            logger.info(f"🔧 FIDs mis à jour: {updated_fids}")
-            
-            if updated_fids == current_fids:
-                logger.info("✅ Aucun nouveau FID à ajouter")
-                return True
-            
-            # VÉRIFIER D'ABORD SI LE WEBHOOK EXISTE ENCORE CÔTÉ NEYNAR
-            try:
-                webhook_id = config.NEYNAR_WEBHOOK_ID
-                webhook_details = get_neynar_client().get_webhook(webhook_id)
-                if webhook_details and webhook_details.get("active"):
-                    logger.info(f"✅ Webhook {webhook_id} existe et est actif côté Neynar")
-                    
-                    # Mettre à jour le webhook configuré
-                    try:
-                        # Convertir les FIDs en entiers pour l'API Neynar
-                        updated_fids_int = [int(fid) for fid in updated_fids]
-                        updated_webhook = get_neynar_client().update_webhook(
-                            webhook_id,
-                            updated_fids_int
-                        )
-                        
-                        # Mettre à jour l'état local
-                        webhook_state.author_fids = json.dumps(updated_fids)
-                        webhook_state.updated_at = datetime.utcnow()
-                        db.commit()
-                        
-                        logger.info(f"✅ FIDs ajoutés au webhook {webhook_id}")
-                        return True
-                        
-                    except Exception as update_error:
-                        logger.error(f"❌ Erreur lors de la mise à jour du webhook: {update_error}")
-                        logger.warning("⚠️ On garde l'état local existant pour éviter la perte de connexion")
-                        return False
-                        
-                else:
-                    logger.warning(f"⚠️ Webhook {webhook_id} n'existe plus ou est inactif côté Neynar")
-                    logger.warning("⚠️ Il faut le recréer manuellement sur Neynar ou utiliser un autre webhook")
-                    return False
-                    
-            except Exception as e:
-                if "404" in str(e) or "not found" in str(e).lower():
-                    logger.error(f"❌ Webhook {webhook_id} N'EXISTE PLUS côté Neynar !")
-                    logger.error("❌ Il faut le recréer manuellement sur Neynar ou utiliser un autre webhook")
-                    return False
-                else:
-                    logger.warning(f"⚠️ Impossible de vérifier l'état du webhook côté Neynar: {e}")
-                    logger.warning("⚠️ Mais l'état local est synchronisé")
-                    return False
-                
-        finally:
-            db.close()
-            
+        return get_subscription_engine().sync(changed_fids=new_fids)["success"]
     except Exception as e:
         logger.error(f"❌ Erreur lors de l'ajout des FIDs: {e}")
         return False
 
-def remove_fids_from_webhook(fids_to_remove: List[str]):
-    """Retirer des FIDs du webhook existant SANS le recréer"""
+def remove_fids_from_webhook(fids_to_remove: List[int]):
+    """Retirer des FIDs du webhook existant SANS le recréer
+    
+    Un FID encore suivi par une autre guild reste abonné.
+    """
     try:
         logger.info(f"🔧 Tentative de retrait de FIDs du webhook existant: {fids_to_remove}")
-        
-        db = get_session_local()()
-        try:
-            webhook_state = db.query(WebhookState).filter_by(id="singleton").first()
-            
-            if not webhook_state:
-                logger.warning("⚠️ Aucun webhook existant, impossible de retirer des FIDs")
-                return False
-            
-            # Récupérer les FIDs actuels
-            current_fids = json.loads(webhook_state.author_fids)
-            # S'assurer que tous les FIDs sont des strings pour la cohérence
-            current_fids = [str(fid) for fid in current_fids]
-            logger.info(f"🔧 FIDs actuels: {current_fids}")
-            
-            # Retirer les FIDs spécifiés - s'assurer qu'ils sont des strings
-            fids_to_remove_str = [str(fid) for fid in fids_to_remove]
-            updated_fids = [fid for fid in current_fids if fid not in fids_to_remove_str]
-            logger.info(f"🔧 FIDs mis à jour: {updated_fids}")
-            
-            if updated_fids == current_fids:
-                logger.info("✅ Aucun FID à retirer")
-                return True
-            
-            # VÉRIFIER D'ABORD SI LE WEBHOOK EXISTE ENCORE CÔTÉ NEYNAR
-            try:
-                webhook_id = config.NEYNAR_WEBHOOK_ID
-                webhook_details = get_neynar_client().get_webhook(webhook_id)
-                if webhook_details and webhook_details.get("active"):
-                    logger.info(f"✅ Webhook {webhook_id} existe et est actif côté Neynar")
-                    
-                    # Mettre à jour le webhook configuré
-                    try:
-                        # Convertir les FIDs en entiers pour l'API Neynar
-                        updated_fids_int = [int(fid) for fid in updated_fids]
-                        updated_webhook = get_neynar_client().update_webhook(
-                            webhook_id,
-                            updated_fids_int
-                        )
-                        
-                        # Mettre à jour l'état local
-                        webhook_state.author_fids = json.dumps(updated_fids)
-                        webhook_state.updated_at = datetime.utcnow()
-                        db.commit()
-                        
-                        logger.info("✅ FIDs retirés du webhook fixe 01K45KREDQ77B80YD87AAXJ3E8")
-                        return True
-                        
-                    except Exception as update_error:
-                        logger.error(f"❌ Erreur lors de la mise à jour du webhook: {update_error}")
-                        logger.warning("⚠️ On garde l'état local existant pour éviter la perte de connexion")
-                        return False
-                        
-                else:
-                    logger.warning(f"⚠️ Webhook {webhook_id} n'existe plus ou est inactif côté Neynar")
-                    logger.warning("⚠️ Il faut le recréer manuellement sur Neynar ou utiliser un autre webhook")
-                    return False
-                    
-            except Exception as e:
-                if "404" in str(e) or "not found" in str(e).lower():
-                    logger.error(f"❌ Webhook {webhook_id} N'EXISTE PLUS côté Neynar !")
-                    logger.error("❌ Il faut le recréer manuellement sur Neynar ou utiliser un autre webhook")
-                    return False
-                else:
-                    logger.warning(f"⚠️ Impossible de vérifier l'état du webhook côté Neynar: {e}")
-                    logger.warning("⚠️ Mais l'état local est synchronisé")
-                    return False
-                
-        finally:
-            db.close()
-            
+        return get_subscription_engine().sync(changed_fids=fids_to_remove)["success"]
     except Exception as e:
         logger.error(f"❌ Erreur lors du retrait des FIDs: {e}")
         return False